@@ -0,0 +1,202 @@
+"""Fails if a statement the app issues makes SQLite scan a whole table.
+
+Builds a scratch SQLite database at the latest schema version, drives every
+API route (and the background indexer and summary workers) through Flask's
+test client while recording each distinct SQL statement, then runs
+EXPLAIN QUERY PLAN on each. Lists the offending plans and exits with
+status 1 if any statement scans a table without an index or sorts a
+table's rows for ORDER BY:
+
+    python DataBase/check_query_plans.py
+
+backend/tests/test_query_plans.py runs the same check as part of the test
+suite, against the suite's own database.
+
+Tables are empty, but SQLite plans without statistics as if they were
+large, so the plans match those of a populated database. PostgreSQL
+creates the same indexes in its migrations; its planner prefers
+sequential scans on small tables, so it is not checked here.
+"""
+import io
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+import time
+
+# Statements allowed to scan, with the reason. Matched against the
+# whitespace-normalized SQL.
+ALLOWED_SCANS = {
+    "SELECT c.* FROM CaseAccess a JOIN Cases c ON c.case_id = a.case_id WHERE a.user_id = ?":
+        "Sorts only the caller's own grants by case creation time",
+    "SELECT c.*, (SELECT v.access_level FROM CaseAccess v WHERE v.case_id = c.case_id AND v.user_id = ?) "
+    "AS access_level, (SELECT COUNT(*) FROM Documents d WHERE d.case_id = c.case_id) AS document_count "
+    "FROM CaseAccess a JOIN Cases c ON c.case_id = a.case_id WHERE a.user_id = ?":
+        "Dashboard form of the same listing",
+    "SELECT s.rowid FROM DocumentSearch s":
+        "Ranks full-text matches by bm25; only matching rows are sorted",
+    "SELECT d.doc_id, d.case_id, d.file_name, d.size_bytes, d.uploaded_at, c.case_name, snippet(":
+        "Orders the page of search hits already chosen",
+}
+
+_SORT_RE = re.compile(r'^USE TEMP B-TREE FOR (?:ORDER BY|RIGHT PART OF ORDER BY|LAST TERM OF ORDER BY)')
+
+def is_problem(line):
+    """True for a plan line that reads a whole table or sorts rows for ORDER BY."""
+    if line.startswith('SCAN '):
+        # FTS5 lookups and walks along an index are reported as SCAN too
+        return ' VIRTUAL TABLE ' not in line and ' USING ' not in line
+    return bool(_SORT_RE.match(line))
+
+def normalize(sql):
+    return ' '.join(sql.split())
+
+def scratch_app():
+    """Points the app at a scratch SQLite database and upload folder at the latest schema.
+
+    Must run before anything imports the app's modules, which read their
+    settings when imported. Returns (app, database path).
+    """
+    data_dir = tempfile.mkdtemp(prefix='query-plans-')
+    os.environ['DATABASE_PATH'] = os.path.join(data_dir, 'plans.db')
+    os.environ['UPLOAD_FOLDER'] = os.path.join(data_dir, 'uploads')
+    os.environ.pop('DATABASE_URL', None)
+    os.environ.update({
+        'METRICS_ENABLED': '1', 'PASSWORD_HASH_WORKERS': '0', 'BCRYPT_ROUNDS': '4',
+        'SESSION_STORE': 'sqlite', 'AI_MODEL_CLIENT': 'fake', 'EVENT_STREAM_MAX_SECONDS': '0',
+    })
+    backend_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    for path in (os.path.join(backend_dir, 'app'), os.path.dirname(os.path.abspath(__file__)), backend_dir):
+        sys.path.insert(0, path)
+
+    import database_init
+
+    database_init.create_tables()
+
+    import app as app_module
+    return app_module.app, os.environ['DATABASE_PATH']
+
+def collect_statements(app):
+    """Drives every route of the app. Returns the distinct SQL statements it issued.
+
+    Statements are only seen while query instrumentation is on
+    (METRICS_ENABLED, the default).
+    """
+    from functions.database import db
+
+    statements = {}
+    def listener(sql, seconds):
+        statements.setdefault(normalize(sql), sql)
+
+    db.statement_listeners.append(listener)
+    try:
+        exercise(app)
+    finally:
+        db.statement_listeners.remove(listener)
+    return list(statements.values())
+
+def exercise(app):
+    """Calls every route at least once, including second pages and filters."""
+    def client(email, role):
+        c = app.test_client()
+        c.post('/api/register', json={"email": email, "password": 'plan-check', "full_name": email, "role": role})
+        user = c.post('/api/login', json={"email": email, "password": 'plan-check'}).json['user']
+        return c, user['user_id']
+
+    def ok(response, *statuses):
+        assert response.status_code in (statuses or (200,)), (response.request.path, response.status_code, response.data)
+        return response
+
+    owner, owner_id = client('owner@plans.example', 'advocate')
+    other, other_id = client('other@plans.example', 'advocate')
+    judge, _ = client('judge@plans.example', 'judge')
+
+    case_ids = [ok(owner.post('/api/cases', json={"case_name": f"Plan {i}"}), 201).json['case_id'] for i in range(3)]
+    case_id = case_ids[0]
+    ok(owner.post(f'/api/case/{case_id}/grant-access', json={"user_id": other_id, "access_level": 'upload_only'}))
+    ok(owner.post('/api/cases/grant-access', json={"case_ids": case_ids[1:], "user_ids": [other_id], "access_level": 'view_only'}))
+    ok(owner.put(f'/api/case/{case_id}/status', json={"status": 'In Progress'}))
+    ok(owner.put('/api/cases/status', json={"case_ids": case_ids[1:], "status": 'Closed'}))
+
+    doc_id = ok(owner.post(f'/api/case/{case_id}/upload', data={"file": (io.BytesIO(b'plan check exhibit'), 'a.txt')}), 201).json['doc_id']
+    ok(owner.post(f'/api/case/{case_id}/upload-batch', data={"files": [
+        (io.BytesIO(b'plan check exhibit'), 'b.txt'), (io.BytesIO(b'second exhibit'), 'c.txt'),
+    ]}))
+    upload = ok(other.post(f'/api/case/{case_id}/uploads', json={"file_name": 'd.txt', "size": 8}), 201).json
+    ok(other.get(f"/api/uploads/{upload['upload_id']}"))
+    ok(other.patch(f"/api/uploads/{upload['upload_id']}", data=b'resumed!', headers={'Upload-Offset': '0'}), 201)
+    cancelled = ok(other.post(f'/api/case/{case_id}/uploads', json={"file_name": 'e.txt', "size": 8}), 201).json
+    ok(other.delete(f"/api/uploads/{cancelled['upload_id']}"), 204)
+
+    for c in (owner, other, judge):
+        ok(c.get('/api/session'))
+        for path in ('/api/cases', '/api/cases/bundle'):
+            first = ok(c.get(path, query_string={"limit": 1})).json
+            ok(c.get(path, query_string={"limit": 1, "cursor": first['next_cursor']}))
+            ok(c.get(path, query_string={"status": 'Closed', "creator_id": owner_id, "created_from": '2000-01-01'}))
+        ok(c.get(f'/api/case/{case_id}'))
+        ok(c.get(f'/api/case/{case_id}/bundle'))
+        ok(c.get(f'/api/case/{case_id}/permissions'))
+        first = ok(c.get(f'/api/case/{case_id}/documents', query_string={"limit": 1})).json
+        ok(c.get(f'/api/case/{case_id}/documents', query_string={"limit": 1, "cursor": first['next_cursor']}))
+        ok(c.get(f'/api/case/{case_id}/documents', query_string={"uploader_id": owner_id, "uploaded_from": '2000-01-01'}))
+        ok(c.get(f'/api/document/{doc_id}/download'))
+        ok(c.get(f'/api/document/{doc_id}/preview'), 200, 404)
+        ok(c.get(f'/api/case/{case_id}/export.zip'))
+        ok(c.get('/api/events', headers={'Last-Event-ID': '0'}))
+        ok(c.get(f'/api/user/{owner_id}'))
+        for query in ('own', 'owner@plans', 'lans.exa'):
+            page = ok(c.get('/api/users/search', query_string={"q": query, "limit": 1})).json
+            if page['next_cursor']:
+                ok(c.get('/api/users/search', query_string={"q": query, "limit": 1, "cursor": page['next_cursor']}))
+
+    trail = ok(owner.get(f'/api/case/{case_id}/audit', query_string={"limit": 1})).json
+    ok(owner.get(f'/api/case/{case_id}/audit', query_string={"limit": 1, "cursor": trail['next_cursor'], "action": 'case_viewed'}))
+
+    # Give the background indexer time to finish before searching
+    for _ in range(50):
+        if not ok(owner.get('/api/search', query_string={"q": 'exhibit'})).json['results']:
+            time.sleep(0.1)
+    ok(other.get('/api/search', query_string={"q": 'exhibit', "case_id": case_id}))
+    ok(judge.get('/api/search', query_string={"q": 'plan'}))
+
+    job = ok(owner.post(f'/api/case/{case_id}/summary'), 200, 202).json
+    ok(owner.get(f"/api/summary-jobs/{job['job_id']}", query_string={"wait": 5}))
+    ok(owner.get(f'/api/case/{case_id}/summary'), 200, 202)
+    ok(owner.delete(f'/api/document/{doc_id}'))
+    ok(owner.get('/metrics'))
+    ok(owner.post('/api/logout'))
+
+def find_problems(conn, statements):
+    """Returns [(sql, plan lines)] for statements whose plan scans or sorts a table."""
+    problems = []
+    for sql in statements:
+        text = normalize(sql)
+        if not text.split(None, 1)[0].upper() in ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH'):
+            continue
+        if any(text.startswith(prefix) for prefix in ALLOWED_SCANS):
+            continue
+        plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", [None] * sql.count('?'))]
+        if any(is_problem(line) for line in plan):
+            problems.append((text, plan))
+    return problems
+
+def main():
+    app, db_path = scratch_app()
+    statements = collect_statements(app)
+    conn = sqlite3.connect(db_path)
+    problems = find_problems(conn, statements)
+    conn.close()
+
+    print(f"Checked {len(statements)} distinct statements.")
+    for text, plan in problems:
+        print(f"\n{text}")
+        for line in plan:
+            print(f"    {line}")
+    if problems:
+        print(f"\n{len(problems)} statements scan or sort a whole table.")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -1,12 +1,31 @@
 import sqlite3
 import os
+import sys
+
+# Make the backend's `functions` package importable when run as a script
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from functions.database import db, migrations
+from functions.storage import LocalBlobStore, UPLOAD_FOLDER
 
 # Path to the database file
-DB_PATH = os.path.join(os.path.dirname(__file__), 'database.db')
+DB_PATH = os.environ.get('DATABASE_PATH') or os.path.join(os.path.dirname(__file__), 'database.db')
+
+# Schema applied instead of the statements below when DATABASE_URL selects PostgreSQL
+POSTGRES_SCHEMA_PATH = os.path.join(os.path.dirname(__file__), 'schema_postgres.sql')
 
 def create_tables():
-    """Creates all the necessary tables in the database."""
+    """Creates the schema on a new database, or migrates an existing one to the latest version."""
+    baseline = create_postgres_tables if db.DIALECT == 'postgresql' else create_baseline_tables
+    old_version, new_version = migrations.migrate(baseline)
+    if old_version != new_version:
+        print(f"Schema migrated from version {old_version} to {new_version}.")
+
+def create_baseline_tables():
+    """Creates the version 1 tables, upgrading pre-versioning databases in place."""
     conn = sqlite3.connect(DB_PATH)
+    # WAL is a persistent property of the database file; set it once here.
+    conn.execute("PRAGMA journal_mode = WAL")
     cursor = conn.cursor()
 
     # Create Users table
@@ -21,6 +40,49 @@ def create_tables():
     )
     ''')
 
+    # Case-insensitive indexes for prefix matches in user search
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_users_email_nocase ON Users (email COLLATE NOCASE, user_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_users_name_nocase ON Users (full_name COLLATE NOCASE, user_id)")
+
+    # Trigram index for substring search on email and full name, kept in sync by triggers
+    cursor.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS UserSearch "
+        "USING fts5(user_id UNINDEXED, email, full_name, tokenize = 'trigram')"
+    )
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS trg_users_insert_search AFTER INSERT ON Users
+    BEGIN
+        INSERT INTO UserSearch (user_id, email, full_name) VALUES (new.user_id, new.email, new.full_name);
+    END
+    ''')
+    # Updates and deletes scan UserSearch for the user_id; neither happens on a hot path
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS trg_users_update_search AFTER UPDATE OF email, full_name ON Users
+    BEGIN
+        DELETE FROM UserSearch WHERE user_id = old.user_id;
+        INSERT INTO UserSearch (user_id, email, full_name) VALUES (new.user_id, new.email, new.full_name);
+    END
+    ''')
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS trg_users_delete_search AFTER DELETE ON Users
+    BEGIN
+        DELETE FROM UserSearch WHERE user_id = old.user_id;
+    END
+    ''')
+    # Index users created before the search table existed
+    if cursor.execute("SELECT NOT EXISTS (SELECT 1 FROM UserSearch)").fetchone()[0]:
+        cursor.execute("INSERT INTO UserSearch (user_id, email, full_name) SELECT user_id, email, full_name FROM Users")
+
+    # Create Sessions table (server-side sessions with SESSION_STORE=sqlite)
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS Sessions (
+        session_id TEXT PRIMARY KEY,
+        data TEXT NOT NULL,
+        expires_at TIMESTAMP NOT NULL
+    )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_sessions_expires ON Sessions (expires_at)")
+
     # Create Cases table
     cursor.execute('''
     CREATE TABLE IF NOT EXISTS Cases (
@@ -33,6 +95,24 @@ def create_tables():
     )
     ''')
 
+    # Create Blobs table (one row per distinct stored file, shared by documents)
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS Blobs (
+        content_hash TEXT PRIMARY KEY,
+        storage_key TEXT NOT NULL,
+        size_bytes INTEGER NOT NULL,
+        ref_count INTEGER NOT NULL DEFAULT 0,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+
+    # Older databases stored one file per document in Documents.storage_path
+    cursor.execute("PRAGMA table_info(Documents)")
+    document_columns = {row[1] for row in cursor.fetchall()}
+    legacy_documents = 'storage_path' in document_columns
+    if legacy_documents:
+        cursor.execute("ALTER TABLE Documents RENAME TO Documents_legacy")
+
     # Create Documents table
     cursor.execute('''
     CREATE TABLE IF NOT EXISTS Documents (
@@ -40,16 +120,243 @@ def create_tables():
         case_id TEXT NOT NULL,
         uploader_id TEXT NOT NULL,
         file_name TEXT NOT NULL,
-        storage_path TEXT UNIQUE NOT NULL,
+        content_hash TEXT NOT NULL,
+        size_bytes INTEGER NOT NULL,
         uploaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
         FOREIGN KEY (case_id) REFERENCES Cases(case_id) ON DELETE CASCADE,
-        FOREIGN KEY (uploader_id) REFERENCES Users(user_id)
+        FOREIGN KEY (uploader_id) REFERENCES Users(user_id),
+        FOREIGN KEY (content_hash) REFERENCES Blobs(content_hash)
+    )
+    ''')
+
+    migrated_files = migrate_legacy_documents(cursor) if legacy_documents else []
+
+    # Create UploadSessions table (resumable uploads still in progress)
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS UploadSessions (
+        upload_id TEXT PRIMARY KEY,
+        case_id TEXT NOT NULL,
+        user_id TEXT NOT NULL,
+        file_name TEXT NOT NULL,
+        total_size INTEGER NOT NULL,
+        received_bytes INTEGER NOT NULL DEFAULT 0,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (case_id) REFERENCES Cases(case_id) ON DELETE CASCADE,
+        FOREIGN KEY (user_id) REFERENCES Users(user_id)
+    )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_uploadsessions_updated ON UploadSessions (updated_at)")
+
+    # Create SummaryJobs table (background AI summary generation)
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS SummaryJobs (
+        job_id TEXT PRIMARY KEY,
+        case_id TEXT NOT NULL,
+        requested_by TEXT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'queued' CHECK(status IN ('queued', 'running', 'done', 'failed')),
+        result TEXT,
+        error TEXT,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        lease_expires_at TIMESTAMP,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        finished_at TIMESTAMP,
+        FOREIGN KEY (case_id) REFERENCES Cases(case_id) ON DELETE CASCADE,
+        FOREIGN KEY (requested_by) REFERENCES Users(user_id)
+    )
+    ''')
+    # At most one queued or running job per case; concurrent requests join it
+    cursor.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_summaryjobs_active_case ON SummaryJobs (case_id) "
+        "WHERE status IN ('queued', 'running')"
+    )
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_summaryjobs_status ON SummaryJobs (status, created_at)")
+
+    # Summary cache: per-document summaries keyed by content hash, and case
+    # rollups keyed by the hash of the sorted set of document hashes
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS DocumentSummaries (
+        content_hash TEXT PRIMARY KEY,
+        summary TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        last_used_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_documentsummaries_used ON DocumentSummaries (last_used_at)")
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS CaseSummaries (
+        rollup_key TEXT PRIMARY KEY,
+        case_id TEXT NOT NULL,
+        doc_hashes TEXT NOT NULL,
+        summary TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        last_used_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (case_id) REFERENCES Cases(case_id) ON DELETE CASCADE
+    )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_casesummaries_case ON CaseSummaries (case_id, created_at)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_casesummaries_used ON CaseSummaries (last_used_at)")
+
+    # Full-text search: DocumentIndex tracks which documents are indexed and
+    # owns the rowid of each document's entry in the DocumentSearch FTS5 table
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS DocumentIndex (
+        search_rowid INTEGER PRIMARY KEY,
+        doc_id TEXT NOT NULL UNIQUE,
+        case_id TEXT NOT NULL,
+        status TEXT NOT NULL CHECK(status IN ('indexed', 'failed')),
+        error TEXT,
+        indexed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (doc_id) REFERENCES Documents(doc_id) ON DELETE CASCADE
+    )
+    ''')
+    cursor.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS DocumentSearch "
+        "USING fts5(file_name, body, tokenize = 'porter unicode61 remove_diacritics 2', prefix = '2 3')"
+    )
+    # Deleting a document removes its index entry in the same transaction
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS trg_documents_delete_index AFTER DELETE ON Documents
+    BEGIN
+        DELETE FROM DocumentIndex WHERE doc_id = old.doc_id;
+    END
+    ''')
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS trg_documentindex_delete_search AFTER DELETE ON DocumentIndex
+    BEGIN
+        DELETE FROM DocumentSearch WHERE rowid = old.search_rowid;
+    END
+    ''')
+
+    # Indexes backing keyset pagination and filters on case/document listings
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_cases_created ON Cases (created_at, case_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_cases_status_created ON Cases (status, created_at, case_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_cases_creator_created ON Cases (creator_id, created_at, case_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_documents_case_uploaded ON Documents (case_id, uploaded_at, doc_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_documents_content_hash ON Documents (content_hash)")
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_documents_case_uploader_uploaded "
+        "ON Documents (case_id, uploader_id, uploaded_at, doc_id)"
+    )
+
+    # Create CaseAccess table (one row per user grant, shared by all cases)
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS CaseAccess (
+        case_id TEXT NOT NULL,
+        user_id TEXT NOT NULL,
+        access_level TEXT NOT NULL,
+        PRIMARY KEY (case_id, user_id),
+        FOREIGN KEY (case_id) REFERENCES Cases(case_id) ON DELETE CASCADE,
+        FOREIGN KEY (user_id) REFERENCES Users(user_id) ON DELETE CASCADE
+    ) WITHOUT ROWID
+    ''')
+    # The (case_id, user_id) primary key is the clustered index; this one
+    # serves "which cases can this user see" lookups.
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_caseaccess_user_case
+    ON CaseAccess (user_id, case_id, access_level)
+    ''')
+
+    # Single-row counter bumped on every grant so each worker can tell when
+    # its cached access levels are stale.
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS AclVersion (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        version INTEGER NOT NULL
     )
     ''')
+    cursor.execute("INSERT OR IGNORE INTO AclVersion (id, version) VALUES (1, 0)")
+
+    migrate_legacy_permissions(cursor)
 
     print("Tables created successfully.")
     conn.commit()
     conn.close()
 
+    # Only remove the old per-document files once their blobs are committed
+    for path in migrated_files:
+        os.remove(path)
+
+def create_postgres_tables():
+    """Applies schema_postgres.sql (version 1). Fresh PostgreSQL databases have no legacy tables to migrate."""
+    import psycopg2
+
+    with open(POSTGRES_SCHEMA_PATH) as f:
+        schema = f.read()
+    conn = psycopg2.connect(db.DATABASE_URL)
+    try:
+        with conn, conn.cursor() as cursor:
+            cursor.execute(schema)
+    finally:
+        conn.close()
+    print("Tables created successfully.")
+
+def migrate_legacy_permissions(cursor):
+    """Folds the old per-case CaseAccessPermissions_* tables into CaseAccess."""
+    cursor.execute(
+        "SELECT name FROM sqlite_master WHERE type='table' AND name LIKE 'CaseAccessPermissions\\_%' ESCAPE '\\'"
+    )
+    legacy_tables = [row[0] for row in cursor.fetchall()]
+
+    for table_name in legacy_tables:
+        cursor.execute(f'''
+        INSERT INTO CaseAccess (case_id, user_id, access_level)
+        SELECT case_id, user_id, access_level FROM "{table_name}" WHERE true
+        ON CONFLICT(case_id, user_id) DO UPDATE SET access_level = excluded.access_level
+        ''')
+        cursor.execute(f'DROP TABLE "{table_name}"')
+
+    if legacy_tables:
+        cursor.execute("UPDATE AclVersion SET version = version + 1 WHERE id = 1")
+        print(f"Migrated {len(legacy_tables)} legacy permission tables into CaseAccess.")
+
+def migrate_legacy_documents(cursor):
+    """Moves files referenced by Documents_legacy into content-addressed storage.
+
+    Identical files collapse into a single blob. Rows whose file is missing
+    keep a placeholder blob so their metadata is not lost. Returns the old
+    file paths, which the caller deletes after committing.
+    """
+    store = LocalBlobStore(UPLOAD_FOLDER)
+    cursor.execute(
+        "SELECT doc_id, case_id, uploader_id, file_name, storage_path, uploaded_at FROM Documents_legacy"
+    )
+    legacy_rows = cursor.fetchall()
+    migrated_files = []
+
+    for doc_id, case_id, uploader_id, file_name, storage_path, uploaded_at in legacy_rows:
+        if not os.path.isfile(storage_path):
+            # Paths were stored as absolute; the folder may have moved since
+            storage_path = os.path.join(UPLOAD_FOLDER, os.path.basename(storage_path))
+        if os.path.isfile(storage_path):
+            with open(storage_path, 'rb') as f:
+                staged = store.ingest(f)
+            storage_key = store.commit(staged)
+            migrated_files.append(storage_path)
+            content_hash, size_bytes = staged.content_hash, staged.size_bytes
+        else:
+            print(f"Warning: file for document {doc_id} is missing: {storage_path}")
+            content_hash = f"missing-{doc_id}"
+            storage_key = f"missing/{doc_id}"
+            size_bytes = 0
+
+        cursor.execute(
+            """
+            INSERT INTO Blobs (content_hash, storage_key, size_bytes, ref_count) VALUES (?, ?, ?, 1)
+            ON CONFLICT(content_hash) DO UPDATE SET ref_count = ref_count + 1
+            """,
+            (content_hash, storage_key, size_bytes)
+        )
+        cursor.execute(
+            "INSERT INTO Documents (doc_id, case_id, uploader_id, file_name, content_hash, size_bytes, uploaded_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (doc_id, case_id, uploader_id, file_name, content_hash, size_bytes, uploaded_at)
+        )
+
+    cursor.execute("DROP TABLE Documents_legacy")
+    print(f"Migrated {len(legacy_rows)} documents into content-addressed storage.")
+    return migrated_files
+
 if __name__ == '__main__':
     create_tables()
\ No newline at end of file
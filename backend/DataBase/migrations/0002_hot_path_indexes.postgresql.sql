@@ -0,0 +1,13 @@
+-- The summary job poller walks only queued and running jobs, oldest first,
+-- instead of merging two status ranges and sorting them. The old
+-- (status, created_at) index also covered every finished job.
+CREATE INDEX IF NOT EXISTS idx_summaryjobs_pending ON SummaryJobs (created_at)
+    WHERE status IN ('queued', 'running');
+DROP INDEX IF EXISTS idx_summaryjobs_status;
+
+-- Child-side indexes for foreign keys that had none, so deleting a case or
+-- user finds the referencing rows by index rather than by scanning
+CREATE INDEX IF NOT EXISTS idx_summaryjobs_case ON SummaryJobs (case_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_summaryjobs_requested_by ON SummaryJobs (requested_by);
+CREATE INDEX IF NOT EXISTS idx_uploadsessions_case ON UploadSessions (case_id);
+CREATE INDEX IF NOT EXISTS idx_uploadsessions_user ON UploadSessions (user_id);
@@ -0,0 +1,6 @@
+-- Blobs may be stored compressed. size_bytes stays the original size;
+-- stored_bytes is what the file occupies and content_encoding is NULL for
+-- blobs stored as is, otherwise 'gzip' or 'zstd'.
+ALTER TABLE Blobs ADD COLUMN stored_bytes BIGINT;
+ALTER TABLE Blobs ADD COLUMN content_encoding TEXT;
+UPDATE Blobs SET stored_bytes = size_bytes;
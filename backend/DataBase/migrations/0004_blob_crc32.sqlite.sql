@@ -0,0 +1,3 @@
+-- CRC-32 of a blob's original bytes, filled in the first time it is
+-- exported in a ZIP archive so resumed exports need not read it again.
+ALTER TABLE Blobs ADD COLUMN crc32 INTEGER;
@@ -0,0 +1,14 @@
+-- Log of changes for the /api/events feed. Rows are written in the same
+-- transaction as the change they describe and read back by event_id, which
+-- clients send as Last-Event-ID to resume. user_id, if set, names a user who
+-- receives the event without having access to the case (e.g. the creator
+-- of a new case).
+CREATE TABLE IF NOT EXISTS ChangeEvents (
+    event_id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    kind TEXT NOT NULL,
+    case_id TEXT NOT NULL,
+    user_id TEXT,
+    data TEXT NOT NULL,
+    created_at TIMESTAMP(0) DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_changeevents_created ON ChangeEvents (created_at);
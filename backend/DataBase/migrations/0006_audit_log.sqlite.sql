@@ -0,0 +1,39 @@
+-- Append-only audit trail of logins, case views, downloads and grants,
+-- written in batches by functions/audit/audit_log.py. Each entry's
+-- entry_hash is the SHA-256 of the previous entry's hash plus this entry's
+-- fields, so removing or editing a row breaks the chain. The triggers
+-- reject updates and deletes outright. No foreign keys: entries outlive
+-- the documents and users they mention.
+CREATE TABLE IF NOT EXISTS AuditLog (
+    audit_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    occurred_at TIMESTAMP NOT NULL,
+    action TEXT NOT NULL,
+    user_id TEXT,
+    case_id TEXT,
+    doc_id TEXT,
+    ip_address TEXT,
+    details TEXT,
+    prev_hash TEXT NOT NULL,
+    entry_hash TEXT NOT NULL
+);
+-- Per-case trails, newest first
+CREATE INDEX IF NOT EXISTS idx_auditlog_case ON AuditLog (case_id, audit_id);
+
+CREATE TRIGGER IF NOT EXISTS trg_auditlog_no_update BEFORE UPDATE ON AuditLog
+BEGIN
+    SELECT RAISE(ABORT, 'AuditLog is append-only');
+END;
+CREATE TRIGGER IF NOT EXISTS trg_auditlog_no_delete BEFORE DELETE ON AuditLog
+BEGIN
+    SELECT RAISE(ABORT, 'AuditLog is append-only');
+END;
+
+-- Hash of the newest entry. Each flush locks this row first, so flushes
+-- from several processes extend the chain one after another.
+CREATE TABLE IF NOT EXISTS AuditHead (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    last_hash TEXT NOT NULL
+);
+INSERT INTO AuditHead (id, last_hash)
+VALUES (1, '0000000000000000000000000000000000000000000000000000000000000000')
+ON CONFLICT(id) DO NOTHING;
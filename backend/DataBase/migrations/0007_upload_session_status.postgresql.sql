@@ -0,0 +1,5 @@
+-- 'finalizing' while one request turns a complete resumable upload into a
+-- document; set back to 'open' if that fails, so the final request can be
+-- retried without sending the data again.
+ALTER TABLE UploadSessions ADD COLUMN status TEXT NOT NULL DEFAULT 'open'
+    CHECK (status IN ('open', 'finalizing'));
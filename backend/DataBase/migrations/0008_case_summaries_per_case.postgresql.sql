@@ -0,0 +1,6 @@
+-- Case summaries are keyed by (case_id, rollup_key). Keyed by rollup_key
+-- alone, two cases with the same documents shared one row owned by
+-- whichever case summarized first, so the other never found it as a base
+-- for incremental merges (and lost it if the first case was deleted).
+ALTER TABLE CaseSummaries DROP CONSTRAINT casesummaries_pkey;
+ALTER TABLE CaseSummaries ADD PRIMARY KEY (case_id, rollup_key);
@@ -0,0 +1,19 @@
+-- Case summaries are keyed by (case_id, rollup_key). Keyed by rollup_key
+-- alone, two cases with the same documents shared one row owned by
+-- whichever case summarized first, so the other never found it as a base
+-- for incremental merges (and lost it if the first case was deleted).
+CREATE TABLE CaseSummaries_new (
+    rollup_key TEXT NOT NULL,
+    case_id TEXT NOT NULL,
+    doc_hashes TEXT NOT NULL,
+    summary TEXT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    last_used_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (case_id, rollup_key),
+    FOREIGN KEY (case_id) REFERENCES Cases(case_id) ON DELETE CASCADE
+);
+INSERT INTO CaseSummaries_new SELECT rollup_key, case_id, doc_hashes, summary, created_at, last_used_at FROM CaseSummaries;
+DROP TABLE CaseSummaries;
+ALTER TABLE CaseSummaries_new RENAME TO CaseSummaries;
+CREATE INDEX idx_casesummaries_case ON CaseSummaries (case_id, created_at);
+CREATE INDEX idx_casesummaries_used ON CaseSummaries (last_used_at);
@@ -0,0 +1,3 @@
+-- Blobs whose last document was deleted keep their row at ref_count 0 until
+-- the file is removed; delete_document looks them up on every call.
+CREATE INDEX IF NOT EXISTS idx_blobs_unreferenced ON Blobs (content_hash) WHERE ref_count <= 0;
@@ -0,0 +1,158 @@
+-- PostgreSQL schema, applied by database_init.py when DATABASE_URL is a
+-- postgresql:// URL. Mirrors the SQLite tables created there; the comments
+-- note where PostgreSQL does something differently.
+--
+-- Timestamps are TIMESTAMP(0) in UTC (the pool sets timezone=UTC), so they
+-- compare and serialize like SQLite's 'YYYY-MM-DD HH:MM:SS' text.
+
+CREATE TABLE IF NOT EXISTS Users (
+    user_id TEXT PRIMARY KEY,
+    email TEXT UNIQUE NOT NULL,
+    hashed_password TEXT NOT NULL,
+    full_name TEXT NOT NULL,
+    role TEXT NOT NULL CHECK(role IN ('advocate', 'judge', 'government_agency', 'private_intel')),
+    created_at TIMESTAMP(0) DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Case-insensitive prefix matches in user search compare lower() in byte order
+CREATE INDEX IF NOT EXISTS idx_users_email_lower ON Users ((lower(email) COLLATE "C"), user_id);
+CREATE INDEX IF NOT EXISTS idx_users_name_lower ON Users ((lower(full_name) COLLATE "C"), user_id);
+
+CREATE TABLE IF NOT EXISTS Sessions (
+    session_id TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    expires_at TIMESTAMP(0) NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_sessions_expires ON Sessions (expires_at);
+
+CREATE TABLE IF NOT EXISTS Cases (
+    case_id TEXT PRIMARY KEY,
+    case_name TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'Open',
+    creator_id TEXT NOT NULL REFERENCES Users(user_id),
+    created_at TIMESTAMP(0) DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS Blobs (
+    content_hash TEXT PRIMARY KEY,
+    storage_key TEXT NOT NULL,
+    size_bytes BIGINT NOT NULL,
+    ref_count INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMP(0) DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS Documents (
+    doc_id TEXT PRIMARY KEY,
+    case_id TEXT NOT NULL REFERENCES Cases(case_id) ON DELETE CASCADE,
+    uploader_id TEXT NOT NULL REFERENCES Users(user_id),
+    file_name TEXT NOT NULL,
+    content_hash TEXT NOT NULL REFERENCES Blobs(content_hash),
+    size_bytes BIGINT NOT NULL,
+    uploaded_at TIMESTAMP(0) DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS UploadSessions (
+    upload_id TEXT PRIMARY KEY,
+    case_id TEXT NOT NULL REFERENCES Cases(case_id) ON DELETE CASCADE,
+    user_id TEXT NOT NULL REFERENCES Users(user_id),
+    file_name TEXT NOT NULL,
+    total_size BIGINT NOT NULL,
+    received_bytes BIGINT NOT NULL DEFAULT 0,
+    created_at TIMESTAMP(0) DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP(0) DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_uploadsessions_updated ON UploadSessions (updated_at);
+
+CREATE TABLE IF NOT EXISTS SummaryJobs (
+    job_id TEXT PRIMARY KEY,
+    case_id TEXT NOT NULL REFERENCES Cases(case_id) ON DELETE CASCADE,
+    requested_by TEXT NOT NULL REFERENCES Users(user_id),
+    status TEXT NOT NULL DEFAULT 'queued' CHECK(status IN ('queued', 'running', 'done', 'failed')),
+    result TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_expires_at TIMESTAMP(0),
+    created_at TIMESTAMP(0) DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP(0) DEFAULT CURRENT_TIMESTAMP,
+    finished_at TIMESTAMP(0)
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_summaryjobs_active_case ON SummaryJobs (case_id)
+    WHERE status IN ('queued', 'running');
+CREATE INDEX IF NOT EXISTS idx_summaryjobs_status ON SummaryJobs (status, created_at);
+
+CREATE TABLE IF NOT EXISTS DocumentSummaries (
+    content_hash TEXT PRIMARY KEY,
+    summary TEXT NOT NULL,
+    created_at TIMESTAMP(0) DEFAULT CURRENT_TIMESTAMP,
+    last_used_at TIMESTAMP(0) DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_documentsummaries_used ON DocumentSummaries (last_used_at);
+
+CREATE TABLE IF NOT EXISTS CaseSummaries (
+    rollup_key TEXT PRIMARY KEY,
+    case_id TEXT NOT NULL REFERENCES Cases(case_id) ON DELETE CASCADE,
+    doc_hashes TEXT NOT NULL,
+    summary TEXT NOT NULL,
+    created_at TIMESTAMP(0) DEFAULT CURRENT_TIMESTAMP,
+    last_used_at TIMESTAMP(0) DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_casesummaries_case ON CaseSummaries (case_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_casesummaries_used ON CaseSummaries (last_used_at);
+
+-- Full-text search. Foreign-key cascades replace the SQLite delete triggers,
+-- and DocumentSearch is an ordinary table with a generated tsvector in place
+-- of the FTS5 virtual table. Its key column keeps the name rowid so queries
+-- are shared between backends.
+CREATE TABLE IF NOT EXISTS DocumentIndex (
+    search_rowid BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    doc_id TEXT NOT NULL UNIQUE REFERENCES Documents(doc_id) ON DELETE CASCADE,
+    case_id TEXT NOT NULL,
+    status TEXT NOT NULL CHECK(status IN ('indexed', 'failed')),
+    error TEXT,
+    indexed_at TIMESTAMP(0) DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS DocumentSearch (
+    rowid BIGINT PRIMARY KEY REFERENCES DocumentIndex(search_rowid) ON DELETE CASCADE,
+    file_name TEXT NOT NULL,
+    body TEXT NOT NULL,
+    -- Body text is capped well below the 1 MB tsvector limit
+    document tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', file_name), 'A') ||
+        setweight(to_tsvector('english', left(body, 262144)), 'B')
+    ) STORED
+);
+CREATE INDEX IF NOT EXISTS idx_documentsearch_document ON DocumentSearch USING GIN (document);
+
+CREATE INDEX IF NOT EXISTS idx_cases_created ON Cases (created_at, case_id);
+CREATE INDEX IF NOT EXISTS idx_cases_status_created ON Cases (status, created_at, case_id);
+CREATE INDEX IF NOT EXISTS idx_cases_creator_created ON Cases (creator_id, created_at, case_id);
+CREATE INDEX IF NOT EXISTS idx_documents_case_uploaded ON Documents (case_id, uploaded_at, doc_id);
+CREATE INDEX IF NOT EXISTS idx_documents_content_hash ON Documents (content_hash);
+CREATE INDEX IF NOT EXISTS idx_documents_case_uploader_uploaded
+    ON Documents (case_id, uploader_id, uploaded_at, doc_id);
+
+CREATE TABLE IF NOT EXISTS CaseAccess (
+    case_id TEXT NOT NULL REFERENCES Cases(case_id) ON DELETE CASCADE,
+    user_id TEXT NOT NULL REFERENCES Users(user_id) ON DELETE CASCADE,
+    access_level TEXT NOT NULL,
+    PRIMARY KEY (case_id, user_id)
+);
+CREATE INDEX IF NOT EXISTS idx_caseaccess_user_case ON CaseAccess (user_id, case_id, access_level);
+
+CREATE TABLE IF NOT EXISTS AclVersion (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    version INTEGER NOT NULL
+);
+INSERT INTO AclVersion (id, version) VALUES (1, 0) ON CONFLICT (id) DO NOTHING;
+
+-- Substring user search works without pg_trgm, but scans Users; with the
+-- extension available these indexes serve its LIKE '%...%' filters.
+DO $$
+BEGIN
+    CREATE EXTENSION IF NOT EXISTS pg_trgm;
+    CREATE INDEX IF NOT EXISTS idx_users_email_trgm ON Users USING GIN (lower(email) gin_trgm_ops);
+    CREATE INDEX IF NOT EXISTS idx_users_name_trgm ON Users USING GIN (lower(full_name) gin_trgm_ops);
+EXCEPTION WHEN OTHERS THEN
+    RAISE NOTICE 'pg_trgm unavailable; user substring search will scan Users';
+END
+$$;
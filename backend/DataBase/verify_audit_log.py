@@ -0,0 +1,29 @@
+"""Checks that the audit log's hash chain is intact.
+
+Recomputes every AuditLog entry's hash from the first entry on and exits
+with status 1 at the first one that does not match, which means rows were
+altered, removed or inserted outside the app. Uses the same database as the
+app (DATABASE_PATH or DATABASE_URL):
+
+    python DataBase/verify_audit_log.py
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from functions.audit import audit_log
+
+def main():
+    checked, bad_id = audit_log.verify_chain()
+    if bad_id is None:
+        print(f"Audit log intact: {checked} entries verified.")
+        return
+    if bad_id == 0:
+        print(f"Audit log chain head does not match the last of {checked} entries; newest entries are missing.")
+    else:
+        print(f"Audit log broken at audit_id {bad_id} after {checked} valid entries.")
+    sys.exit(1)
+
+if __name__ == '__main__':
+    main()
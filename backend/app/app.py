@@ -1,21 +1,84 @@
+import hmac
+import json
 import os
 import sys
-from flask import Flask, jsonify, request, session, send_from_directory
+from flask import Flask, Response, jsonify, redirect, request, session
 from functools import wraps
-import time
+from werkzeug.exceptions import ClientDisconnected
 from werkzeug.utils import secure_filename
 
 # Add the parent directory to the Python path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from functions.database import user_manager, cases_manager, document_manager, permissions_manager
+from functions import metrics, password_hashing, sessions
+from functions.database import db, migrations, user_manager, cases_manager, document_manager, permissions_manager, upload_manager
+from functions.database.pagination import clamp_limit, normalize_timestamp
+from functions.storage import CHUNK_SIZE, PartialUploadBusy, UPLOAD_FOLDER, choose_encoding, create_blob_store
+from functions.storage.serving import send_blob, send_derivative, send_stream
+from functions.export.case_export import build_case_archive
+from functions.previews import preview_pipeline
+from functions.previews.rendering import PREVIEW_MIMETYPE, PREVIEW_SIZES
+from functions.ai import summary_cache, summary_jobs
+from functions.search import document_index
+from functions.events import change_feed
+from functions.audit import audit_log
 
 app = Flask(__name__)
-app.secret_key = os.urandom(24)
+# First, so request latency includes the other extensions' hooks
+metrics.init_app(app)
+sessions.init_app(app)
+db.init_app(app)
+summary_jobs.init_app(app)
+document_index.init_app(app)
+audit_log.init_app(app)
 
 # Configuration
-UPLOAD_FOLDER = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'uploads'))
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+app.config['MAX_UPLOAD_SIZE'] = int(os.environ.get('MAX_UPLOAD_SIZE', 10 * 1024 ** 3))
+app.config['UPLOAD_SESSION_MAX_AGE_HOURS'] = int(os.environ.get('UPLOAD_SESSION_MAX_AGE_HOURS', 24))
+# Behind nginx, set this to an `internal` location aliased to UPLOAD_FOLDER
+# (e.g. /protected-uploads/) to hand file transfer off via X-Accel-Redirect.
+app.config['DOWNLOAD_ACCEL_REDIRECT_PREFIX'] = os.environ.get('DOWNLOAD_ACCEL_REDIRECT_PREFIX')
+# Apache/lighttpd equivalent (X-Sendfile), handled by Flask's send_file
+app.config['USE_X_SENDFILE'] = os.environ.get('USE_X_SENDFILE', '').lower() in ('1', 'true', 'yes')
+# Most items (grants, cases or files) one bulk request may carry
+app.config['BULK_MAX_ITEMS'] = int(os.environ.get('BULK_MAX_ITEMS', 1000))
+# Longest a summary request may block waiting for its background job
+app.config['SUMMARY_MAX_WAIT_SECONDS'] = float(os.environ.get('SUMMARY_MAX_WAIT_SECONDS', 25))
+# If set, /metrics requires `Authorization: Bearer <token>`
+app.config['METRICS_TOKEN'] = os.environ.get('METRICS_TOKEN')
+# Previews are addressed by content hash, so browsers may keep them this long
+app.config['PREVIEW_MAX_AGE'] = int(os.environ.get('PREVIEW_MAX_AGE', 365 * 24 * 3600))
+blob_store = create_blob_store()
+
+# Refuse to start on a database that has not been migrated for this code
+if os.environ.get('SKIP_SCHEMA_CHECK', '').lower() not in ('1', 'true', 'yes'):
+    migrations.check_schema()
+
+metrics.register_stats(
+    'acl_cache', permissions_manager.get_acl_cache_stats, "Access-level cache statistics.",
+    counters=('hits', 'misses', 'evictions', 'invalidations'),
+)
+metrics.register_stats(
+    'summary_cache', summary_cache.get_summary_cache_stats, "AI summary cache statistics.",
+    counters=('document_hits', 'document_misses', 'case_hits', 'case_misses', 'incremental_merges', 'evictions'),
+)
+metrics.register_stats(
+    'search', document_index.get_search_stats, "Search indexing and query statistics.",
+    counters=('indexed', 'failed', 'text_reused', 'searches'),
+)
+metrics.register_stats(
+    'previews', preview_pipeline.get_preview_stats, "Preview rendering and derivative cache statistics.",
+    counters=('generated', 'failed', 'cache_hits', 'cache_misses', 'cache_evictions'),
+)
+metrics.register_stats(
+    'change_feed', change_feed.get_feed_stats, "Change feed streams and event delivery.",
+    counters=('delivered', 'resets', 'overflows', 'rejected', 'reads'),
+)
+metrics.register_stats(
+    'audit', audit_log.get_audit_stats, "Audit log buffering and writes.",
+    counters=('recorded', 'written', 'flushes', 'failures', 'dropped'),
+)
 
 # Helper to convert sqlite3.Row to dict
 def row_to_dict(row):
@@ -23,6 +86,68 @@ def row_to_dict(row):
         return None
     return dict(row)
 
+# The public part of a Users row, as cached in the session
+def user_profile(user):
+    return {key: user[key] for key in ('user_id', 'email', 'full_name', 'role', 'created_at')}
+
+# Helper to read the limit/cursor query parameters shared by listing routes.
+# Raises ValueError on a malformed limit.
+def pagination_args():
+    return {
+        "limit": clamp_limit(request.args.get('limit')),
+        "cursor": request.args.get('cursor') or None,
+    }
+
+# Helper to read the filters shared by the case listing routes.
+# Raises ValueError on a malformed limit.
+def case_list_args():
+    return {
+        "status": request.args.get('status') or None,
+        "creator_id": request.args.get('creator_id') or None,
+        "created_from": normalize_timestamp(request.args.get('created_from')),
+        "created_to": normalize_timestamp(request.args.get('created_to'), end_of_day=True),
+        **pagination_args(),
+    }
+
+# Helper to send JSON with an ETag of its body, answering 304 when the
+# client's copy is current. Clients must revalidate on every use.
+def conditional_json(payload):
+    response = jsonify(payload)
+    response.add_etag()
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+# Helper to read a non-empty list of ID strings from a JSON body; None if malformed
+def id_list(data, key):
+    values = data.get(key)
+    if not isinstance(values, list) or not values or not all(isinstance(v, str) and v for v in values):
+        return None
+    return values
+
+# Yields the raw request body in fixed-size chunks so memory stays bounded.
+# A client that drops mid-body just ends the stream; the bytes already
+# received are kept and the upload can resume from there.
+def request_chunks():
+    while True:
+        try:
+            chunk = request.stream.read(CHUNK_SIZE)
+        except ClientDisconnected:
+            return
+        if not chunk:
+            return
+        yield chunk
+
+# Helper to add an entry to the audit log (written in the background),
+# attributed to the signed-in user unless user_id is given
+def audit(action, user_id=None, **fields):
+    audit_log.record(action, user_id=user_id or session.get('user_id'), ip_address=request.remote_addr, **fields)
+
+# Password hashing sheds load instead of queueing without bound
+@app.errorhandler(password_hashing.HashingOverloaded)
+def hashing_overloaded(e):
+    return jsonify({"error": "Server busy, please retry"}), 503, {'Retry-After': str(e.retry_after)}
+
 # Decorator for private routes
 def login_required(f):
     @wraps(f)
@@ -67,10 +192,17 @@ def login():
     user = user_manager.find_user_by_email(email)
 
     if user and user_manager.verify_password(user['hashed_password'], password):
+        user_manager.rehash_password_if_needed(user['user_id'], user['hashed_password'], password)
+        profile = user_profile(user)
+        # Start a fresh session (new ID for server-side stores) on login
+        session.clear()
         session['user_id'] = user['user_id']
         session['role'] = user['role']
-        return jsonify({"message": "Login successful", "user": row_to_dict(user_manager.find_user_by_id(user['user_id']))}), 200
+        session['user'] = profile
+        audit('login')
+        return jsonify({"message": "Login successful", "user": profile}), 200
     else:
+        audit('login_failed', user_id=user['user_id'] if user else None, details={"email": email})
         return jsonify({"error": "Invalid email or password"}), 401
 
 @app.route('/api/logout', methods=['POST'])
@@ -82,8 +214,16 @@ def logout():
 @app.route('/api/session', methods=['GET'])
 @login_required
 def check_session():
-    user = user_manager.find_user_by_id(session['user_id'])
-    return jsonify({"user": row_to_dict(user)}), 200
+    # The profile is cached in the session at login; older sessions fill it in once
+    profile = session.get('user')
+    if profile is None:
+        user = user_manager.find_user_by_id(session['user_id'])
+        if user is None:
+            session.clear()
+            return jsonify({"error": "Authentication required"}), 401
+        profile = user_profile(user)
+        session['user'] = profile
+    return jsonify({"user": profile}), 200
 
 # === USER ROUTES ===
 
@@ -98,12 +238,26 @@ def get_user(user_id):
 @app.route('/api/users/search', methods=['GET'])
 @login_required
 def search_users():
-    email_query = request.args.get('email', '')
-    if not email_query or len(email_query) < 3:
-        return jsonify({"error": "Email query must be at least 3 characters long"}), 400
-    
-    users = user_manager.search_users_by_email(email_query)
-    return jsonify([row_to_dict(user) for user in users]), 200
+    # `email` is the older name for the query parameter
+    query = request.args.get('q') or request.args.get('email', '')
+    if len(query.strip()) < 3:
+        return jsonify({"error": "Search query must be at least 3 characters long"}), 400
+    try:
+        users, next_cursor = user_manager.search_users(
+            query,
+            cursor=request.args.get('cursor') or None,
+            limit=clamp_limit(request.args.get('limit') or 10),
+        )
+    except ValueError:
+        return jsonify({"error": "Invalid cursor or limit"}), 400
+
+    return jsonify({
+        "users": [
+            {"user_id": user['user_id'], "email": user['email'], "full_name": user['full_name']}
+            for user in users
+        ],
+        "next_cursor": next_cursor,
+    }), 200
 
 # === CASE ROUTES ===
 
@@ -132,12 +286,30 @@ def get_cases():
     user_id = session.get('user_id')
     user_role = session.get('role')
 
-    if user_role == 'judge':
-        cases = cases_manager.get_all_cases()
-    else:
-        cases = cases_manager.get_user_cases(user_id)
-    
-    return jsonify([row_to_dict(case) for case in cases]), 200
+    try:
+        cases, next_cursor = cases_manager.list_cases(
+            user_id=None if user_role == 'judge' else user_id, **case_list_args()
+        )
+    except ValueError:
+        return jsonify({"error": "Invalid pagination or filter parameters"}), 400
+
+    return jsonify({"cases": [row_to_dict(case) for case in cases], "next_cursor": next_cursor}), 200
+
+@app.route('/api/cases/bundle', methods=['GET'])
+@login_required
+def get_cases_bundle():
+    """Dashboard listing: each case with its document count and the caller's access level."""
+    user_id = session.get('user_id')
+    user_role = session.get('role')
+
+    try:
+        cases, next_cursor = cases_manager.list_cases(
+            user_id=None if user_role == 'judge' else user_id, viewer_id=user_id, **case_list_args()
+        )
+    except ValueError:
+        return jsonify({"error": "Invalid pagination or filter parameters"}), 400
+
+    return conditional_json({"cases": [row_to_dict(case) for case in cases], "next_cursor": next_cursor})
 
 @app.route('/api/case/<case_id>', methods=['GET'])
 @login_required
@@ -150,9 +322,41 @@ def get_case(case_id):
 
     case = cases_manager.get_case_by_id(case_id)
     if case:
+        audit('case_viewed', case_id=case_id)
         return jsonify(row_to_dict(case)), 200
     return jsonify({"error": "Case not found"}), 404
 
+@app.route('/api/case/<case_id>/bundle', methods=['GET'])
+@login_required
+def get_case_bundle(case_id):
+    """Case page data in one response: the case, the first page of documents,
+    the permissions and the caller's access level, after a single ACL check."""
+    user_id = session.get('user_id')
+    user_role = session.get('role')
+
+    access_level = permissions_manager.get_user_access_level(case_id, user_id)
+    if user_role != 'judge' and access_level is None:
+        return jsonify({"error": "You do not have access to this case"}), 403
+
+    case = cases_manager.get_case_by_id(case_id)
+    if not case:
+        return jsonify({"error": "Case not found"}), 404
+
+    try:
+        documents, next_cursor = document_manager.list_case_documents(case_id, **pagination_args())
+    except ValueError:
+        return jsonify({"error": "Invalid pagination parameters"}), 400
+    permissions = permissions_manager.get_case_permissions(case_id)
+
+    audit('case_viewed', case_id=case_id)
+    return conditional_json({
+        "case": row_to_dict(case),
+        "access_level": access_level,
+        "documents": [row_to_dict(doc) for doc in documents],
+        "next_cursor": next_cursor,
+        "permissions": [row_to_dict(p) for p in permissions],
+    })
+
 @app.route('/api/case/<case_id>/status', methods=['PUT'])
 @login_required
 def update_case_status(case_id):
@@ -172,6 +376,44 @@ def update_case_status(case_id):
         return jsonify({"message": "Case status updated successfully"}), 200
     return jsonify({"error": "Failed to update case status"}), 500
 
+@app.route('/api/cases/status', methods=['PUT'])
+@login_required
+def update_cases_status():
+    user_id = session.get('user_id')
+    user_role = session.get('role')
+    if user_role not in ['judge', 'advocate']:
+        return jsonify({"error": "You do not have permission to update case status"}), 403
+
+    data = request.get_json()
+    case_ids = id_list(data, 'case_ids')
+    status = data.get('status')
+    if case_ids is None:
+        return jsonify({"error": "case_ids must be a non-empty list"}), 400
+    if not status:
+        return jsonify({"error": "Status is required"}), 400
+    if len(case_ids) > app.config['BULK_MAX_ITEMS']:
+        return jsonify({"error": f"At most {app.config['BULK_MAX_ITEMS']} cases per request"}), 413
+
+    errors = {}
+    if user_role == 'advocate':
+        levels = permissions_manager.get_user_access_levels(case_ids, user_id)
+        for case_id, level in levels.items():
+            if level not in ['sudo', 'view_only']:
+                errors[case_id] = "You do not have permission to update this case status"
+
+    allowed = [case_id for case_id in dict.fromkeys(case_ids) if case_id not in errors]
+    updated = cases_manager.update_cases_status(allowed, status) if allowed else set()
+    if updated is None:
+        return jsonify({"error": "Failed to update case status"}), 500
+
+    results = []
+    for case_id in dict.fromkeys(case_ids):
+        if case_id in updated:
+            results.append({"case_id": case_id, "ok": True})
+        else:
+            results.append({"case_id": case_id, "ok": False, "error": errors.get(case_id, "Case not found")})
+    return jsonify({"results": results, "updated": len(updated), "failed": len(results) - len(updated)}), 200
+
 # === PERMISSIONS ROUTES ===
 
 @app.route('/api/case/<case_id>/permissions', methods=['GET'])
@@ -207,9 +449,55 @@ def grant_case_access(case_id):
         return jsonify({"error": "Invalid access level"}), 400
 
     if permissions_manager.grant_access(case_id, target_user_id, target_access_level):
+        audit('access_granted', case_id=case_id, details={"user_id": target_user_id, "access_level": target_access_level})
         return jsonify({"message": "Access granted successfully"}), 200
     return jsonify({"error": "Failed to grant access"}), 500
 
+@app.route('/api/cases/grant-access', methods=['POST'])
+@login_required
+def grant_cases_access():
+    granter_id = session.get('user_id')
+    granter_role = session.get('role')
+
+    data = request.get_json()
+    case_ids = id_list(data, 'case_ids')
+    user_ids = id_list(data, 'user_ids')
+    target_access_level = data.get('access_level', 'view_only')
+
+    if case_ids is None or user_ids is None:
+        return jsonify({"error": "case_ids and user_ids must be non-empty lists"}), 400
+    if target_access_level not in ['view_only', 'sudo', 'upload_only']:
+        return jsonify({"error": "Invalid access level"}), 400
+    case_ids, user_ids = list(dict.fromkeys(case_ids)), list(dict.fromkeys(user_ids))
+    if len(case_ids) * len(user_ids) > app.config['BULK_MAX_ITEMS']:
+        return jsonify({"error": f"At most {app.config['BULK_MAX_ITEMS']} grants per request"}), 413
+
+    # Every user is granted on every listed case the granter controls
+    if granter_role == 'judge':
+        allowed = set(case_ids)
+    else:
+        levels = permissions_manager.get_user_access_levels(case_ids, granter_id)
+        allowed = {case_id for case_id, level in levels.items() if level == 'sudo'}
+    grants = [
+        (case_id, user_id, target_access_level)
+        for case_id in case_ids if case_id in allowed
+        for user_id in user_ids
+    ]
+    errors = iter(permissions_manager.grant_access_bulk(grants) if grants else [])
+
+    results = []
+    for case_id in case_ids:
+        for user_id in user_ids:
+            error = next(errors) if case_id in allowed else "You do not have permission to grant access to this case"
+            result = {"case_id": case_id, "user_id": user_id, "ok": error is None}
+            if error:
+                result["error"] = error
+            else:
+                audit('access_granted', case_id=case_id, details={"user_id": user_id, "access_level": target_access_level})
+            results.append(result)
+    granted = sum(result["ok"] for result in results)
+    return jsonify({"results": results, "granted": granted, "failed": len(results) - granted}), 200
+
 # === DOCUMENT ROUTES ===
 
 @app.route('/api/case/<case_id>/documents', methods=['GET'])
@@ -221,8 +509,18 @@ def get_documents(case_id):
     if user_role != 'judge' and not permissions_manager.check_access(case_id, user_id):
         return jsonify({"error": "You do not have access to this case"}), 403
 
-    documents = document_manager.get_case_documents(case_id)
-    return jsonify([row_to_dict(doc) for doc in documents]), 200
+    try:
+        documents, next_cursor = document_manager.list_case_documents(
+            case_id,
+            uploader_id=request.args.get('uploader_id') or None,
+            uploaded_from=normalize_timestamp(request.args.get('uploaded_from')),
+            uploaded_to=normalize_timestamp(request.args.get('uploaded_to'), end_of_day=True),
+            **pagination_args()
+        )
+    except ValueError:
+        return jsonify({"error": "Invalid pagination or filter parameters"}), 400
+
+    return jsonify({"documents": [row_to_dict(doc) for doc in documents], "next_cursor": next_cursor}), 200
 
 @app.route('/api/case/<case_id>/upload', methods=['POST'])
 @login_required
@@ -241,22 +539,235 @@ def upload_document(case_id):
     if file.filename == '':
         return jsonify({"error": "No selected file"}), 400
 
-    if file:
-        original_filename = secure_filename(file.filename)
-        # Generate a secure, unique filename
-        timestamp = int(time.time())
-        storage_filename = f"{timestamp}_{case_id}_{user_id}_{original_filename}"
-        storage_path = os.path.join(app.config['UPLOAD_FOLDER'], storage_filename)
-        
-        file.save(storage_path)
+    original_filename = secure_filename(file.filename)
+    # Hash (and compress, if enabled) while streaming to a temp file; identical content is stored once
+    staged = blob_store.ingest(file.stream, choose_encoding(original_filename))
+    metrics.UPLOAD_BYTES.inc(staged.size_bytes)
+    try:
+        doc_id, is_duplicate = document_manager.add_document(
+            case_id, user_id, original_filename,
+            staged.content_hash, staged.size_bytes, blob_store.key_for(staged.content_hash, staged.encoding),
+            store_blob=lambda: blob_store.commit(staged),
+            stored_bytes=staged.stored_bytes, content_encoding=staged.encoding
+        )
+    finally:
+        # No-op once the staged file has been moved into place
+        blob_store.discard(staged)
+
+    if doc_id:
+        document_index.schedule_document(doc_id)
+        preview_pipeline.schedule_document(doc_id)
+        return jsonify({
+            "message": "File uploaded successfully",
+            "doc_id": doc_id,
+            "content_hash": staged.content_hash,
+            "duplicate": is_duplicate,
+        }), 201
+    return jsonify({"error": "Failed to save document record"}), 500
+
+@app.route('/api/case/<case_id>/upload-batch', methods=['POST'])
+@login_required
+def upload_documents(case_id):
+    user_id = session.get('user_id')
+    user_role = session.get('role')
+    access_level = permissions_manager.get_user_access_level(case_id, user_id)
+
+    if user_role != 'judge' and access_level not in ['sudo', 'upload_only']:
+        return jsonify({"error": "You do not have permission to upload to this case"}), 403
+
+    files = [file for file in request.files.getlist('files') if file.filename]
+    if not files:
+        return jsonify({"error": "No files selected"}), 400
+    if len(files) > app.config['BULK_MAX_ITEMS']:
+        return jsonify({"error": f"At most {app.config['BULK_MAX_ITEMS']} files per request"}), 413
+
+    # Hash each file while streaming it to a temp file, then record them all in one transaction
+    staged_files = []
+    try:
+        for file in files:
+            staged = blob_store.ingest(file.stream, choose_encoding(file.filename))
+            metrics.UPLOAD_BYTES.inc(staged.size_bytes)
+            staged_files.append(staged)
+        outcomes = document_manager.add_documents(case_id, user_id, [
+            {
+                "file_name": secure_filename(file.filename),
+                "content_hash": staged.content_hash,
+                "size_bytes": staged.size_bytes,
+                "storage_key": blob_store.key_for(staged.content_hash, staged.encoding),
+                "store_blob": lambda staged=staged: blob_store.commit(staged),
+                "stored_bytes": staged.stored_bytes,
+                "content_encoding": staged.encoding,
+            }
+            for file, staged in zip(files, staged_files)
+        ])
+    finally:
+        # No-op for staged files already moved into place
+        for staged in staged_files:
+            blob_store.discard(staged)
+
+    results = []
+    for file, staged, (doc_id, is_duplicate) in zip(files, staged_files, outcomes):
+        if doc_id:
+            document_index.schedule_document(doc_id)
+            preview_pipeline.schedule_document(doc_id)
+            results.append({
+                "file_name": file.filename, "ok": True, "doc_id": doc_id,
+                "content_hash": staged.content_hash, "duplicate": is_duplicate,
+            })
+        else:
+            results.append({"file_name": file.filename, "ok": False, "error": "Failed to save document record"})
+    uploaded = sum(result["ok"] for result in results)
+    return jsonify({"results": results, "uploaded": uploaded, "failed": len(results) - uploaded}), 200
+
+# === SEARCH ROUTES ===
+
+@app.route('/api/search', methods=['GET'])
+@login_required
+def search_documents():
+    user_id = session.get('user_id')
+    user_role = session.get('role')
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({"error": "Search query is required"}), 400
+    try:
+        limit = clamp_limit(request.args.get('limit'))
+    except ValueError:
+        return jsonify({"error": "Invalid limit"}), 400
+
+    results = document_index.search_documents(
+        query,
+        user_id=None if user_role == 'judge' else user_id,
+        case_id=request.args.get('case_id') or None,
+        limit=limit,
+    )
+    return jsonify({"results": results}), 200
+
+# === RESUMABLE UPLOAD ROUTES ===
+# Large files are sent as a series of PATCH requests, each carrying the byte
+# offset it starts at, in the spirit of the tus protocol.
+
+@app.route('/api/case/<case_id>/uploads', methods=['POST'])
+@login_required
+def create_upload(case_id):
+    user_id = session.get('user_id')
+    user_role = session.get('role')
+    access_level = permissions_manager.get_user_access_level(case_id, user_id)
+
+    if user_role != 'judge' and access_level not in ['sudo', 'upload_only']:
+        return jsonify({"error": "You do not have permission to upload to this case"}), 403
 
-        doc_id = document_manager.add_document(case_id, user_id, original_filename, storage_path)
+    data = request.get_json()
+    file_name = secure_filename(data.get('file_name') or '')
+    total_size = data.get('size')
+
+    if not file_name:
+        return jsonify({"error": "File name is required"}), 400
+    if not isinstance(total_size, int) or isinstance(total_size, bool) or total_size < 0:
+        return jsonify({"error": "Size must be a non-negative integer"}), 400
+    if total_size > app.config['MAX_UPLOAD_SIZE']:
+        return jsonify({"error": "File exceeds the maximum upload size"}), 413
+
+    for expired_id in upload_manager.delete_expired_upload_sessions(app.config['UPLOAD_SESSION_MAX_AGE_HOURS']):
+        blob_store.discard_partial(expired_id)
+
+    upload_id = upload_manager.create_upload_session(case_id, user_id, file_name, total_size)
+    if not upload_id:
+        return jsonify({"error": "Failed to start upload"}), 500
+
+    response = jsonify({"upload_id": upload_id, "offset": 0, "size": total_size})
+    response.headers['Location'] = f"/api/uploads/{upload_id}"
+    response.headers['Upload-Offset'] = '0'
+    response.headers['Upload-Length'] = str(total_size)
+    return response, 201
+
+@app.route('/api/uploads/<upload_id>', methods=['GET'])
+@login_required
+def get_upload(upload_id):
+    upload = upload_manager.get_upload_session(upload_id)
+    if not upload or upload['user_id'] != session.get('user_id'):
+        return jsonify({"error": "Upload not found"}), 404
+
+    response = jsonify({"upload_id": upload_id, "offset": upload['received_bytes'], "size": upload['total_size']})
+    response.headers['Upload-Offset'] = str(upload['received_bytes'])
+    response.headers['Upload-Length'] = str(upload['total_size'])
+    response.headers['Cache-Control'] = 'no-store'
+    return response, 200
+
+@app.route('/api/uploads/<upload_id>', methods=['PATCH'])
+@login_required
+def append_upload(upload_id):
+    user_id = session.get('user_id')
+    upload = upload_manager.get_upload_session(upload_id)
+    if not upload or upload['user_id'] != user_id:
+        return jsonify({"error": "Upload not found"}), 404
+
+    try:
+        offset = int(request.headers['Upload-Offset'])
+    except (KeyError, ValueError):
+        return jsonify({"error": "Upload-Offset header is required"}), 400
+
+    if offset != upload['received_bytes']:
+        response = jsonify({"error": "Offset does not match the upload", "offset": upload['received_bytes']})
+        response.headers['Upload-Offset'] = str(upload['received_bytes'])
+        return response, 409
+
+    try:
+        new_offset = blob_store.write_partial(upload_id, offset, request_chunks(), upload['total_size'] - offset)
+    except PartialUploadBusy:
+        return jsonify({"error": "Another request is writing to this upload"}), 409
+    except ValueError:
+        return jsonify({"error": "Data exceeds the declared upload size"}), 413
+
+    metrics.UPLOAD_BYTES.inc(new_offset - offset)
+    upload_manager.update_upload_offset(upload_id, new_offset)
+    if new_offset < upload['total_size']:
+        return '', 204, {'Upload-Offset': str(new_offset)}
+
+    # Claim the upload so a retried final PATCH cannot create a second document
+    if not upload_manager.claim_upload_session(upload_id):
+        return jsonify({"error": "Upload already completed"}), 409
+
+    doc_id = None
+    try:
+        staged = blob_store.stage_partial(upload_id, choose_encoding(upload['file_name']))
+        try:
+            doc_id, is_duplicate = document_manager.add_document(
+                upload['case_id'], user_id, upload['file_name'],
+                staged.content_hash, staged.size_bytes, blob_store.key_for(staged.content_hash, staged.encoding),
+                store_blob=lambda: blob_store.commit(staged),
+                stored_bytes=staged.stored_bytes, content_encoding=staged.encoding
+            )
+        finally:
+            blob_store.discard(staged)
+    finally:
         if doc_id:
-            return jsonify({"message": "File uploaded successfully", "doc_id": doc_id}), 201
+            upload_manager.delete_upload_session(upload_id)
+            blob_store.discard_partial(upload_id)
         else:
-            # Clean up uploaded file if db insert fails
-            os.remove(storage_path)
-            return jsonify({"error": "Failed to save document record"}), 500
+            # Keep the received data so the client can send the final PATCH again
+            upload_manager.release_upload_session(upload_id)
+
+    if doc_id:
+        document_index.schedule_document(doc_id)
+        preview_pipeline.schedule_document(doc_id)
+        return jsonify({
+            "message": "File uploaded successfully",
+            "doc_id": doc_id,
+            "content_hash": staged.content_hash,
+            "duplicate": is_duplicate,
+        }), 201, {'Upload-Offset': str(new_offset)}
+    return jsonify({"error": "Failed to save document record"}), 500
+
+@app.route('/api/uploads/<upload_id>', methods=['DELETE'])
+@login_required
+def cancel_upload(upload_id):
+    upload = upload_manager.get_upload_session(upload_id)
+    if not upload or upload['user_id'] != session.get('user_id'):
+        return jsonify({"error": "Upload not found"}), 404
+
+    upload_manager.delete_upload_session(upload_id)
+    blob_store.discard_partial(upload_id)
+    return '', 204
 
 @app.route('/api/document/<doc_id>/download', methods=['GET'])
 @login_required
@@ -272,30 +783,250 @@ def download_document(doc_id):
     if user_role != 'judge' and not permissions_manager.check_access(case_id, user_id):
         return jsonify({"error": "You do not have permission to download this file"}), 403
 
-    storage_path = document['storage_path']
-    directory = os.path.dirname(storage_path)
-    filename = os.path.basename(storage_path)
+    storage_key = document['storage_key']
+    content_encoding = document['content_encoding']
+
+    # Compressed blobs are decompressed (or passed through) by the app, so
+    # they are never handed to S3 or the proxy directly
+    accel_uri = None
+    if content_encoding is None:
+        # Remote backends can hand out a short-lived URL so bytes bypass Flask
+        presigned_url = blob_store.presigned_url(storage_key, document['file_name'])
+        if presigned_url:
+            audit('document_downloaded', case_id=case_id, doc_id=doc_id, details={"file_name": document['file_name']})
+            return redirect(presigned_url)
+
+        accel_prefix = app.config['DOWNLOAD_ACCEL_REDIRECT_PREFIX']
+        accel_uri = accel_prefix.rstrip('/') + '/' + storage_key if accel_prefix else None
+
+    # The content hash is a natural strong ETag: identical bytes, identical tag
+    try:
+        response = send_blob(blob_store, storage_key, document['file_name'], document['content_hash'],
+                             accel_redirect_uri=accel_uri, content_encoding=content_encoding,
+                             size_bytes=document['size_bytes'])
+    except FileNotFoundError:
+        return jsonify({"error": "Document file is missing"}), 404
+    if response.status_code in (200, 206):
+        details = {"file_name": document['file_name']}
+        if response.status_code == 206:
+            details["range"] = request.headers.get('Range')
+        audit('document_downloaded', case_id=case_id, doc_id=doc_id, details=details)
+        if accel_uri is None and response.content_length:
+            metrics.DOWNLOAD_BYTES.inc(response.content_length)
+    return response
+
+@app.route('/api/case/<case_id>/export.zip', methods=['GET'])
+@login_required
+def export_case(case_id):
+    user_id = session.get('user_id')
+    user_role = session.get('role')
+
+    if user_role != 'judge' and not permissions_manager.check_access(case_id, user_id):
+        return jsonify({"error": "You do not have access to this case"}), 403
+
+    case = cases_manager.get_case_by_id(case_id)
+    if not case:
+        return jsonify({"error": "Case not found"}), 404
+
+    # Streamed entry by entry; nothing is buffered, and Range resumes work
+    # as long as the case's documents are unchanged
+    documents = document_manager.get_case_documents(case_id)
+    archive, etag = build_case_archive(case, documents, blob_store)
+    download_name = f"{secure_filename(case['case_name']) or 'case'}-{case_id[:8]}.zip"
+    response = send_stream(archive.read_range, archive.length, download_name, etag, 'application/zip')
+    if response.status_code in (200, 206):
+        details = {"documents": len(documents)}
+        if response.status_code == 206:
+            details["range"] = request.headers.get('Range')
+        audit('case_exported', case_id=case_id, details=details)
+        if response.content_length:
+            metrics.DOWNLOAD_BYTES.inc(response.content_length)
+    return response
+
+@app.route('/api/document/<doc_id>/preview', methods=['GET'])
+@login_required
+def get_document_preview(doc_id):
+    user_id = session.get('user_id')
+    user_role = session.get('role')
+
+    size = request.args.get('size', 'medium')
+    if size not in PREVIEW_SIZES:
+        return jsonify({"error": f"size must be one of {', '.join(PREVIEW_SIZES)}"}), 400
+
+    document = document_manager.get_document_by_id(doc_id)
+    if not document:
+        return jsonify({"error": "Document not found"}), 404
+
+    if user_role != 'judge' and not permissions_manager.check_access(document['case_id'], user_id):
+        return jsonify({"error": "You do not have permission to view this file"}), 403
+
+    # Rendered in the background after upload; rendered here only if evicted
+    path = preview_pipeline.get_preview(document, size)
+    if path is None:
+        return jsonify({"error": "No preview available for this document"}), 404
+    try:
+        return send_derivative(path, PREVIEW_MIMETYPE, f"{document['content_hash']}-{size}",
+                               app.config['PREVIEW_MAX_AGE'])
+    except FileNotFoundError:
+        # Evicted between lookup and send
+        return jsonify({"error": "Preview not ready, try again"}), 503
+
+@app.route('/api/document/<doc_id>', methods=['DELETE'])
+@login_required
+def delete_document(doc_id):
+    user_id = session.get('user_id')
+    user_role = session.get('role')
+
+    document = document_manager.get_document_by_id(doc_id)
+    if not document:
+        return jsonify({"error": "Document not found"}), 404
 
-    return send_from_directory(directory, filename, as_attachment=True, attachment_filename=document['file_name'])
+    access_level = permissions_manager.get_user_access_level(document['case_id'], user_id)
+    if user_role != 'judge' and access_level != 'sudo':
+        return jsonify({"error": "You do not have permission to delete this document"}), 403
 
-# === AI SUMMARY ROUTE ===
+    # The stored file is only removed once no other document references it
+    def remove_blob(content_hash, storage_key):
+        blob_store.delete(storage_key)
+        preview_pipeline.discard_previews(content_hash)
+
+    if document_manager.delete_document(doc_id, remove_blob=remove_blob):
+        return jsonify({"message": "Document deleted successfully"}), 200
+    return jsonify({"error": "Failed to delete document"}), 500
+
+# === AUDIT ROUTES ===
+
+@app.route('/api/case/<case_id>/audit', methods=['GET'])
+@login_required
+def get_case_audit_trail(case_id):
+    user_id = session.get('user_id')
+    user_role = session.get('role')
+
+    if user_role != 'judge' and permissions_manager.get_user_access_level(case_id, user_id) != 'sudo':
+        return jsonify({"error": "You do not have permission to view this case's audit trail"}), 403
+
+    # Entries buffered by this worker are written first; other workers'
+    # appear within AUDIT_FLUSH_INTERVAL
+    audit_log.flush()
+    try:
+        entries, next_cursor = audit_log.get_case_trail(
+            case_id, action=request.args.get('action') or None, **pagination_args()
+        )
+    except ValueError:
+        return jsonify({"error": "Invalid pagination parameters"}), 400
+
+    entries = [row_to_dict(entry) for entry in entries]
+    for entry in entries:
+        entry['details'] = json.loads(entry['details']) if entry['details'] else None
+    return jsonify({"entries": entries, "next_cursor": next_cursor}), 200
+
+# === CHANGE FEED ===
+# Server-sent events for case creation, status changes, new documents and
+# access grants, so pages can apply changes instead of re-fetching lists.
+
+@app.route('/api/events', methods=['GET'])
+@login_required
+def get_events():
+    # Browsers send Last-Event-ID when reconnecting; the query parameter is
+    # for clients that saved their position across page loads
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        return jsonify({"error": "Invalid Last-Event-ID"}), 400
+
+    # The stream outlives the request context, so it gets the user up front
+    events = change_feed.stream_events(session.get('user_id'), session.get('role') == 'judge', last_event_id)
+    response = Response(events, mimetype='text/event-stream')
+    response.cache_control.no_cache = True
+    # Stops nginx from buffering the stream
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+# === AI SUMMARY ROUTES ===
+# Summaries are generated by background workers (functions/ai/summary_jobs.py).
+# Clients enqueue a job and then poll, or long-poll with ?wait=<seconds>.
+
+def summary_job_to_dict(job):
+    return {
+        "job_id": job['job_id'],
+        "case_id": job['case_id'],
+        "status": job['status'],
+        "summary": job['result'],
+        "error": job['error'] if job['status'] == 'failed' else None,
+        "created_at": job['created_at'],
+        "finished_at": job['finished_at'],
+    }
+
+def summary_wait_seconds():
+    try:
+        wait = float(request.args.get('wait', 0))
+    except ValueError:
+        wait = 0
+    return max(0, min(wait, app.config['SUMMARY_MAX_WAIT_SECONDS']))
+
+@app.route('/api/case/<case_id>/summary', methods=['POST'])
+@login_required
+def request_case_summary(case_id):
+    user_id = session.get('user_id')
+    user_role = session.get('role')
+
+    if user_role not in ['judge', 'advocate']:
+        return jsonify({"error": "Only judges and advocates can generate case summaries"}), 403
+    if user_role != 'judge' and not permissions_manager.check_access(case_id, user_id):
+        return jsonify({"error": "You do not have access to this case"}), 403
+
+    # Identical concurrent requests share one job
+    job, _ = summary_jobs.enqueue_summary(case_id, user_id)
+    return jsonify(summary_job_to_dict(job)), 202, {'Location': f"/api/summary-jobs/{job['job_id']}"}
+
+@app.route('/api/summary-jobs/<job_id>', methods=['GET'])
+@login_required
+def get_summary_job(job_id):
+    user_id = session.get('user_id')
+    user_role = session.get('role')
+
+    job = summary_jobs.get_job(job_id)
+    if not job:
+        return jsonify({"error": "Summary job not found"}), 404
+    if user_role != 'judge' and not permissions_manager.check_access(job['case_id'], user_id):
+        return jsonify({"error": "You do not have access to this case"}), 403
+
+    wait = summary_wait_seconds()
+    if wait:
+        job = summary_jobs.wait_for_job(job_id, wait)
+    return jsonify(summary_job_to_dict(job)), 200
 
 @app.route('/api/case/<case_id>/summary', methods=['GET'])
 @login_required
 def get_case_summary(case_id):
+    """Compatibility route: enqueues (or joins) a job and waits for it briefly."""
     user_id = session.get('user_id')
     user_role = session.get('role')
 
     if user_role not in ['judge', 'advocate']:
         return jsonify({"error": "Only judges and advocates can generate case summaries"}), 403
+    if user_role != 'judge' and not permissions_manager.check_access(case_id, user_id):
+        return jsonify({"error": "You do not have access to this case"}), 403
 
-    from functions.ai.ai_func import generate_case_summary
-    summary = generate_case_summary(case_id, user_id)
+    job, _ = summary_jobs.enqueue_summary(case_id, user_id)
+    job = summary_jobs.wait_for_job(job['job_id'], app.config['SUMMARY_MAX_WAIT_SECONDS'])
 
-    if summary == "Access denied":
-        return jsonify({"error": "You do not have access to this case"}), 403
+    if job['status'] == 'done':
+        return jsonify({"summary": job['result']}), 200
+    if job['status'] == 'failed':
+        return jsonify({"error": f"Error generating summary: {job['error']}"}), 500
+    return jsonify(summary_job_to_dict(job)), 202, {'Location': f"/api/summary-jobs/{job['job_id']}"}
+
+# === MONITORING ROUTES ===
 
-    return jsonify({"summary": summary}), 200
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus scrape endpoint. Numbers are for the worker process that answers."""
+    token = app.config['METRICS_TOKEN']
+    if token and not hmac.compare_digest(request.headers.get('Authorization', ''), f"Bearer {token}"):
+        return jsonify({"error": "Authentication required"}), 401
+    return metrics.metrics_response()
 
 if __name__ == '__main__':
     if not os.path.exists(UPLOAD_FOLDER):
@@ -0,0 +1,54 @@
+"""Helpers shared by the benchmark scripts."""
+import os
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Where seed.py writes its database, blobs and manifest unless told otherwise
+DEFAULT_DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+def use_backend(database_path=None, upload_folder=None, **environ):
+    """Points the backend at a benchmark database and makes it importable.
+
+    Must run before anything from the backend is imported, since the modules
+    read their configuration from the environment at import time.
+    """
+    if database_path:
+        os.environ['DATABASE_PATH'] = database_path
+    if upload_folder:
+        os.environ['UPLOAD_FOLDER'] = upload_folder
+    for key, value in environ.items():
+        os.environ.setdefault(key, str(value))
+    for path in (os.path.join(BACKEND_DIR, 'app'), os.path.join(BACKEND_DIR, 'DataBase'), BACKEND_DIR):
+        if path not in sys.path:
+            sys.path.insert(0, path)
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+def environment_info():
+    """Describes the commit and machine a result was measured on."""
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = bool(subprocess.run(
+            ['git', 'status', '--porcelain', '--untracked-files=no'],
+            cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        commit, dirty = None, None
+    return {
+        "git_commit": commit,
+        "git_dirty": dirty,
+        "recorded_at": datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
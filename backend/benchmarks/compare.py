@@ -0,0 +1,80 @@
+"""Compares two loadgen.py reports and flags regressions.
+
+A route regresses if its p95 latency grows by more than --threshold (and
+by more than --min-ms), its throughput falls by more than --threshold, or
+it runs more SQL statements per request. Exits with status 1 if any route
+regressed, so it can gate CI.
+
+    python benchmarks/compare.py before.json after.json --threshold 0.15
+"""
+import argparse
+import json
+import sys
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('baseline')
+    parser.add_argument('current')
+    parser.add_argument('--threshold', type=float, default=0.10, help="Allowed relative change (0.10 = 10%%)")
+    parser.add_argument('--min-ms', type=float, default=1.0, help="Ignore p95 changes smaller than this")
+    parser.add_argument('--json', action='store_true', help="Print the comparison as JSON")
+    return parser.parse_args()
+
+def relative_change(before, after):
+    if before in (None, 0) or after is None:
+        return None
+    return round((after - before) / before, 4)
+
+def compare_route(before, after, args):
+    p95_change = relative_change(before["p95_ms"], after["p95_ms"])
+    rps_change = relative_change(before["throughput_rps"], after["throughput_rps"])
+    reasons = []
+    if p95_change is not None and p95_change > args.threshold and after["p95_ms"] - before["p95_ms"] > args.min_ms:
+        reasons.append("p95 latency")
+    if rps_change is not None and rps_change < -args.threshold:
+        reasons.append("throughput")
+    if (before["queries_per_request"] is not None and after["queries_per_request"] is not None
+            and after["queries_per_request"] > before["queries_per_request"] + 0.05):
+        reasons.append("queries per request")
+    return {
+        "p95_ms": [before["p95_ms"], after["p95_ms"]],
+        "p95_change": p95_change,
+        "throughput_rps": [before["throughput_rps"], after["throughput_rps"]],
+        "throughput_change": rps_change,
+        "queries_per_request": [before["queries_per_request"], after["queries_per_request"]],
+        "regressions": reasons,
+    }
+
+def main():
+    args = parse_args()
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+
+    rows = {"TOTAL": compare_route(baseline["totals"], current["totals"], args)}
+    for route in sorted(set(baseline["routes"]) & set(current["routes"])):
+        rows[route] = compare_route(baseline["routes"][route], current["routes"][route], args)
+    regressed = sorted(route for route, row in rows.items() if row["regressions"])
+
+    if args.json:
+        print(json.dumps({
+            "baseline": baseline["environment"].get("git_commit"),
+            "current": current["environment"].get("git_commit"),
+            "routes": rows,
+            "regressed": regressed,
+        }, indent=2))
+    else:
+        print(f"baseline {baseline['environment'].get('git_commit')}  current {current['environment'].get('git_commit')}")
+        print(f"{'route':<44} {'p95 ms':>19} {'change':>8} {'rps change':>11} {'q/req':>13}")
+        for route, row in rows.items():
+            before, after = row["p95_ms"]
+            queries = '{}->{}'.format(*row["queries_per_request"])
+            p95_change = f"{row['p95_change']:+.0%}" if row["p95_change"] is not None else '-'
+            rps_change = f"{row['throughput_change']:+.0%}" if row["throughput_change"] is not None else '-'
+            flag = '  REGRESSED: ' + ', '.join(row["regressions"]) if row["regressions"] else ''
+            print(f"{route:<44} {str(before):>9}->{str(after):<9} {p95_change:>8} {rps_change:>11} {queries:>13}{flag}")
+    sys.exit(1 if regressed else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,526 @@
+"""Concurrent load generator covering every API route.
+
+Each client thread logs in as a random seeded user (see seed.py) and then
+issues a weighted mix of requests until the time is up. The report covers
+each route and the whole run: throughput, p50/p95/p99 latency, status codes
+and SQL statements per request (from the X-DB-Queries header). It is JSON,
+so runs from different commits can be diffed with compare.py.
+
+    python benchmarks/loadgen.py --clients 16 --duration 60 --output before.json
+    python benchmarks/loadgen.py --gunicorn 4 --clients 32 --output gunicorn.json
+    python benchmarks/loadgen.py --url http://127.0.0.1:5001 --mix read
+
+The default target runs the app in-process through the Flask test client.
+--gunicorn starts a real gunicorn server on the seeded database, and --url
+drives a server that is already running (start it with DB_COUNT_QUERIES=1
+to get query counts). The write mix changes the dataset; reseed to compare
+like with like.
+"""
+import argparse
+import http.cookiejar
+import importlib.util
+import io
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+
+from common import BACKEND_DIR, DEFAULT_DATA_DIR, environment_info, percentile, use_backend
+
+# Relative weight of each operation. Operations may make several requests.
+MIXES = {
+    "default": {
+        "session": 5, "list_cases": 15, "get_case": 10, "list_documents": 10, "permissions": 5,
+        "get_user": 3, "search_users": 5, "search_documents": 8, "download": 8,
+        "update_status": 2, "grant_access": 2, "bulk_grant": 1, "bulk_status": 1, "create_case": 1,
+        "upload": 3, "upload_batch": 1, "resumable_upload": 1, "delete_document": 1,
+        "summary": 1, "summary_legacy": 1, "login": 1, "register": 1,
+    },
+    "read": {
+        "session": 5, "list_cases": 15, "get_case": 10, "list_documents": 10, "permissions": 5,
+        "get_user": 3, "search_users": 5, "search_documents": 8, "download": 8,
+    },
+}
+
+SEARCH_TERMS = ("contract", "breach", "warranty", "evidence", "settlement", "tenant", "appeal", "witness", "exhibit")
+NAME_PREFIXES = ("pat", "sha", "gup", "menon", "kha", "user1", "judge", "wong", "ver", "priya", "olivia")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR, help="Directory holding seed.py's manifest.json")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument('--url', help="Base URL of a running server")
+    target.add_argument('--gunicorn', type=int, metavar='WORKERS', help="Start gunicorn with this many workers")
+    parser.add_argument('--threads', type=int, default=4, help="Threads per gunicorn worker")
+    parser.add_argument('--clients', type=int, default=8, help="Concurrent client threads")
+    parser.add_argument('--duration', type=float, default=30.0, help="Seconds of measured load")
+    parser.add_argument('--warmup', type=float, default=3.0, help="Seconds of unmeasured load first")
+    parser.add_argument('--mix', choices=sorted(MIXES), default='default')
+    parser.add_argument('--judge-ratio', type=float, default=0.1, help="Fraction of clients logged in as judges")
+    parser.add_argument('--random-seed', type=int, default=1)
+    parser.add_argument('--output', help="Write the JSON report to this file")
+    parser.add_argument('--json', action='store_true', help="Print the JSON report instead of a table")
+    return parser.parse_args()
+
+class Response:
+    def __init__(self, status, headers, body):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    def json(self):
+        try:
+            return json.loads(self.body)
+        except ValueError:
+            return None
+
+class InProcessClient:
+    """Sends requests through the Flask test client, keeping its own cookies."""
+
+    def __init__(self, app):
+        self.http = app.test_client()
+
+    def request(self, method, path, json_body=None, files=None, body=None, headers=None):
+        kwargs = {"headers": headers or {}}
+        if json_body is not None:
+            kwargs["json"] = json_body
+        elif files is not None:
+            kwargs["data"] = {field: [(io.BytesIO(data), name) for name, data in items] for field, items in files.items()}
+            kwargs["content_type"] = 'multipart/form-data'
+        elif body is not None:
+            kwargs["data"] = body
+        response = self.http.open(path, method=method, **kwargs)
+        data = response.get_data()
+        response.close()
+        return Response(response.status_code, response.headers, data)
+
+class HttpClient:
+    """Sends requests over HTTP with urllib, keeping its own cookies."""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+
+    def request(self, method, path, json_body=None, files=None, body=None, headers=None):
+        headers = dict(headers or {})
+        if json_body is not None:
+            body = json.dumps(json_body).encode('utf-8')
+            headers['Content-Type'] = 'application/json'
+        elif files is not None:
+            body, headers['Content-Type'] = encode_multipart(files)
+        request = urllib.request.Request(self.base_url + path, data=body, method=method, headers=headers)
+        try:
+            with self.opener.open(request, timeout=60) as response:
+                return Response(response.status, response.headers, response.read())
+        except urllib.error.HTTPError as e:
+            return Response(e.code, e.headers, e.read())
+
+def encode_multipart(files):
+    boundary = uuid.uuid4().hex
+    parts = []
+    for field, items in files.items():
+        for name, data in items:
+            parts.append(
+                f'--{boundary}\r\nContent-Disposition: form-data; name="{field}"; filename="{name}"\r\n'
+                f'Content-Type: application/octet-stream\r\n\r\n'.encode('utf-8') + data + b'\r\n'
+            )
+    parts.append(f'--{boundary}--\r\n'.encode('utf-8'))
+    return b''.join(parts), f'multipart/form-data; boundary={boundary}'
+
+class Recorder:
+    """Collects latency, status and query counts per route."""
+
+    def __init__(self):
+        self.routes = {}
+        self.lock = threading.Lock()
+        self.recording = False
+
+    def record(self, route, elapsed, status, queries):
+        if not self.recording:
+            return
+        with self.lock:
+            stats = self.routes.setdefault(route, {"latencies": [], "statuses": {}, "queries": []})
+            stats["latencies"].append(elapsed)
+            stats["statuses"][status] = stats["statuses"].get(status, 0) + 1
+            if queries is not None:
+                stats["queries"].append(queries)
+
+    def report(self, duration):
+        routes = {route: summarize(stats, duration) for route, stats in sorted(self.routes.items())}
+        merged = {"latencies": [], "statuses": {}, "queries": []}
+        for stats in self.routes.values():
+            merged["latencies"] += stats["latencies"]
+            merged["queries"] += stats["queries"]
+            for status, count in stats["statuses"].items():
+                merged["statuses"][status] = merged["statuses"].get(status, 0) + count
+        return summarize(merged, duration), routes
+
+def summarize(stats, duration):
+    latencies = stats["latencies"]
+    errors = sum(count for status, count in stats["statuses"].items() if status == 'error' or int(status) >= 500)
+
+    def ms(value):
+        return round(value * 1000, 2) if value is not None else None
+
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / duration, 2),
+        "p50_ms": ms(percentile(latencies, 0.50)),
+        "p95_ms": ms(percentile(latencies, 0.95)),
+        "p99_ms": ms(percentile(latencies, 0.99)),
+        "max_ms": ms(max(latencies) if latencies else None),
+        "queries_per_request": round(sum(stats["queries"]) / len(stats["queries"]), 2) if stats["queries"] else None,
+        "statuses": {str(status): count for status, count in sorted(stats["statuses"].items(), key=str)},
+    }
+
+class VirtualUser:
+    """One logged-in client working through the operation mix."""
+
+    def __init__(self, client, recorder, manifest, rng, is_judge):
+        self.client = client
+        self.recorder = recorder
+        self.manifest = manifest
+        self.rng = rng
+        self.is_judge = is_judge
+        self.user_id = None
+        self.case_ids = []
+        self.documents = {}
+        self.uploaded = []
+        self.known_users = []
+
+    def call(self, route, method, path, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = self.client.request(method, path, **kwargs)
+        except (OSError, urllib.error.URLError):
+            self.recorder.record(route, time.perf_counter() - started, 'error', None)
+            return Response(0, {}, b'')
+        elapsed = time.perf_counter() - started
+        queries = response.headers.get('X-DB-Queries')
+        self.recorder.record(route, elapsed, response.status, int(queries) if queries is not None else None)
+        return response
+
+    def email(self):
+        counts = self.manifest["counts"]
+        if self.is_judge and counts["judges"]:
+            return self.manifest["judge_email"].format(self.rng.randrange(counts["judges"]))
+        return self.manifest["user_email"].format(self.rng.randrange(counts["users"]))
+
+    def login(self):
+        response = self.call("POST /api/login", 'POST', '/api/login',
+                             json_body={"email": self.email(), "password": self.manifest["password"]})
+        if response.status != 200:
+            return False
+        self.user_id = response.json()["user"]["user_id"]
+        self.refresh_cases()
+        return True
+
+    def refresh_cases(self):
+        response = self.call("GET /api/cases", 'GET', '/api/cases?limit=50')
+        if response.status == 200:
+            self.case_ids = [case["case_id"] for case in response.json()["cases"]]
+
+    def pick_case(self):
+        return self.rng.choice(self.case_ids) if self.case_ids else None
+
+    def pick_document(self):
+        case_id = self.pick_case()
+        if case_id is None:
+            return None
+        if case_id not in self.documents:
+            self.op_list_documents(case_id)
+        docs = self.documents.get(case_id)
+        return self.rng.choice(docs) if docs else None
+
+    def op_session(self):
+        self.call("GET /api/session", 'GET', '/api/session')
+
+    def op_list_cases(self):
+        query = {"limit": 50}
+        if self.rng.random() < 0.3:
+            query["status"] = self.rng.choice(['Open', 'Closed'])
+        response = self.call("GET /api/cases", 'GET', '/api/cases?' + urllib.parse.urlencode(query))
+        next_cursor = response.json().get("next_cursor") if response.status == 200 else None
+        if next_cursor and self.rng.random() < 0.5:
+            query["cursor"] = next_cursor
+            self.call("GET /api/cases", 'GET', '/api/cases?' + urllib.parse.urlencode(query))
+
+    def op_get_case(self):
+        case_id = self.pick_case()
+        if case_id:
+            self.call("GET /api/case/<case_id>", 'GET', f'/api/case/{case_id}')
+
+    def op_list_documents(self, case_id=None):
+        case_id = case_id or self.pick_case()
+        if case_id:
+            response = self.call("GET /api/case/<case_id>/documents", 'GET', f'/api/case/{case_id}/documents?limit=50')
+            if response.status == 200:
+                self.documents[case_id] = [doc["doc_id"] for doc in response.json()["documents"]]
+
+    def op_permissions(self):
+        case_id = self.pick_case()
+        if case_id:
+            response = self.call("GET /api/case/<case_id>/permissions", 'GET', f'/api/case/{case_id}/permissions')
+            if response.status == 200:
+                self.known_users = [p["user_id"] for p in response.json()][:50]
+
+    def op_get_user(self):
+        user_id = self.rng.choice(self.known_users) if self.known_users else self.user_id
+        self.call("GET /api/user/<user_id>", 'GET', f'/api/user/{user_id}')
+
+    def op_search_users(self):
+        query = urllib.parse.urlencode({"q": self.rng.choice(NAME_PREFIXES)})
+        response = self.call("GET /api/users/search", 'GET', f'/api/users/search?{query}')
+        if response.status == 200:
+            self.known_users += [user["user_id"] for user in response.json()["users"]]
+            self.known_users = self.known_users[-50:]
+
+    def op_search_documents(self):
+        words = self.rng.sample(SEARCH_TERMS, self.rng.choice((1, 1, 2)))
+        query = urllib.parse.urlencode({"q": ' '.join(words), "limit": 20})
+        self.call("GET /api/search", 'GET', f'/api/search?{query}')
+
+    def op_download(self):
+        doc_id = self.pick_document()
+        if doc_id:
+            self.call("GET /api/document/<doc_id>/download", 'GET', f'/api/document/{doc_id}/download')
+
+    def op_update_status(self):
+        case_id = self.pick_case()
+        if case_id:
+            self.call("PUT /api/case/<case_id>/status", 'PUT', f'/api/case/{case_id}/status',
+                      json_body={"status": self.rng.choice(['Open', 'In Progress'])})
+
+    def op_grant_access(self):
+        case_id = self.pick_case()
+        if case_id and self.known_users:
+            self.call("POST /api/case/<case_id>/grant-access", 'POST', f'/api/case/{case_id}/grant-access',
+                      json_body={"user_id": self.rng.choice(self.known_users), "access_level": "view_only"})
+
+    def op_bulk_grant(self):
+        if self.case_ids and self.known_users:
+            self.call("POST /api/cases/grant-access", 'POST', '/api/cases/grant-access', json_body={
+                "case_ids": self.rng.sample(self.case_ids, min(3, len(self.case_ids))),
+                "user_ids": self.rng.sample(self.known_users, min(5, len(self.known_users))),
+                "access_level": "view_only",
+            })
+
+    def op_bulk_status(self):
+        if self.case_ids:
+            self.call("PUT /api/cases/status", 'PUT', '/api/cases/status', json_body={
+                "case_ids": self.rng.sample(self.case_ids, min(5, len(self.case_ids))),
+                "status": self.rng.choice(['Open', 'In Progress']),
+            })
+
+    def op_create_case(self):
+        response = self.call("POST /api/cases", 'POST', '/api/cases',
+                             json_body={"case_name": f"Load test {uuid.uuid4().hex[:8]}"})
+        if response.status == 201:
+            self.case_ids.append(response.json()["case_id"])
+
+    def document_body(self):
+        words = [self.rng.choice(SEARCH_TERMS) for _ in range(self.rng.randrange(20, 200))]
+        return ' '.join(words + [uuid.uuid4().hex]).encode('utf-8')
+
+    def op_upload(self):
+        case_id = self.pick_case()
+        if case_id:
+            response = self.call("POST /api/case/<case_id>/upload", 'POST', f'/api/case/{case_id}/upload',
+                                 files={"file": [("load.txt", self.document_body())]})
+            if response.status == 201:
+                self.uploaded.append(response.json()["doc_id"])
+
+    def op_upload_batch(self):
+        case_id = self.pick_case()
+        if case_id:
+            files = [(f"batch-{i}.txt", self.document_body()) for i in range(3)]
+            response = self.call("POST /api/case/<case_id>/upload-batch", 'POST',
+                                 f'/api/case/{case_id}/upload-batch', files={"files": files})
+            if response.status == 200:
+                self.uploaded += [r["doc_id"] for r in response.json()["results"] if r["ok"]]
+
+    def op_resumable_upload(self):
+        case_id = self.pick_case()
+        if not case_id:
+            return
+        data = self.document_body()
+        response = self.call("POST /api/case/<case_id>/uploads", 'POST', f'/api/case/{case_id}/uploads',
+                             json_body={"file_name": "resumable.txt", "size": len(data)})
+        if response.status != 201:
+            return
+        path = f'/api/uploads/{response.json()["upload_id"]}'
+        half = len(data) // 2
+        self.call("PATCH /api/uploads/<upload_id>", 'PATCH', path, body=data[:half],
+                  headers={"Upload-Offset": "0", "Content-Type": "application/offset+octet-stream"})
+        self.call("GET /api/uploads/<upload_id>", 'GET', path)
+        if self.rng.random() < 0.2:
+            self.call("DELETE /api/uploads/<upload_id>", 'DELETE', path)
+            return
+        response = self.call("PATCH /api/uploads/<upload_id>", 'PATCH', path, body=data[half:],
+                             headers={"Upload-Offset": str(half), "Content-Type": "application/offset+octet-stream"})
+        if response.status == 201:
+            self.uploaded.append(response.json()["doc_id"])
+
+    def op_delete_document(self):
+        if self.uploaded:
+            doc_id = self.uploaded.pop(self.rng.randrange(len(self.uploaded)))
+            self.call("DELETE /api/document/<doc_id>", 'DELETE', f'/api/document/{doc_id}')
+
+    def op_summary(self):
+        case_id = self.pick_case()
+        if not case_id:
+            return
+        response = self.call("POST /api/case/<case_id>/summary", 'POST', f'/api/case/{case_id}/summary')
+        if response.status == 202:
+            job_id = response.json()["job_id"]
+            self.call("GET /api/summary-jobs/<job_id>", 'GET', f'/api/summary-jobs/{job_id}?wait=5')
+
+    def op_summary_legacy(self):
+        case_id = self.pick_case()
+        if case_id:
+            self.call("GET /api/case/<case_id>/summary", 'GET', f'/api/case/{case_id}/summary')
+
+    def op_login(self):
+        self.login()
+
+    def op_register(self):
+        self.call("POST /api/register", 'POST', '/api/register', json_body={
+            "email": f"load-{uuid.uuid4().hex}@bench.example", "password": self.manifest["password"],
+            "full_name": "Load Test", "role": "advocate",
+        })
+
+    def run(self, deadline, mix):
+        if not self.login():
+            return
+        operations = [getattr(self, f"op_{name}") for name in mix]
+        weights = list(mix.values())
+        while time.monotonic() < deadline:
+            self.rng.choices(operations, weights)[0]()
+        self.call("POST /api/logout", 'POST', '/api/logout')
+
+def wait_for_port(host, port, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            sys.exit(f"gunicorn exited with status {process.returncode}")
+        try:
+            socket.create_connection((host, port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    sys.exit("gunicorn did not start listening in time")
+
+def start_gunicorn(args, environ):
+    if importlib.util.find_spec('gunicorn') is None:
+        sys.exit("gunicorn is not installed (pip install gunicorn)")
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        port = probe.getsockname()[1]
+    command = [
+        sys.executable, '-m', 'gunicorn', '--workers', str(args.gunicorn), '--threads', str(args.threads),
+        '--bind', f'127.0.0.1:{port}', '--chdir', os.path.join(BACKEND_DIR, 'app'), '--log-level', 'warning',
+        'app:app',
+    ]
+    try:
+        process = subprocess.Popen(command, env=environ)
+    except OSError as e:
+        sys.exit(f"Could not start gunicorn: {e}")
+    wait_for_port('127.0.0.1', port, process)
+    return process, f'http://127.0.0.1:{port}'
+
+def main():
+    args = parse_args()
+    manifest_path = os.path.join(args.data_dir, 'manifest.json')
+    try:
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        sys.exit(f"{manifest_path} not found; run benchmarks/seed.py first")
+
+    # Seeded passwords use a low bcrypt cost; matching it keeps logins from re-hashing
+    server_environ = {
+        "DB_COUNT_QUERIES": "1",
+        "AI_MODEL_CLIENT": "fake",
+        "BCRYPT_ROUNDS": manifest["options"]["bcrypt_rounds"],
+    }
+
+    server, base_url = None, args.url
+    if args.gunicorn:
+        environ = dict(os.environ, UPLOAD_FOLDER=manifest["upload_folder"],
+                       **{key: str(value) for key, value in server_environ.items()})
+        if manifest["database_path"]:
+            environ["DATABASE_PATH"] = manifest["database_path"]
+        server, base_url = start_gunicorn(args, environ)
+        target = {"kind": "gunicorn", "workers": args.gunicorn, "threads": args.threads}
+    elif base_url:
+        target = {"kind": "url", "url": base_url}
+    else:
+        use_backend(manifest["database_path"], manifest["upload_folder"], **server_environ)
+        from app import app
+        target = {"kind": "inprocess"}
+
+    recorder = Recorder()
+    rng = random.Random(args.random_seed)
+    mix = MIXES[args.mix]
+    users = []
+    for _ in range(args.clients):
+        client = HttpClient(base_url) if base_url else InProcessClient(app)
+        users.append(VirtualUser(client, recorder, manifest, random.Random(rng.random()),
+                                 is_judge=rng.random() < args.judge_ratio))
+
+    deadline = time.monotonic() + args.warmup + args.duration
+    threads = [threading.Thread(target=user.run, args=(deadline, mix)) for user in users]
+    try:
+        for thread in threads:
+            thread.start()
+        time.sleep(args.warmup)
+        recorder.recording = True
+        measured_from = time.monotonic()
+        for thread in threads:
+            thread.join()
+        duration = time.monotonic() - measured_from
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    totals, routes = recorder.report(duration)
+    report = {
+        "benchmark": "loadgen",
+        "environment": environment_info(),
+        "target": target,
+        "dialect": manifest["dialect"],
+        "dataset": manifest["counts"],
+        "config": {
+            "clients": args.clients, "duration": args.duration, "warmup": args.warmup,
+            "mix": args.mix, "random_seed": args.random_seed, "judge_ratio": args.judge_ratio,
+        },
+        "measured_seconds": round(duration, 2),
+        "totals": totals,
+        "routes": routes,
+    }
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"{target['kind']} target, {args.clients} clients, {duration:.1f}s measured, dataset {manifest['counts']}")
+    print(f"{'route':<44} {'req':>7} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'q/req':>6} {'err':>5}")
+    for route, stats in list(routes.items()) + [("TOTAL", totals)]:
+        print(f"{route:<44} {stats['requests']:>7} {stats['throughput_rps']:>8} {stats['p50_ms']:>8} "
+              f"{stats['p95_ms']:>8} {stats['p99_ms']:>8} {'-' if stats['queries_per_request'] is None else stats['queries_per_request']:>6} {stats['errors']:>5}")
+
+if __name__ == '__main__':
+    main()
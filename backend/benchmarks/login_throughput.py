@@ -0,0 +1,111 @@
+"""Login throughput against password-hashing pool size.
+
+Runs the app in-process against a throwaway database, fires concurrent
+logins from client threads for a fixed time at each pool size, and reports
+logins per second, shed (503) requests and latency percentiles.
+
+    python benchmarks/login_throughput.py --workers 0,1,2,4 --clients 16 --duration 5
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from common import percentile
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', default=f"0,1,2,{os.cpu_count() or 1}",
+                        help="Comma-separated pool sizes to try (0 = hash on the request thread)")
+    parser.add_argument('--clients', type=int, default=16, help="Concurrent login threads")
+    parser.add_argument('--duration', type=float, default=5.0, help="Seconds per pool size")
+    parser.add_argument('--rounds', type=int, default=10, help="bcrypt cost to benchmark")
+    parser.add_argument('--queue-limit', type=int, default=None,
+                        help="Queued hashes allowed per pool (default 4x pool size)")
+    parser.add_argument('--backoff', type=float, default=0.1,
+                        help="Seconds a client waits after a 503 before trying again")
+    parser.add_argument('--json', action='store_true', help="Print results as JSON")
+    return parser.parse_args()
+
+def run(app, password_hashing, workers, args):
+    queue_limit = args.queue_limit if args.queue_limit is not None else 4 * max(workers, 1)
+    password_hashing.configure(workers=workers, queue_limit=queue_limit)
+
+    # Warm the pool so process start-up isn't measured
+    app.test_client().post('/api/login', json={"email": "bench@example.com", "password": "bench-password"})
+
+    statuses = {}
+    latencies = []
+    lock = threading.Lock()
+    deadline = time.monotonic() + args.duration
+
+    def client():
+        http = app.test_client()
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            response = http.post('/api/login', json={"email": "bench@example.com", "password": "bench-password"})
+            elapsed = time.perf_counter() - start
+            with lock:
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+                if response.status_code == 200:
+                    latencies.append(elapsed)
+            if response.status_code == 503:
+                time.sleep(args.backoff)
+
+    threads = [threading.Thread(target=client) for _ in range(args.clients)]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+
+    return {
+        "workers": workers,
+        "queue_limit": queue_limit,
+        "logins_per_second": round(statuses.get(200, 0) / elapsed, 2),
+        "shed_per_second": round(statuses.get(503, 0) / elapsed, 2),
+        "statuses": statuses,
+        "p50_ms": round(percentile(latencies, 0.5) * 1000, 1) if latencies else None,
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 1) if latencies else None,
+    }
+
+def main():
+    args = parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='login-bench-')
+    os.environ['DATABASE_PATH'] = os.path.join(workdir, 'bench.db')
+    os.environ['UPLOAD_FOLDER'] = os.path.join(workdir, 'uploads')
+    os.environ['BCRYPT_ROUNDS'] = str(args.rounds)
+
+    backend = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    sys.path.insert(0, backend)
+    sys.path.insert(0, os.path.join(backend, 'DataBase'))
+    sys.path.insert(0, os.path.join(backend, 'app'))
+
+    import database_init
+    database_init.create_tables()
+    from app import app
+    from functions import password_hashing
+    from functions.database import user_manager
+
+    password_hashing.configure(workers=0)
+    user_manager.create_user('bench@example.com', 'bench-password', 'Bench User', 'advocate')
+
+    results = [run(app, password_hashing, int(w), args) for w in args.workers.split(',')]
+    password_hashing.configure(workers=0)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"bcrypt cost {args.rounds}, {args.clients} clients, {args.duration}s per run, {os.cpu_count()} CPUs")
+    print(f"{'workers':>8} {'logins/s':>10} {'shed/s':>8} {'p50 ms':>8} {'p99 ms':>8}")
+    for r in results:
+        print(f"{r['workers']:>8} {r['logins_per_second']:>10} {r['shed_per_second']:>8} "
+              f"{r['p50_ms'] if r['p50_ms'] is not None else '-':>8} {r['p99_ms'] if r['p99_ms'] is not None else '-':>8}")
+
+if __name__ == '__main__':
+    main()
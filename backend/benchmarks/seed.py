@@ -0,0 +1,231 @@
+"""Seeds a benchmark database with synthetic users, cases, grants and documents.
+
+Everything is written through the application's own managers, so the data
+has the same shape (blobs, reference counts, ACL rows, search index) as
+data created through the API. The output is deterministic for a given
+--random-seed.
+
+    python benchmarks/seed.py --users 1000000 --cases 100000 --documents 1000000 --grants-per-case 50
+
+Writes bench.db, the uploaded blobs and manifest.json to --data-dir. Set
+DATABASE_URL to seed PostgreSQL instead. loadgen.py reads the manifest.
+"""
+import argparse
+import io
+import json
+import os
+import random
+import sys
+import time
+
+from common import DEFAULT_DATA_DIR, environment_info, use_backend
+
+USER_EMAIL = "user{}@bench.example"
+JUDGE_EMAIL = "judge{}@bench.example"
+
+FIRST_NAMES = (
+    "Aarav", "Aditi", "Amara", "Ben", "Carlos", "Chen", "Diya", "Elena", "Farah", "Gabriel", "Hana", "Ishaan",
+    "Jonas", "Kavya", "Leila", "Mateo", "Meera", "Nikhil", "Olivia", "Priya", "Rahul", "Sara", "Tanvi", "Yusuf",
+)
+LAST_NAMES = (
+    "Agarwal", "Bose", "Castillo", "Dubois", "Fernandes", "Gupta", "Hoffmann", "Iyer", "Jain", "Khan", "Lopez",
+    "Menon", "Nair", "Okafor", "Patel", "Quinn", "Rao", "Sharma", "Tanaka", "Verma", "Wong", "Zhang",
+)
+WORDS = (
+    "agreement", "appeal", "affidavit", "arbitration", "bail", "breach", "claim", "clause", "compensation",
+    "contract", "counsel", "court", "damages", "deed", "defendant", "evidence", "exhibit", "hearing",
+    "indemnity", "injunction", "jurisdiction", "lease", "liability", "notice", "order", "party", "payment",
+    "petition", "plaintiff", "property", "remedy", "respondent", "settlement", "statute", "summons",
+    "tenant", "testimony", "transfer", "tribunal", "verdict", "warranty", "witness", "the", "of", "and",
+    "to", "in", "on", "by", "under", "dated", "between", "said", "shall", "was", "filed",
+)
+ROLES = ('advocate',) * 7 + ('government_agency', 'private_intel', 'advocate')
+STATUSES = ('Open',) * 6 + ('Closed', 'In Progress', 'Archived')
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR, help="Directory for bench.db, blobs and manifest.json")
+    parser.add_argument('--users', type=int, default=10000, help="Non-judge users")
+    parser.add_argument('--judges', type=int, default=20)
+    parser.add_argument('--cases', type=int, default=2000)
+    parser.add_argument('--documents', type=int, default=20000)
+    parser.add_argument('--grants-per-case', type=int, default=25, help="Users granted access to each case")
+    parser.add_argument('--duplicate-ratio', type=float, default=0.1,
+                        help="Fraction of documents that repeat earlier content")
+    parser.add_argument('--document-bytes', type=int, default=2048, help="Approximate size of each document")
+    parser.add_argument('--no-index', action='store_true', help="Skip building the full-text index")
+    parser.add_argument('--password', default='bench-password', help="Password for every seeded user")
+    parser.add_argument('--bcrypt-rounds', type=int, default=4,
+                        help="bcrypt cost for seeded passwords (the minimum keeps large seeds fast)")
+    parser.add_argument('--random-seed', type=int, default=1)
+    parser.add_argument('--batch', type=int, default=500, help="Rows per bulk manager call")
+    return parser.parse_args()
+
+def progress(label, done, total, started):
+    if done == total or done % max(1, total // 10) == 0:
+        print(f"  {label}: {done}/{total} ({time.monotonic() - started:.1f}s)", file=sys.stderr)
+
+def seed_users(args, rng, user_manager):
+    """Creates judges and users. Returns (user_ids, judge_ids, advocate_ids)."""
+    started = time.monotonic()
+    judge_ids = []
+    for i in range(args.judges):
+        name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+        judge_ids.append(user_manager.create_user(JUDGE_EMAIL.format(i), args.password, name, 'judge'))
+    user_ids, advocate_ids = [], []
+    for i in range(args.users):
+        name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+        role = rng.choice(ROLES)
+        user_id = user_manager.create_user(USER_EMAIL.format(i), args.password, name, role)
+        user_ids.append(user_id)
+        if role == 'advocate':
+            advocate_ids.append(user_id)
+        progress("users", i + 1, args.users, started)
+    return user_ids, judge_ids, advocate_ids
+
+def seed_cases(args, rng, cases_manager, creators):
+    started = time.monotonic()
+    case_ids, case_creators = [], []
+    for i in range(args.cases):
+        creator = rng.choice(creators)
+        case_ids.append(cases_manager.create_case(f"Case {i}: {rng.choice(LAST_NAMES)} v. {rng.choice(LAST_NAMES)}", creator))
+        case_creators.append(creator)
+        progress("cases", i + 1, args.cases, started)
+
+    by_status = {}
+    for case_id in case_ids:
+        by_status.setdefault(rng.choice(STATUSES), []).append(case_id)
+    for status, ids in by_status.items():
+        if status != 'Open':
+            cases_manager.update_cases_status(ids, status)
+    return case_ids, case_creators
+
+def seed_grants(args, rng, permissions_manager, case_ids, case_creators, user_ids):
+    started = time.monotonic()
+    levels = ('view_only',) * 3 + ('upload_only', 'sudo')
+    per_case = min(args.grants_per_case, len(user_ids))
+    grants, total = [], 0
+    for n, (case_id, creator) in enumerate(zip(case_ids, case_creators), 1):
+        grants.extend(
+            (case_id, user_id, rng.choice(levels))
+            for user_id in rng.sample(user_ids, per_case) if user_id != creator
+        )
+        if len(grants) >= args.batch or n == len(case_ids):
+            errors = permissions_manager.grant_access_bulk(grants)
+            total += errors.count(None)
+            grants = []
+        progress("grants", n, len(case_ids), started)
+    return total
+
+def document_text(rng, size):
+    words = []
+    length = 0
+    while length < size:
+        word = rng.choice(WORDS)
+        words.append(word)
+        length += len(word) + 1
+    return ' '.join(words).encode('utf-8')
+
+def seed_documents(args, rng, document_manager, blob_store, case_ids, case_creators):
+    """Adds documents to random cases in batches. Returns the new doc IDs."""
+    from functions.storage import choose_encoding
+
+    started = time.monotonic()
+    contents, doc_ids = [], []
+    for batch_start in range(0, args.documents, args.batch):
+        batch_size = min(args.batch, args.documents - batch_start)
+        by_case = {}
+        for i in range(batch_start, batch_start + batch_size):
+            if contents and rng.random() < args.duplicate_ratio:
+                data = rng.choice(contents)
+            else:
+                data = document_text(rng, args.document_bytes)
+                if len(contents) < 1000:
+                    contents.append(data)
+            by_case.setdefault(rng.randrange(len(case_ids)), []).append((f"exhibit-{i}.txt", data))
+
+        for case_index, files in by_case.items():
+            staged_files = [blob_store.ingest(io.BytesIO(data), choose_encoding(file_name)) for file_name, data in files]
+            try:
+                results = document_manager.add_documents(case_ids[case_index], case_creators[case_index], [
+                    {
+                        "file_name": file_name,
+                        "content_hash": staged.content_hash,
+                        "size_bytes": staged.size_bytes,
+                        "storage_key": blob_store.key_for(staged.content_hash, staged.encoding),
+                        "store_blob": lambda staged=staged: blob_store.commit(staged),
+                        "stored_bytes": staged.stored_bytes,
+                        "content_encoding": staged.encoding,
+                    }
+                    for (file_name, _), staged in zip(files, staged_files)
+                ])
+            finally:
+                for staged in staged_files:
+                    blob_store.discard(staged)
+            doc_ids.extend(doc_id for doc_id, _ in results if doc_id)
+        progress("documents", batch_start + batch_size, args.documents, started)
+    return doc_ids
+
+def main():
+    args = parse_args()
+    os.makedirs(args.data_dir, exist_ok=True)
+    database_path = os.path.join(args.data_dir, 'bench.db')
+    upload_folder = os.path.join(args.data_dir, 'uploads')
+    if not os.environ.get('DATABASE_URL') and os.path.exists(database_path):
+        sys.exit(f"{database_path} already exists; remove it or choose another --data-dir")
+    use_backend(database_path, upload_folder, PASSWORD_HASH_WORKERS=0)
+
+    import database_init
+    from functions import password_hashing
+    from functions.database import cases_manager, db, document_manager, permissions_manager, user_manager
+    from functions.search import document_index
+    from functions.storage import create_blob_store
+
+    database_init.create_tables()
+    password_hashing.configure(workers=0, rounds=args.bcrypt_rounds)
+    rng = random.Random(args.random_seed)
+    timings = {}
+
+    def phase(name, func, *func_args):
+        print(f"{name}...", file=sys.stderr)
+        started = time.monotonic()
+        result = func(*func_args)
+        timings[name] = round(time.monotonic() - started, 2)
+        return result
+
+    user_ids, judge_ids, advocate_ids = phase("users", seed_users, args, rng, user_manager)
+    case_ids, case_creators = phase(
+        "cases", seed_cases, args, rng, cases_manager, (advocate_ids or user_ids) + judge_ids
+    )
+    grants = phase("grants", seed_grants, args, rng, permissions_manager, case_ids, case_creators, user_ids)
+    doc_ids = phase(
+        "documents", seed_documents, args, rng, document_manager, create_blob_store(), case_ids, case_creators
+    )
+    if not args.no_index:
+        phase("index", lambda: [document_index.index_document(doc_id) for doc_id in doc_ids])
+
+    manifest = {
+        "dialect": db.DIALECT,
+        "database_path": None if db.DIALECT == 'postgresql' else database_path,
+        "upload_folder": upload_folder,
+        "password": args.password,
+        "user_email": USER_EMAIL,
+        "judge_email": JUDGE_EMAIL,
+        "counts": {
+            "users": len(user_ids),
+            "judges": len(judge_ids),
+            "cases": len(case_ids),
+            # Each creator's sudo grant plus the generated ones
+            "grants": len(case_ids) + grants,
+            "documents": len(doc_ids),
+        },
+        "options": {key: value for key, value in vars(args).items() if key != 'data_dir'},
+        "seed_seconds": timings,
+        "environment": environment_info(),
+    }
+    with open(os.path.join(args.data_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    print(json.dumps(manifest["counts"]), file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
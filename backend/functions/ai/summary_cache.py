@@ -0,0 +1,143 @@
+import hashlib
+import json
+import os
+import random
+import sys
+import threading
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from functions.database.db import connection, utc_timestamp
+
+# Row limits for the two cache tables; least recently used rows go first.
+MAX_DOCUMENT_SUMMARIES = int(os.environ.get('SUMMARY_CACHE_MAX_DOCUMENTS', '20000'))
+MAX_CASE_SUMMARIES = int(os.environ.get('SUMMARY_CACHE_MAX_CASES', '5000'))
+
+# Eviction runs on roughly one store in this many, so a table may briefly
+# hold a few rows over its limit
+EVICT_EVERY = 100
+
+# last_used_at is only rewritten once it is this old, so cache hits are
+# normally a single read
+TOUCH_INTERVAL_SECONDS = 600
+
+# How many earlier rollups of a case are considered as a base to merge into.
+ROLLUP_CANDIDATES = 5
+
+_stats = {
+    "document_hits": 0,
+    "document_misses": 0,
+    "case_hits": 0,
+    "case_misses": 0,
+    "incremental_merges": 0,
+    "evictions": 0,
+}
+_stats_lock = threading.Lock()
+
+def _count(name, amount=1):
+    with _stats_lock:
+        _stats[name] += amount
+
+def get_summary_cache_stats():
+    """Returns hit/miss counters for document and case summaries."""
+    with _stats_lock:
+        stats = dict(_stats)
+    for kind in ('document', 'case'):
+        lookups = stats[f"{kind}_hits"] + stats[f"{kind}_misses"]
+        stats[f"{kind}_hit_rate"] = stats[f"{kind}_hits"] / lookups if lookups else 0.0
+    return stats
+
+def rollup_key(content_hashes):
+    """Identifies a case summary by the sorted set of its documents' hashes."""
+    joined = '\n'.join(sorted(set(content_hashes)))
+    return hashlib.sha256(joined.encode('ascii')).hexdigest()
+
+def get_document_summary(content_hash):
+    """Returns the cached summary for a document's contents, or None."""
+    with connection() as conn:
+        row = conn.execute(
+            "SELECT summary, last_used_at < ? AS stale FROM DocumentSummaries WHERE content_hash = ?",
+            (utc_timestamp(-TOUCH_INTERVAL_SECONDS), content_hash)
+        ).fetchone()
+        if row and row['stale']:
+            _touch(conn, 'DocumentSummaries', "content_hash = ?", (content_hash,))
+    _count("document_hits" if row else "document_misses")
+    return row['summary'] if row else None
+
+def store_document_summary(content_hash, summary):
+    """Caches a document summary and evicts the oldest entries past the limit."""
+    with connection() as conn:
+        conn.execute(
+            """
+            INSERT INTO DocumentSummaries (content_hash, summary) VALUES (?, ?)
+            ON CONFLICT(content_hash) DO UPDATE SET summary = excluded.summary, last_used_at = CURRENT_TIMESTAMP
+            """,
+            (content_hash, summary)
+        )
+        _maybe_evict(conn, 'DocumentSummaries', 'content_hash', MAX_DOCUMENT_SUMMARIES)
+        conn.commit()
+
+def get_case_summary(case_id, key):
+    """Returns the case's cached summary for a rollup key, or None."""
+    with connection() as conn:
+        row = conn.execute(
+            "SELECT summary, last_used_at < ? AS stale FROM CaseSummaries WHERE case_id = ? AND rollup_key = ?",
+            (utc_timestamp(-TOUCH_INTERVAL_SECONDS), case_id, key)
+        ).fetchone()
+        if row and row['stale']:
+            _touch(conn, 'CaseSummaries', "case_id = ? AND rollup_key = ?", (case_id, key))
+    _count("case_hits" if row else "case_misses")
+    return row['summary'] if row else None
+
+def find_base_rollup(case_id, content_hashes):
+    """Finds the most complete earlier summary of this case whose documents are all still present.
+
+    Returns (summary, set_of_hashes) or (None, empty set).
+    """
+    current = set(content_hashes)
+    with connection() as conn:
+        rows = conn.execute(
+            "SELECT summary, doc_hashes FROM CaseSummaries WHERE case_id = ? ORDER BY created_at DESC LIMIT ?",
+            (case_id, ROLLUP_CANDIDATES)
+        ).fetchall()
+
+    best_summary, best_hashes = None, set()
+    for row in rows:
+        hashes = set(json.loads(row['doc_hashes']))
+        if hashes <= current and len(hashes) > len(best_hashes):
+            best_summary, best_hashes = row['summary'], hashes
+    if best_summary is not None:
+        _count("incremental_merges")
+    return best_summary, best_hashes
+
+def store_case_summary(case_id, content_hashes, summary):
+    """Caches a case summary under the case and its rollup key."""
+    hashes = sorted(set(content_hashes))
+    with connection() as conn:
+        conn.execute(
+            """
+            INSERT INTO CaseSummaries (rollup_key, case_id, doc_hashes, summary) VALUES (?, ?, ?, ?)
+            ON CONFLICT(case_id, rollup_key) DO UPDATE SET summary = excluded.summary, last_used_at = CURRENT_TIMESTAMP
+            """,
+            (rollup_key(hashes), case_id, json.dumps(hashes), summary)
+        )
+        _maybe_evict(conn, 'CaseSummaries', 'case_id, rollup_key', MAX_CASE_SUMMARIES)
+        conn.commit()
+
+def _touch(conn, table, where, params):
+    conn.execute(f"UPDATE {table} SET last_used_at = CURRENT_TIMESTAMP WHERE {where}", params)
+    conn.commit()
+
+def _maybe_evict(conn, table, key_column, max_rows):
+    if random.randrange(EVICT_EVERY) == 0:
+        _evict(conn, table, key_column, max_rows)
+
+def _evict(conn, table, key_column, max_rows):
+    count = conn.execute(f"SELECT COUNT(*) AS n FROM {table}").fetchone()['n']
+    excess = count - max_rows
+    if excess > 0:
+        conn.execute(
+            f"DELETE FROM {table} WHERE ({key_column}) IN "
+            f"(SELECT {key_column} FROM {table} ORDER BY last_used_at LIMIT ?)",
+            (excess,)
+        )
+        _count("evictions", excess)
@@ -0,0 +1,192 @@
+import os
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from functions.database.db import DatabaseError, IntegrityError, connection, utc_timestamp
+from functions.ai import ai_func
+
+# Summary generation runs on a small thread pool inside each worker process.
+# Jobs live in the SummaryJobs table, so a job enqueued by one process can be
+# picked up by any other, and nothing is lost on restart.
+SUMMARY_WORKERS = int(os.environ.get('SUMMARY_WORKERS', '2'))
+
+# A running job whose lease expires (its worker died) is picked up again.
+SUMMARY_JOB_LEASE_SECONDS = int(os.environ.get('SUMMARY_JOB_LEASE_SECONDS', '300'))
+SUMMARY_JOB_MAX_ATTEMPTS = int(os.environ.get('SUMMARY_JOB_MAX_ATTEMPTS', '3'))
+
+# How often each process looks for queued or abandoned jobs.
+SUMMARY_POLL_INTERVAL = float(os.environ.get('SUMMARY_POLL_INTERVAL', '2'))
+
+ACTIVE_STATUSES = ('queued', 'running')
+
+_executor = None
+_executor_pid = None
+_start_lock = threading.Lock()
+_finished = threading.Condition()
+
+# Jobs this process has handed to its executor and not yet finished
+_submitted = set()
+_submitted_lock = threading.Lock()
+
+def ensure_started():
+    """Starts this process's worker pool and recovery poller if not yet running."""
+    global _executor, _executor_pid
+    if _executor_pid == os.getpid():
+        return
+    with _start_lock:
+        if _executor_pid == os.getpid():
+            return
+        _executor = ThreadPoolExecutor(max_workers=SUMMARY_WORKERS, thread_name_prefix='summary-job')
+        _executor_pid = os.getpid()
+        threading.Thread(target=_poll_for_jobs, name='summary-job-poller', daemon=True).start()
+
+def init_app(app):
+    """Starts the workers lazily on the first request (after any gunicorn fork)."""
+    app.before_request(ensure_started)
+
+def enqueue_summary(case_id, user_id):
+    """Queues a summary for a case, or joins the job already queued or running.
+
+    Returns (job, created).
+    """
+    ensure_started()
+    job_id = str(uuid.uuid4())
+
+    with connection() as conn:
+        try:
+            conn.execute(
+                "INSERT INTO SummaryJobs (job_id, case_id, requested_by) VALUES (?, ?, ?)",
+                (job_id, case_id, user_id)
+            )
+            conn.commit()
+            created = True
+        except IntegrityError:
+            # The partial unique index allows one active job per case
+            conn.rollback()
+            created = False
+
+        if created:
+            job = conn.execute("SELECT * FROM SummaryJobs WHERE job_id = ?", (job_id,)).fetchone()
+        else:
+            job = conn.execute(
+                "SELECT * FROM SummaryJobs WHERE case_id = ? AND status IN ('queued', 'running')",
+                (case_id,)
+            ).fetchone()
+
+    if created:
+        _submit(job_id)
+    elif job is None:
+        # The active job finished between our insert and select; try again
+        return enqueue_summary(case_id, user_id)
+    return job, created
+
+def get_job(job_id):
+    """Retrieves a summary job by its ID."""
+    with connection() as conn:
+        return conn.execute("SELECT * FROM SummaryJobs WHERE job_id = ?", (job_id,)).fetchone()
+
+def wait_for_job(job_id, timeout):
+    """Long-polls until a job leaves the queued/running states or timeout passes.
+
+    Jobs finished in this process wake the waiter immediately; jobs finished
+    by other processes are noticed by re-reading the row every half second.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        job = get_job(job_id)
+        remaining = deadline - time.monotonic()
+        if job is None or job['status'] not in ACTIVE_STATUSES or remaining <= 0:
+            return job
+        with _finished:
+            _finished.wait(min(0.5, remaining))
+
+def _claim_job(job_id):
+    """Marks a job as running under a fresh lease. Returns False if someone else has it."""
+    with connection() as conn:
+        cursor = conn.execute(
+            """
+            UPDATE SummaryJobs
+            SET status = 'running', attempts = attempts + 1,
+                lease_expires_at = ?, updated_at = CURRENT_TIMESTAMP
+            WHERE job_id = ?
+              AND (status = 'queued' OR (status = 'running' AND lease_expires_at < ?))
+            """,
+            (utc_timestamp(SUMMARY_JOB_LEASE_SECONDS), job_id, utc_timestamp())
+        )
+        conn.commit()
+        return cursor.rowcount > 0
+
+def _finish_job(job_id, status, result=None, error=None):
+    with connection() as conn:
+        conn.execute(
+            """
+            UPDATE SummaryJobs
+            SET status = ?, result = ?, error = ?, lease_expires_at = NULL,
+                updated_at = CURRENT_TIMESTAMP, finished_at = CURRENT_TIMESTAMP
+            WHERE job_id = ?
+            """,
+            (status, result, error, job_id)
+        )
+        conn.commit()
+    with _finished:
+        _finished.notify_all()
+
+def _submit(job_id):
+    with _submitted_lock:
+        if job_id in _submitted:
+            return
+        _submitted.add(job_id)
+    _executor.submit(_run_job, job_id)
+
+def _run_job(job_id):
+    try:
+        if _claim_job(job_id):
+            _process_job(job_id)
+    finally:
+        with _submitted_lock:
+            _submitted.discard(job_id)
+
+def _process_job(job_id):
+    job = get_job(job_id)
+    try:
+        summary = ai_func.summarize_case(job['case_id'])
+    except Exception as e:
+        if job['attempts'] >= SUMMARY_JOB_MAX_ATTEMPTS:
+            _finish_job(job_id, 'failed', error=str(e))
+        else:
+            # Give it back to the queue; the poller will retry it
+            with connection() as conn:
+                conn.execute(
+                    "UPDATE SummaryJobs SET status = 'queued', error = ?, lease_expires_at = NULL, "
+                    "updated_at = CURRENT_TIMESTAMP WHERE job_id = ?",
+                    (str(e), job_id)
+                )
+                conn.commit()
+        return
+
+    _finish_job(job_id, 'done', result=summary)
+
+def _poll_for_jobs():
+    """Picks up jobs queued by other processes, left over from a restart, or abandoned."""
+    while True:
+        try:
+            with connection() as conn:
+                rows = conn.execute(
+                    """
+                    SELECT job_id FROM SummaryJobs
+                    WHERE status IN ('queued', 'running')
+                      AND (status = 'queued' OR lease_expires_at < ?)
+                    ORDER BY created_at
+                    LIMIT ?
+                    """,
+                    (utc_timestamp(), SUMMARY_WORKERS)
+                ).fetchall()
+            for row in rows:
+                _submit(row['job_id'])
+        except DatabaseError as e:
+            print(f"Database error: {e}")
+        time.sleep(SUMMARY_POLL_INTERVAL)
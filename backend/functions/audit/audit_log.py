@@ -0,0 +1,224 @@
+import atexit
+import hashlib
+import json
+import os
+import sys
+import threading
+from collections import deque
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from functions.database.db import DatabaseError, connection, utc_timestamp
+from functions.database.pagination import decode_cursor, fetch_page
+
+# Entries are buffered in memory and written in batches by a background
+# thread in each worker process, so recording one costs a request no
+# database write. A crash loses at most the last AUDIT_FLUSH_INTERVAL
+# seconds of entries; clean shutdowns flush first.
+AUDIT_FLUSH_INTERVAL = float(os.environ.get('AUDIT_FLUSH_INTERVAL', '1'))
+
+# A flush starts early once this many entries are waiting
+AUDIT_BATCH_SIZE = int(os.environ.get('AUDIT_BATCH_SIZE', '500'))
+
+# With this many entries waiting (e.g. the database is down), recording
+# flushes in the request itself; if that fails too, the oldest are dropped
+AUDIT_MAX_BUFFER = int(os.environ.get('AUDIT_MAX_BUFFER', '10000'))
+
+# prev_hash of the first entry
+GENESIS_HASH = '0' * 64
+
+# Fields covered by each entry's hash, in order
+HASHED_COLUMNS = ('occurred_at', 'action', 'user_id', 'case_id', 'doc_id', 'ip_address', 'details')
+
+_buffer = deque()
+_buffer_lock = threading.Lock()
+_flush_lock = threading.Lock()
+_wakeup = threading.Event()
+
+_flusher_pid = None
+_start_lock = threading.Lock()
+
+_stats = {"recorded": 0, "written": 0, "flushes": 0, "failures": 0, "dropped": 0}
+_stats_lock = threading.Lock()
+
+def _count(name, amount=1):
+    with _stats_lock:
+        _stats[name] += amount
+
+def get_audit_stats():
+    """Returns write counters for this process, plus the number of entries waiting."""
+    with _stats_lock:
+        stats = dict(_stats)
+    with _buffer_lock:
+        stats["buffered"] = len(_buffer)
+    return stats
+
+def init_app(app):
+    """Starts the flusher lazily on the first request (after any gunicorn fork)."""
+    app.before_request(ensure_started)
+
+def ensure_started():
+    """Starts this process's flusher thread if not yet running."""
+    global _flusher_pid
+    if _flusher_pid == os.getpid():
+        return
+    with _start_lock:
+        if _flusher_pid == os.getpid():
+            return
+        if _flusher_pid is not None:
+            # Entries copied from the parent process are the parent's to write
+            with _buffer_lock:
+                _buffer.clear()
+        _flusher_pid = os.getpid()
+        threading.Thread(target=_flush_periodically, name='audit-log', daemon=True).start()
+
+def record(action, user_id=None, case_id=None, doc_id=None, ip_address=None, details=None):
+    """Buffers an audit entry, to be written within AUDIT_FLUSH_INTERVAL seconds.
+
+    details is an optional JSON-serializable dict. Never raises on
+    database errors; the entry stays buffered until a flush succeeds.
+    """
+    ensure_started()
+    entry = {
+        "occurred_at": utc_timestamp(),
+        "action": action,
+        "user_id": user_id,
+        "case_id": case_id,
+        "doc_id": doc_id,
+        "ip_address": ip_address,
+        "details": json.dumps(details, sort_keys=True) if details is not None else None,
+    }
+    with _buffer_lock:
+        _buffer.append(entry)
+        waiting = len(_buffer)
+    _count("recorded")
+    if waiting >= AUDIT_MAX_BUFFER:
+        flush()
+        _drop_overflow()
+    elif waiting >= AUDIT_BATCH_SIZE:
+        _wakeup.set()
+
+def flush():
+    """Writes every buffered entry now. Returns how many were written."""
+    written = 0
+    with _flush_lock:
+        while True:
+            with _buffer_lock:
+                batch = [_buffer.popleft() for _ in range(min(len(_buffer), AUDIT_BATCH_SIZE))]
+            if not batch:
+                return written
+            try:
+                _write(batch)
+            except DatabaseError as e:
+                print(f"Database error: {e}")
+                _count("failures")
+                # Back to the front, so the order is kept for the next attempt
+                with _buffer_lock:
+                    _buffer.extendleft(reversed(batch))
+                return written
+            written += len(batch)
+            _count("written", len(batch))
+            _count("flushes")
+
+def _write(batch):
+    """Appends a batch to the log, extending the hash chain, in one transaction."""
+    with connection() as conn:
+        try:
+            # Locks the chain tip until commit
+            prev_hash = conn.execute(
+                "UPDATE AuditHead SET last_hash = last_hash WHERE id = 1 RETURNING last_hash"
+            ).fetchone()['last_hash']
+            rows = []
+            for entry in batch:
+                entry_hash = entry_hash_for(prev_hash, entry)
+                rows.append(tuple(entry[column] for column in HASHED_COLUMNS) + (prev_hash, entry_hash))
+                prev_hash = entry_hash
+            conn.executemany(
+                "INSERT INTO AuditLog (occurred_at, action, user_id, case_id, doc_id, ip_address, details, "
+                "prev_hash, entry_hash) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            conn.execute("UPDATE AuditHead SET last_hash = ? WHERE id = 1", (prev_hash,))
+            conn.commit()
+        except DatabaseError:
+            conn.rollback()
+            raise
+
+def _drop_overflow():
+    with _buffer_lock:
+        dropped = 0
+        while len(_buffer) > AUDIT_MAX_BUFFER:
+            _buffer.popleft()
+            dropped += 1
+    if dropped:
+        print(f"Audit log: dropped {dropped} entries that could not be written")
+        _count("dropped", dropped)
+
+def _flush_periodically():
+    while True:
+        _wakeup.wait(AUDIT_FLUSH_INTERVAL)
+        _wakeup.clear()
+        flush()
+
+def entry_hash_for(prev_hash, entry):
+    """SHA-256 of the previous entry's hash followed by this entry's HASHED_COLUMNS as JSON."""
+    fields = json.dumps([entry[column] for column in HASHED_COLUMNS], separators=(',', ':'))
+    return hashlib.sha256(f"{prev_hash}{fields}".encode('utf-8')).hexdigest()
+
+def get_case_trail(case_id, action=None, cursor=None, limit=50):
+    """Returns one page of a case's audit entries, newest first, and the next-page cursor.
+
+    Each entry carries the acting user's full_name and email where known.
+    Pages are keyed on audit_id within the case. Raises ValueError on a
+    malformed cursor.
+    """
+    query = """
+        SELECT a.audit_id, a.occurred_at, a.action, a.user_id, u.full_name, u.email,
+               a.case_id, a.doc_id, a.ip_address, a.details
+        FROM AuditLog a
+        LEFT JOIN Users u ON u.user_id = a.user_id
+        WHERE a.case_id = ?
+    """
+    params = [case_id]
+    if action:
+        query += " AND a.action = ?"
+        params.append(action)
+    if cursor:
+        query += " AND a.audit_id < ?"
+        params.extend(decode_cursor(cursor, size=1))
+    query += " ORDER BY a.audit_id DESC LIMIT ?"
+    params.append(limit + 1)
+
+    with connection() as conn:
+        db_cursor = conn.cursor()
+        db_cursor.execute(query, params)
+        return fetch_page(db_cursor, limit, ('audit_id',))
+
+def verify_chain(batch_size=1000):
+    """Recomputes the hash chain from the first entry.
+
+    Returns (entries_checked, audit_id of the first entry that does not
+    match, or None). A mismatch means rows were altered, removed or
+    inserted out of band. An AuditHead that does not point at the last
+    entry (e.g. the newest rows were removed) is reported as audit_id 0.
+    """
+    prev_hash, last_id, checked = GENESIS_HASH, 0, 0
+    with connection() as conn:
+        while True:
+            rows = conn.execute(
+                f"SELECT audit_id, {', '.join(HASHED_COLUMNS)}, prev_hash, entry_hash FROM AuditLog "
+                "WHERE audit_id > ? ORDER BY audit_id LIMIT ?",
+                (last_id, batch_size)
+            ).fetchall()
+            for row in rows:
+                if row['prev_hash'] != prev_hash or row['entry_hash'] != entry_hash_for(prev_hash, row):
+                    return checked, row['audit_id']
+                prev_hash, last_id = row['entry_hash'], row['audit_id']
+                checked += 1
+            if len(rows) < batch_size:
+                break
+        head = conn.execute("SELECT last_hash FROM AuditHead WHERE id = 1").fetchone()
+    if head is None or head['last_hash'] != prev_hash:
+        return checked, 0
+    return checked, None
+
+atexit.register(flush)
@@ -1,100 +1,166 @@
-import sqlite3
 import uuid
-import os
-from . import permissions_manager
-
-DB_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'DataBase', 'database.db'))
-
-def get_db_connection():
-    """Creates a database connection."""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+from .db import DatabaseError, connection
+from .pagination import decode_cursor, fetch_page
+from . import change_events, permissions_manager
 
 def create_case(case_name, creator_id):
-    """Creates a new case and a corresponding permissions table."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    """Creates a new case and grants its creator sudo access, in one transaction.
 
+    Returns the case_id, or None if either write fails.
+    """
     case_id = str(uuid.uuid4())
-    
-    try:
-        cursor.execute(
-            "INSERT INTO Cases (case_id, case_name, creator_id) VALUES (?, ?, ?)",
-            (case_id, case_name, creator_id)
-        )
-        conn.commit()
+    grants = [(case_id, creator_id, 'sudo')]
 
-        permissions_manager.grant_access(case_id, creator_id, 'sudo')
+    with connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                "INSERT INTO Cases (case_id, case_name, creator_id) VALUES (?, ?, ?) RETURNING *",
+                (case_id, case_name, creator_id)
+            )
+            case = dict(cursor.fetchone())
+            new_version = permissions_manager.write_grants(conn, grants)
+            # Addressed to the creator, who has access by the time it is read
+            change_events.record_events(conn, [
+                ('case_created', case_id, {"case_id": case_id, "case": case}, creator_id),
+                permissions_manager.grant_event(case_id, creator_id, 'sudo'),
+            ])
+            conn.commit()
+        except DatabaseError as e:
+            print(f"Database error: {e}")
+            conn.rollback()
+            return None
 
-        return case_id
-    except sqlite3.Error as e:
-        print(f"Database error: {e}")
-        conn.rollback()
-        return None
-    finally:
-        conn.close()
+    permissions_manager.grants_committed(new_version, grants)
+    change_events.notify_committed()
+    return case_id
 
 def get_all_cases():
     """Retrieves all cases from the database."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM Cases ORDER BY created_at DESC")
-    cases = cursor.fetchall()
-    conn.close()
-    return cases
+    with connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT * FROM Cases ORDER BY created_at DESC")
+        return cursor.fetchall()
 
 def get_user_cases(user_id):
     """Retrieves all cases a user has access to."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
-    accessible_cases_query = "SELECT name FROM sqlite_master WHERE type='table' AND name LIKE 'CaseAccessPermissions_%'"
-    cursor.execute(accessible_cases_query)
-    permission_tables = cursor.fetchall()
-
-    accessible_case_ids = []
-    for table in permission_tables:
-        table_name = table['name']
-        query = f"SELECT case_id FROM {table_name} WHERE user_id = ?"
-        cursor.execute(query, (user_id,))
-        result = cursor.fetchone()
-        if result:
-            accessible_case_ids.append(result['case_id'])
-    
-    if not accessible_case_ids:
-        return []
-
-    placeholders = ','.join('?' for _ in accessible_case_ids)
-    query = f"SELECT * FROM Cases WHERE case_id IN ({placeholders}) ORDER BY created_at DESC"
-    cursor.execute(query, accessible_case_ids)
-    cases = cursor.fetchall()
-    
-    conn.close()
-    return cases
+    with connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            SELECT c.* FROM CaseAccess a
+            JOIN Cases c ON c.case_id = a.case_id
+            WHERE a.user_id = ?
+            ORDER BY c.created_at DESC
+            """,
+            (user_id,)
+        )
+        return cursor.fetchall()
+
+def list_cases(user_id=None, status=None, creator_id=None, created_from=None, created_to=None,
+               cursor=None, limit=50, viewer_id=None):
+    """Returns one page of cases, newest first, and the cursor for the next page.
+
+    Pages are keyed on (created_at, case_id) so each page is a bounded index
+    range scan regardless of table size. If user_id is given, only cases that
+    user has been granted access to are returned. If viewer_id is given, each
+    case also carries that user's access_level (None without a grant) and its
+    document_count, from the same query.
+    """
+    columns, params = "c.*", []
+    if viewer_id is not None:
+        columns += (
+            ", (SELECT v.access_level FROM CaseAccess v WHERE v.case_id = c.case_id AND v.user_id = ?) AS access_level"
+            ", (SELECT COUNT(*) FROM Documents d WHERE d.case_id = c.case_id) AS document_count"
+        )
+        params.append(viewer_id)
+
+    if user_id is not None:
+        query = f"SELECT {columns} FROM CaseAccess a JOIN Cases c ON c.case_id = a.case_id WHERE a.user_id = ?"
+        params.append(user_id)
+    else:
+        query = f"SELECT {columns} FROM Cases c WHERE 1 = 1"
+
+    if status:
+        query += " AND c.status = ?"
+        params.append(status)
+    if creator_id:
+        query += " AND c.creator_id = ?"
+        params.append(creator_id)
+    if created_from:
+        query += " AND c.created_at >= ?"
+        params.append(created_from)
+    if created_to:
+        query += " AND c.created_at <= ?"
+        params.append(created_to)
+    if cursor:
+        query += " AND (c.created_at, c.case_id) < (?, ?)"
+        params.extend(decode_cursor(cursor))
+
+    query += " ORDER BY c.created_at DESC, c.case_id DESC LIMIT ?"
+    params.append(limit + 1)
+
+    with connection() as conn:
+        db_cursor = conn.cursor()
+        db_cursor.execute(query, params)
+        return fetch_page(db_cursor, limit, ('created_at', 'case_id'))
 
 def get_case_by_id(case_id):
     """Retrieves a single case by its ID."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM Cases WHERE case_id = ?", (case_id,))
-    case = cursor.fetchone()
-    conn.close()
-    return case
+    with connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT * FROM Cases WHERE case_id = ?", (case_id,))
+        return cursor.fetchone()
 
 def update_case_status(case_id, status):
     """Updates the status of a case."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    try:
-        cursor.execute(
-            "UPDATE Cases SET status = ? WHERE case_id = ?",
-            (status, case_id)
-        )
-        conn.commit()
-        return cursor.rowcount > 0
-    except sqlite3.Error as e:
-        print(f"Database error: {e}")
-        return False
-    finally:
-        conn.close()
+    with connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                "UPDATE Cases SET status = ? WHERE case_id = ?",
+                (status, case_id)
+            )
+            updated = cursor.rowcount > 0
+            if updated:
+                change_events.record_events(conn, [_status_event(case_id, status)])
+            conn.commit()
+            if updated:
+                change_events.notify_committed()
+            return updated
+        except DatabaseError as e:
+            print(f"Database error: {e}")
+            conn.rollback()
+            return False
+
+def update_cases_status(case_ids, status):
+    """Sets the status of many cases in one transaction.
+
+    Returns the set of case IDs that existed and were updated, or None if
+    the update failed.
+    """
+    case_ids = list(dict.fromkeys(case_ids))
+    batch_size = permissions_manager.IN_BATCH_SIZE
+    updated = set()
+    with connection() as conn:
+        try:
+            for start in range(0, len(case_ids), batch_size):
+                batch = case_ids[start:start + batch_size]
+                placeholders = ', '.join('?' * len(batch))
+                rows = conn.execute(
+                    f"UPDATE Cases SET status = ? WHERE case_id IN ({placeholders}) RETURNING case_id",
+                    [status] + batch
+                ).fetchall()
+                updated.update(row['case_id'] for row in rows)
+            change_events.record_events(conn, [_status_event(case_id, status) for case_id in case_ids if case_id in updated])
+            conn.commit()
+            if updated:
+                change_events.notify_committed()
+            return updated
+        except DatabaseError as e:
+            print(f"Database error: {e}")
+            conn.rollback()
+            return None
+
+def _status_event(case_id, status):
+    return ('case_status', case_id, {"case_id": case_id, "status": status}, None)
@@ -0,0 +1,56 @@
+import json
+import os
+import random
+from .db import DIALECT, connection, utc_timestamp
+
+# Events are kept this long for clients resuming with Last-Event-ID
+EVENT_RETENTION_SECONDS = int(os.environ.get('EVENT_RETENTION_SECONDS', 24 * 3600))
+
+# Old events are purged on roughly one write in this many
+PURGE_EVERY = 1000
+
+# Transaction-scoped PostgreSQL advisory lock taken by event writers
+_WRITER_LOCK_KEY = 7417
+
+# Called with no arguments after a transaction that recorded events has
+# committed, e.g. by the change feed to wake its readers
+commit_listeners = []
+
+def record_events(conn, events):
+    """Appends (kind, case_id, data, user_id) change events inside the caller's transaction.
+
+    data is a JSON-serializable dict. user_id may be None; if set, that user
+    receives the event even without access to the case. Call this last,
+    just before commit, and call notify_committed() after: on PostgreSQL it
+    holds a lock until commit, so event IDs become visible in order and a
+    reader paging by ID never skips one.
+    """
+    if not events:
+        return
+    if DIALECT == 'postgresql':
+        conn.execute("SELECT pg_advisory_xact_lock(?)", (_WRITER_LOCK_KEY,))
+    conn.executemany(
+        "INSERT INTO ChangeEvents (kind, case_id, user_id, data) VALUES (?, ?, ?, ?)",
+        [(kind, case_id, user_id, json.dumps(data)) for kind, case_id, data, user_id in events]
+    )
+    if random.randrange(PURGE_EVERY) == 0:
+        conn.execute("DELETE FROM ChangeEvents WHERE created_at < ?", (utc_timestamp(-EVENT_RETENTION_SECONDS),))
+
+def notify_committed():
+    """Tells commit_listeners that new events are visible."""
+    for listener in commit_listeners:
+        listener()
+
+def get_events_after(event_id, limit):
+    """Returns up to limit events with IDs above event_id, oldest first."""
+    with connection() as conn:
+        return conn.execute(
+            "SELECT * FROM ChangeEvents WHERE event_id > ? ORDER BY event_id LIMIT ?",
+            (event_id, limit)
+        ).fetchall()
+
+def get_latest_event_id():
+    """Returns the newest event's ID, or 0 if there are none."""
+    with connection() as conn:
+        row = conn.execute("SELECT MAX(event_id) AS event_id FROM ChangeEvents").fetchone()
+    return row['event_id'] or 0
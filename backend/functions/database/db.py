@@ -0,0 +1,273 @@
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+from flask import g, has_app_context, has_request_context
+
+from .. import metrics
+
+DB_PATH = os.environ.get('DATABASE_PATH') or os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..', '..', 'DataBase', 'database.db')
+)
+
+# A postgresql:// URL selects PostgreSQL; otherwise the SQLite file at DB_PATH is used.
+DATABASE_URL = os.environ.get('DATABASE_URL', '')
+DIALECT = 'postgresql' if DATABASE_URL.startswith(('postgresql://', 'postgres://')) else 'sqlite'
+
+# SQLite: idle connections kept per worker process.
+# PostgreSQL: maximum open connections per worker process.
+POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', '8'))
+
+# Seconds to wait for a free PostgreSQL connection before giving up
+POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', '10'))
+
+# Number of compiled statements sqlite3 keeps per connection.
+STATEMENT_CACHE_SIZE = int(os.environ.get('DB_STATEMENT_CACHE_SIZE', '256'))
+
+# Count the statements each request runs and report them in an X-DB-Queries
+# response header (used by the benchmarks). Off by default.
+COUNT_QUERIES = os.environ.get('DB_COUNT_QUERIES', '').lower() in ('1', 'true', 'yes')
+
+# Statements slower than this many milliseconds are logged with their SQL
+# text (parameters are left out). 0 disables the log.
+SLOW_QUERY_MS = float(os.environ.get('DB_SLOW_QUERY_MS', '200'))
+
+# Statements are timed whenever something reads the numbers
+INSTRUMENT_QUERIES = COUNT_QUERIES or metrics.METRICS_ENABLED
+
+QUERY_SECONDS = metrics.Histogram(
+    'db_query_duration_seconds', "SQL statement execution time, by statement type.", labels=('statement',),
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+REQUEST_QUERIES = metrics.Histogram(
+    'db_queries_per_request', "SQL statements run per request, by route.", labels=('route',),
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100),
+)
+SLOW_QUERIES = metrics.Counter('db_slow_queries_total', "Statements slower than DB_SLOW_QUERY_MS.")
+
+# Called as listener(statement, seconds) after each timed statement, e.g. by
+# DataBase/check_query_plans.py to collect the SQL the app runs
+statement_listeners = []
+_STATEMENT_TYPES = ('select', 'insert', 'update', 'delete', 'with', 'savepoint', 'release')
+
+# Applied to every new connection. WAL lets readers run alongside the single
+# writer, and synchronous=NORMAL is durable across application crashes in WAL
+# mode while skipping an fsync per commit.
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA cache_size = -65536",    # 64 MiB page cache
+    "PRAGMA mmap_size = 268435456",  # 256 MiB memory-mapped I/O
+    "PRAGMA temp_store = MEMORY",
+)
+
+# Backend-neutral exception tuples for `except` clauses in the managers;
+# combine with other types as `except (*DatabaseError, OSError)`.
+IntegrityError = (sqlite3.IntegrityError,)
+DatabaseError = (sqlite3.Error,)
+
+if DIALECT == 'postgresql':
+    import psycopg2
+
+    from .postgres import PostgresPool
+
+    IntegrityError += (psycopg2.IntegrityError,)
+    DatabaseError += (psycopg2.Error,)
+    _pool = None
+else:
+    _pool = queue.LifoQueue(maxsize=POOL_SIZE)
+
+_pool_pid = os.getpid()
+_pool_lock = threading.Lock()
+
+def utc_timestamp(offset_seconds=0):
+    """The current UTC time (plus an offset) in the 'YYYY-MM-DD HH:MM:SS' form both backends store.
+
+    Pass it as a parameter instead of writing datetime('now', ...) or now()
+    into the SQL, so the same statement runs on either backend.
+    """
+    moment = datetime.now(timezone.utc) + timedelta(seconds=offset_seconds)
+    return moment.strftime('%Y-%m-%d %H:%M:%S')
+
+def iterate(conn, sql, params=None, batch_size=500):
+    """Yields the rows of a large query without loading them all at once.
+
+    PostgreSQL uses a server-side cursor; SQLite steps its cursor lazily anyway.
+    """
+    if DIALECT == 'postgresql':
+        yield from conn.iterate(sql, params, batch_size)
+    else:
+        yield from conn.execute(sql, params or ())
+
+@contextmanager
+def savepoint(conn, name):
+    """Runs a block inside a savepoint of the connection's current transaction.
+
+    If the block raises, only its own changes are rolled back and the
+    exception propagates; earlier work in the transaction is kept. Used by
+    bulk operations to report per-item failures while committing once.
+    """
+    if DIALECT == 'sqlite' and not conn.in_transaction:
+        # Outside a transaction, releasing the savepoint would commit
+        conn.execute("BEGIN")
+    conn.execute(f"SAVEPOINT {name}")
+    try:
+        yield
+    except BaseException:
+        conn.execute(f"ROLLBACK TO SAVEPOINT {name}")
+        conn.execute(f"RELEASE SAVEPOINT {name}")
+        raise
+    conn.execute(f"RELEASE SAVEPOINT {name}")
+
+def query_count():
+    """Statements run so far in the current request (0 unless instrumentation is on)."""
+    return metrics.request_timing('db')[1]
+
+def _observe_statement(statement, seconds):
+    # Only statements the application issues are seen (not those run by
+    # triggers); transaction control and connection setup are left out.
+    words = statement.split(None, 1)
+    kind = words[0].lower() if words else ''
+    if kind in ('begin', 'commit', 'rollback', 'pragma'):
+        return
+    QUERY_SECONDS.observe(seconds, statement=kind if kind in _STATEMENT_TYPES else 'other')
+    metrics.record_timing('db', seconds)
+    if SLOW_QUERY_MS and seconds * 1000 >= SLOW_QUERY_MS:
+        SLOW_QUERIES.inc()
+        route = f" {metrics.route_label()}" if has_request_context() else ''
+        print(f"Slow query ({seconds * 1000:.1f} ms){route}: {' '.join(statement.split())}")
+    for listener in statement_listeners:
+        listener(statement, seconds)
+
+class _TimedCursor(sqlite3.Cursor):
+    # With SQLite a SELECT's execute() steps to the first row; later fetches are not timed.
+    def execute(self, sql, parameters=()):
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            _observe_statement(sql, time.perf_counter() - started)
+
+    def executemany(self, sql, seq_of_parameters):
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            _observe_statement(sql, time.perf_counter() - started)
+
+class _TimedConnection(sqlite3.Connection):
+    """SQLite connection that times each statement, used when INSTRUMENT_QUERIES is on."""
+
+    def cursor(self, factory=_TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+def _connect():
+    """Opens a new tuned SQLite connection."""
+    conn = sqlite3.connect(
+        DB_PATH,
+        timeout=5.0,
+        check_same_thread=False,
+        cached_statements=STATEMENT_CACHE_SIZE,
+        factory=_TimedConnection if INSTRUMENT_QUERIES else sqlite3.Connection,
+    )
+    conn.row_factory = sqlite3.Row
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+def _reset_pool_after_fork():
+    """Drops connections inherited from a parent process (e.g. gunicorn --preload)."""
+    global _pool, _pool_pid
+    if _pool_pid == os.getpid() and _pool is not None:
+        return
+    with _pool_lock:
+        if _pool_pid != os.getpid() or _pool is None:
+            # Inherited handles belong to the parent; never reuse or close them here.
+            if DIALECT == 'postgresql':
+                _pool = PostgresPool(
+                    DATABASE_URL, POOL_SIZE, POOL_TIMEOUT,
+                    on_execute=_observe_statement if INSTRUMENT_QUERIES else None,
+                )
+            else:
+                _pool = queue.LifoQueue(maxsize=POOL_SIZE)
+            _pool_pid = os.getpid()
+
+def acquire_connection():
+    """Takes an idle connection from the pool, opening a new one if none is free.
+
+    With PostgreSQL, waits up to DB_POOL_TIMEOUT seconds once POOL_SIZE
+    connections are in use.
+    """
+    _reset_pool_after_fork()
+    if DIALECT == 'postgresql':
+        return _pool.acquire()
+    try:
+        return _pool.get_nowait()
+    except queue.Empty:
+        return _connect()
+
+def release_connection(conn):
+    """Returns a connection to the pool, discarding any uncommitted work."""
+    if DIALECT == 'postgresql':
+        _pool.release(conn)
+        return
+    if conn.in_transaction:
+        conn.rollback()
+    try:
+        _pool.put_nowait(conn)
+    except queue.Full:
+        conn.close()
+
+@contextmanager
+def connection():
+    """Yields a database connection.
+
+    Inside a Flask app context the same connection is reused for the whole
+    request and released on teardown; elsewhere it is returned to the pool
+    when the block exits.
+    """
+    if has_app_context():
+        conn = g.get('_db_conn')
+        if conn is None:
+            conn = g._db_conn = acquire_connection()
+        yield conn
+        return
+
+    conn = acquire_connection()
+    try:
+        yield conn
+    finally:
+        release_connection(conn)
+
+def close_request_connection(exception=None):
+    """Releases the connection held by the current app context, if any."""
+    conn = g.pop('_db_conn', None)
+    if conn is not None:
+        release_connection(conn)
+
+def add_query_count_header(response):
+    response.headers['X-DB-Queries'] = str(query_count())
+    return response
+
+def observe_request_queries(response):
+    REQUEST_QUERIES.observe(query_count(), route=metrics.route_label())
+    return response
+
+def init_app(app):
+    """Registers request-scoped connection cleanup on a Flask app."""
+    app.teardown_appcontext(close_request_connection)
+    if metrics.METRICS_ENABLED:
+        app.after_request(observe_request_queries)
+    if COUNT_QUERIES:
+        app.after_request(add_query_count_header)
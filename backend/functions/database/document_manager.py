@@ -1,50 +1,232 @@
-import sqlite3
 import uuid
-import os
+from .db import DatabaseError, connection, savepoint
+from .pagination import decode_cursor, fetch_page
+from . import change_events
 
-DB_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'DataBase', 'database.db'))
+def add_document(case_id, uploader_id, file_name, content_hash, size_bytes, storage_key, store_blob=None,
+                 stored_bytes=None, content_encoding=None):
+    """Adds a new document record referencing a content-addressed blob.
 
-def get_db_connection():
-    """Creates a database connection."""
-    return sqlite3.connect(DB_PATH)
+    If this is the first reference to the blob, store_blob() is called inside
+    the transaction so the file is in place before the row becomes visible.
+    stored_bytes and content_encoding describe a compressed blob (stored_bytes
+    defaults to size_bytes); a blob that already exists keeps its own, unless
+    no document references it, in which case it is stored again.
+    Returns (doc_id, is_duplicate), or (None, False) on failure.
+    """
+    with connection() as conn:
+        cursor = conn.cursor()
+        try:
+            events = []
+            result = _insert_document(
+                cursor, case_id, uploader_id, file_name, content_hash, size_bytes, storage_key, store_blob,
+                stored_bytes, content_encoding, events
+            )
+            change_events.record_events(conn, events)
+            conn.commit()
+            change_events.notify_committed()
+            return result
+        except (*DatabaseError, OSError) as e:
+            print(f"Database error: {e}")
+            conn.rollback()
+            return None, False
 
-def add_document(case_id, uploader_id, file_name, storage_path):
-    """Adds a new document record to the database."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+def add_documents(case_id, uploader_id, files):
+    """Adds several documents to a case in one transaction.
 
+    `files` is a list of dicts with the add_document arguments file_name,
+    content_hash, size_bytes, storage_key, store_blob and optionally
+    stored_bytes and content_encoding. Each file gets its
+    own savepoint, so one failure does not undo the others. Returns one
+    (doc_id, is_duplicate) per file, with (None, False) for failures.
+    """
+    results, events = [], []
+    with connection() as conn:
+        cursor = conn.cursor()
+        try:
+            for file in files:
+                try:
+                    with savepoint(conn, 'add_document'):
+                        results.append(_insert_document(
+                            cursor, case_id, uploader_id, file['file_name'], file['content_hash'],
+                            file['size_bytes'], file['storage_key'], file.get('store_blob'),
+                            file.get('stored_bytes'), file.get('content_encoding'), events
+                        ))
+                except (*DatabaseError, OSError) as e:
+                    print(f"Database error: {e}")
+                    results.append((None, False))
+            change_events.record_events(conn, events)
+            conn.commit()
+            if events:
+                change_events.notify_committed()
+            return results
+        except DatabaseError as e:
+            print(f"Database error: {e}")
+            conn.rollback()
+            return [(None, False)] * len(files)
+
+def _insert_document(cursor, case_id, uploader_id, file_name, content_hash, size_bytes, storage_key, store_blob,
+                     stored_bytes=None, content_encoding=None, events=None):
     doc_id = str(uuid.uuid4())
-    
-    try:
-        cursor.execute(
-            "INSERT INTO Documents (doc_id, case_id, uploader_id, file_name, storage_path) VALUES (?, ?, ?, ?, ?)",
-            (doc_id, case_id, uploader_id, file_name, storage_path)
-        )
-        conn.commit()
-        return doc_id
-    except sqlite3.Error as e:
-        print(f"Database error: {e}")
-        conn.rollback()
-        return None
-    finally:
-        conn.close()
+    cursor.execute(
+        """
+        INSERT INTO Blobs (content_hash, storage_key, size_bytes, stored_bytes, content_encoding, ref_count)
+        VALUES (?, ?, ?, ?, ?, 1)
+        ON CONFLICT(content_hash) DO UPDATE SET ref_count = Blobs.ref_count + 1,
+            storage_key = CASE WHEN Blobs.ref_count > 0 THEN Blobs.storage_key ELSE excluded.storage_key END,
+            stored_bytes = CASE WHEN Blobs.ref_count > 0 THEN Blobs.stored_bytes ELSE excluded.stored_bytes END,
+            content_encoding = CASE WHEN Blobs.ref_count > 0 THEN Blobs.content_encoding ELSE excluded.content_encoding END
+        RETURNING ref_count
+        """,
+        (content_hash, storage_key, size_bytes, size_bytes if stored_bytes is None else stored_bytes, content_encoding)
+    )
+    is_duplicate = cursor.fetchone()['ref_count'] > 1
+    cursor.execute(
+        "INSERT INTO Documents (doc_id, case_id, uploader_id, file_name, content_hash, size_bytes) "
+        "VALUES (?, ?, ?, ?, ?, ?) RETURNING *",
+        (doc_id, case_id, uploader_id, file_name, content_hash, size_bytes)
+    )
+    document = dict(cursor.fetchone())
+    if not is_duplicate and store_blob is not None:
+        store_blob()
+    if events is not None:
+        events.append(('document_added', case_id, {"case_id": case_id, "document": document}, None))
+    return doc_id, is_duplicate
+
+# Unreferenced blobs removed per delete_document call, including ones left
+# behind by earlier failures
+BLOB_REMOVALS_PER_DELETE = 10
+
+def delete_document(doc_id, remove_blob=None):
+    """Deletes a document record and drops one reference to its blob.
+
+    The document is deleted and committed first; a blob left without
+    references keeps its row with ref_count 0. Then, for that blob and any
+    others left over, remove_blob(content_hash, storage_key) is called
+    while the row is locked and being deleted, so a concurrent upload of the
+    same content waits and then stores a fresh copy. If removal fails the
+    row stays at 0 and is retried by a later delete; an upload of the same
+    content in the meantime takes it over and stores the file again.
+    Returns True if the document existed.
+    """
+    with connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("DELETE FROM Documents WHERE doc_id = ? RETURNING content_hash", (doc_id,))
+            row = cursor.fetchone()
+            if row is None:
+                conn.rollback()
+                return False
+
+            cursor.execute(
+                "UPDATE Blobs SET ref_count = ref_count - 1 WHERE content_hash = ?", (row['content_hash'],)
+            )
+            conn.commit()
+        except DatabaseError as e:
+            print(f"Database error: {e}")
+            conn.rollback()
+            return False
+
+    if remove_blob is not None:
+        remove_unreferenced_blobs(remove_blob, BLOB_REMOVALS_PER_DELETE)
+    return True
+
+def remove_unreferenced_blobs(remove_blob, limit):
+    """Deletes up to limit blobs no document references, one transaction each.
+
+    Returns the number removed.
+    """
+    removed = 0
+    with connection() as conn:
+        try:
+            pending = conn.execute(
+                "SELECT content_hash FROM Blobs WHERE ref_count <= 0 LIMIT ?", (limit,)
+            ).fetchall()
+        except DatabaseError as e:
+            print(f"Database error: {e}")
+            conn.rollback()
+            return 0
+
+        for row in pending:
+            try:
+                blob = conn.execute(
+                    "DELETE FROM Blobs WHERE content_hash = ? AND ref_count <= 0 RETURNING storage_key",
+                    (row['content_hash'],)
+                ).fetchone()
+                if blob is not None:
+                    remove_blob(row['content_hash'], blob['storage_key'])
+                    removed += 1
+                conn.commit()
+            except (*DatabaseError, OSError) as e:
+                print(f"Database error: {e}")
+                conn.rollback()
+    return removed
 
 def get_case_documents(case_id):
     """Retrieves all documents for a given case."""
-    conn = get_db_connection()
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM Documents WHERE case_id = ? ORDER BY uploaded_at DESC", (case_id,))
-    documents = cursor.fetchall()
-    conn.close()
-    return documents
+    with connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            SELECT d.*, b.storage_key, b.stored_bytes, b.content_encoding, b.crc32 FROM Documents d
+            JOIN Blobs b ON b.content_hash = d.content_hash
+            WHERE d.case_id = ?
+            ORDER BY d.uploaded_at DESC
+            """,
+            (case_id,)
+        )
+        return cursor.fetchall()
+
+def list_case_documents(case_id, uploader_id=None, uploaded_from=None, uploaded_to=None,
+                        cursor=None, limit=50):
+    """Returns one page of a case's documents, newest first, and the next-page cursor.
+
+    Pages are keyed on (uploaded_at, doc_id) within the case.
+    """
+    query = "SELECT * FROM Documents WHERE case_id = ?"
+    params = [case_id]
+
+    if uploader_id:
+        query += " AND uploader_id = ?"
+        params.append(uploader_id)
+    if uploaded_from:
+        query += " AND uploaded_at >= ?"
+        params.append(uploaded_from)
+    if uploaded_to:
+        query += " AND uploaded_at <= ?"
+        params.append(uploaded_to)
+    if cursor:
+        query += " AND (uploaded_at, doc_id) < (?, ?)"
+        params.extend(decode_cursor(cursor))
+
+    query += " ORDER BY uploaded_at DESC, doc_id DESC LIMIT ?"
+    params.append(limit + 1)
+
+    with connection() as conn:
+        db_cursor = conn.cursor()
+        db_cursor.execute(query, params)
+        return fetch_page(db_cursor, limit, ('uploaded_at', 'doc_id'))
+
+def set_blob_crc32(content_hash, crc32):
+    """Records a blob's CRC-32 once it has been computed (e.g. by a ZIP export)."""
+    with connection() as conn:
+        try:
+            conn.execute("UPDATE Blobs SET crc32 = ? WHERE content_hash = ?", (crc32, content_hash))
+            conn.commit()
+        except DatabaseError as e:
+            print(f"Database error: {e}")
+            conn.rollback()
 
 def get_document_by_id(doc_id):
     """Retrieves a single document by its ID."""
-    conn = get_db_connection()
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM Documents WHERE doc_id = ?", (doc_id,))
-    document = cursor.fetchone()
-    conn.close()
-    return document
+    with connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            SELECT d.*, b.storage_key, b.stored_bytes, b.content_encoding FROM Documents d
+            JOIN Blobs b ON b.content_hash = d.content_hash
+            WHERE d.doc_id = ?
+            """,
+            (doc_id,)
+        )
+        return cursor.fetchone()
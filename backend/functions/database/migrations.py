@@ -0,0 +1,110 @@
+"""Schema versioning, shared by DataBase/database_init.py and the app's startup check.
+
+Version 1 is the baseline schema that database_init.py creates. Later
+versions are SQL files in DataBase/migrations named
+`NNNN_description.<dialect>.sql` (dialect is sqlite or postgresql). Each is
+applied once, in order, in a transaction with its SchemaVersion row.
+"""
+import os
+import re
+
+from . import db
+from .db import DatabaseError
+
+MIGRATIONS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'DataBase', 'migrations'))
+
+BASELINE_VERSION = 1
+
+_FILE_RE = re.compile(r'^(\d{4})_(\w+)\.(sqlite|postgresql)\.sql$')
+
+_VERSION_TABLE = """
+CREATE TABLE IF NOT EXISTS SchemaVersion (
+    version INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+class SchemaOutdated(RuntimeError):
+    """Raised when the database schema is older than the code expects."""
+
+def list_migrations(dialect=None):
+    """Returns [(version, name, path)] for the dialect's migration files, in order."""
+    dialect = dialect or db.DIALECT
+    migrations = []
+    for file_name in os.listdir(MIGRATIONS_DIR) if os.path.isdir(MIGRATIONS_DIR) else []:
+        match = _FILE_RE.match(file_name)
+        if match and match.group(3) == dialect:
+            migrations.append((int(match.group(1)), match.group(2), os.path.join(MIGRATIONS_DIR, file_name)))
+    migrations.sort()
+    expected = list(range(BASELINE_VERSION + 1, BASELINE_VERSION + 1 + len(migrations)))
+    if [version for version, _, _ in migrations] != expected:
+        raise RuntimeError(f"{dialect} migrations in {MIGRATIONS_DIR} must be numbered {expected}")
+    return migrations
+
+def latest_version(dialect=None):
+    """The schema version this code expects."""
+    migrations = list_migrations(dialect)
+    return migrations[-1][0] if migrations else BASELINE_VERSION
+
+def schema_version(conn):
+    """The database's schema version; 0 if it has never been migrated."""
+    try:
+        row = conn.execute("SELECT MAX(version) AS version FROM SchemaVersion").fetchone()
+    except DatabaseError:
+        conn.rollback()
+        return 0
+    return row['version'] or 0
+
+def check_schema():
+    """Raises SchemaOutdated unless every migration has been applied. Returns the version."""
+    with db.connection() as conn:
+        current = schema_version(conn)
+    latest = latest_version()
+    if current < latest:
+        raise SchemaOutdated(
+            f"Database schema is at version {current} but this code needs {latest}; "
+            "run DataBase/database_init.py to migrate it"
+        )
+    return current
+
+def migrate(create_baseline):
+    """Brings the schema up to date and returns the (old, new) versions.
+
+    create_baseline() is called first on a database below the baseline
+    version, including ones created before versioning (it must be idempotent).
+    Run this from one process at a time, e.g. as a deploy step.
+    """
+    with db.connection() as conn:
+        conn.execute(_VERSION_TABLE)
+        conn.commit()
+        current = schema_version(conn)
+        if current < BASELINE_VERSION:
+            create_baseline()
+            _record(conn, BASELINE_VERSION, 'baseline')
+            conn.commit()
+
+        for version, name, path in list_migrations():
+            if version <= current:
+                continue
+            with open(path) as f:
+                sql = f.read()
+            try:
+                if db.DIALECT == 'postgresql':
+                    conn.execute(sql)
+                    _record(conn, version, name)
+                    conn.commit()
+                else:
+                    # executescript commits any open transaction first, so the
+                    # migration and its version row are wrapped explicitly
+                    conn.executescript(
+                        f"BEGIN;\n{sql}\n;INSERT INTO SchemaVersion (version, name) VALUES ({version}, '{name}');\nCOMMIT;"
+                    )
+            except DatabaseError:
+                conn.rollback()
+                raise
+            print(f"Applied migration {version:04d} {name}")
+    return current, latest_version()
+
+def _record(conn, version, name):
+    conn.execute("INSERT INTO SchemaVersion (version, name) VALUES (?, ?)", (version, name))
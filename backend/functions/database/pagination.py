@@ -0,0 +1,69 @@
+import base64
+import json
+from datetime import date, datetime, timezone
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+def encode_cursor(values):
+    """Encodes the sort key of the last row on a page as an opaque token."""
+    raw = json.dumps(list(values), separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(token, size=2):
+    """Decodes a cursor token. Raises ValueError if it is malformed."""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError("Invalid cursor")
+    # Only values a query parameter can bind (None for a NULL key, as in the
+    # last user search tier); bool is an int subclass
+    if any(isinstance(value, bool) or not isinstance(value, (str, int, float, type(None))) for value in values):
+        raise ValueError("Invalid cursor")
+    return values
+
+def clamp_limit(limit):
+    """Returns a page size within [1, MAX_PAGE_SIZE]. Raises ValueError on junk input."""
+    if limit in (None, ''):
+        return DEFAULT_PAGE_SIZE
+    limit = int(limit)
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+def normalize_timestamp(value, end_of_day=False):
+    """Converts an ISO date or datetime to the 'YYYY-MM-DD HH:MM:SS' UTC form both backends store.
+
+    Values with a UTC offset are converted to UTC; values without one are
+    taken as UTC. A bare date means its first second, or with end_of_day
+    (for inclusive upper bounds) its last, so the whole day is included.
+    Raises ValueError if the value cannot be parsed.
+    """
+    if value in (None, ''):
+        return None
+    if end_of_day and _is_date(value):
+        return date.fromisoformat(value).strftime('%Y-%m-%d 23:59:59')
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc)
+    return parsed.strftime('%Y-%m-%d %H:%M:%S')
+
+def _is_date(value):
+    try:
+        date.fromisoformat(value)
+    except ValueError:
+        return False
+    return True
+
+def fetch_page(cursor, limit, key_columns):
+    """Fetches at most `limit` rows plus one look-ahead row.
+
+    Returns (rows, next_cursor) where next_cursor is None on the last page.
+    """
+    rows = cursor.fetchmany(limit + 1)
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(last[column] for column in key_columns)
@@ -1,123 +1,236 @@
-import sqlite3
 import os
-
-DB_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'DataBase', 'database.db'))
-
-def get_db_connection():
-    """Creates a database connection."""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
-
-def sanitize_case_id(case_id):
-    """Removes hyphens from the case_id to create a valid table name."""
-    return case_id.replace('-', '')
-
-def get_permissions_table_name(case_id):
-    """Returns the sanitized table name for a given case_id."""
-    return f"CaseAccessPermissions_{sanitize_case_id(case_id)}"
-
-def create_permissions_table(case_id):
-    """Creates a new permissions table for a specific case."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    table_name = get_permissions_table_name(case_id)
-    
-    try:
-        cursor.execute(f'''
-        CREATE TABLE IF NOT EXISTS {table_name} (
-            case_id TEXT NOT NULL,
-            user_id TEXT NOT NULL,
-            access_level TEXT NOT NULL,
-            FOREIGN KEY (case_id) REFERENCES Cases(case_id) ON DELETE CASCADE,
-            FOREIGN KEY (user_id) REFERENCES Users(user_id) ON DELETE CASCADE,
-            UNIQUE (case_id, user_id)
-        )
-        ''')
-        conn.commit()
-    finally:
-        conn.close()
+import threading
+import time
+from .db import DatabaseError, connection
+from . import change_events
+from ..cache import LRUCache, MISSING
+
+# (case_id, user_id) -> access_level (or None for "no access")
+ACL_CACHE_SIZE = int(os.environ.get('ACL_CACHE_SIZE', '10000'))
+ACL_CACHE_TTL = float(os.environ.get('ACL_CACHE_TTL', '60'))
+
+# How often each process reads the shared AclVersion counter. Grants made by
+# other workers can take this long to be seen; a worker's own apply at once.
+ACL_VERSION_POLL_SECONDS = float(os.environ.get('ACL_VERSION_POLL_SECONDS', '0.25'))
+
+# Ids per IN (...) list in bulk lookups, well under SQLite's parameter limit
+IN_BATCH_SIZE = 500
+
+_access_cache = LRUCache(maxsize=ACL_CACHE_SIZE, ttl=ACL_CACHE_TTL)
+_acl_version = None
+_acl_version_checked_at = None
+_acl_version_lock = threading.Lock()
+_acl_invalidations = 0
+
+def _sync_acl_version():
+    """Clears the cache if another worker has changed grants since we last looked.
+
+    Every grant bumps the single-row AclVersion counter, which is read at most
+    once per ACL_VERSION_POLL_SECONDS.
+    """
+    global _acl_version, _acl_version_checked_at, _acl_invalidations
+    now = time.monotonic()
+    checked_at = _acl_version_checked_at
+    if checked_at is not None and now - checked_at < ACL_VERSION_POLL_SECONDS:
+        return
+
+    with connection() as conn:
+        row = conn.execute("SELECT version FROM AclVersion WHERE id = 1").fetchone()
+    version = row['version'] if row else 0
+
+    with _acl_version_lock:
+        if version != _acl_version:
+            if _acl_version is not None:
+                _acl_invalidations += 1
+            _access_cache.clear()
+            _acl_version = version
+        _acl_version_checked_at = now
+
+def write_grants(conn, grants):
+    """Inserts or updates (case_id, user_id, access_level) grants and bumps AclVersion.
+
+    Must run inside the caller's write transaction. Pass the returned
+    version to grants_committed() once the transaction has committed.
+    """
+    conn.executemany(
+        """
+        INSERT INTO CaseAccess (case_id, user_id, access_level) VALUES (?, ?, ?)
+        ON CONFLICT(case_id, user_id) DO UPDATE SET access_level = excluded.access_level
+        """,
+        grants
+    )
+    return conn.execute(
+        "UPDATE AclVersion SET version = version + 1 WHERE id = 1 RETURNING version"
+    ).fetchone()['version']
+
+def grants_committed(new_version, grants):
+    """Drops the local cache entries for committed grants and records the new AclVersion.
+
+    Run only after commit: a reader that looked before then may have cached
+    the old access level, and one still reading sees the version change and
+    does not cache what it read.
+    """
+    global _acl_version, _acl_invalidations
+    with _acl_version_lock:
+        if _acl_version is not None and new_version == _acl_version + 1:
+            # Only our own write happened since the last sync.
+            for case_id, user_id, _ in grants:
+                _access_cache.pop((case_id, user_id))
+        else:
+            _access_cache.clear()
+            _acl_invalidations += 1
+        _acl_version = new_version
+
+def get_acl_cache_stats():
+    """Returns hit/miss counters for the access-level cache."""
+    stats = _access_cache.stats()
+    stats["invalidations"] = _acl_invalidations
+    stats["version"] = _acl_version
+    return stats
 
 def grant_access(case_id, user_id, access_level):
-    """Grants a user access to a case."""
-    create_permissions_table(case_id)
+    """Grants a user access to a case, or updates their existing access level."""
+    with connection() as conn:
+        try:
+            grants = [(case_id, user_id, access_level)]
+            new_version = write_grants(conn, grants)
+            change_events.record_events(conn, [grant_event(case_id, user_id, access_level)])
+            conn.commit()
+        except DatabaseError as e:
+            print(f"Database error: {e}")
+            conn.rollback()
+            return False
 
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    table_name = get_permissions_table_name(case_id)
-
-    try:
-        cursor.execute(
-            f"INSERT INTO {table_name} (case_id, user_id, access_level) VALUES (?, ?, ?)",
-            (case_id, user_id, access_level)
-        )
-        conn.commit()
-        return True
-    except sqlite3.IntegrityError:
-        # If user already has access, update their access level
-        cursor.execute(
-            f"UPDATE {table_name} SET access_level = ? WHERE user_id = ? AND case_id = ?",
-            (access_level, user_id, case_id)
-        )
-        conn.commit()
-        return True
-    finally:
-        conn.close()
+    grants_committed(new_version, grants)
+    change_events.notify_committed()
+    return True
+
+def grant_access_bulk(grants):
+    """Grants or updates many (case_id, user_id, access_level) triples in one transaction.
+
+    Returns one result per grant, in order: None if it was applied, or an
+    error message. Grants naming a missing case or user are skipped; the
+    rest are written together and committed once.
+    """
+    grants = list(grants)
+    with connection() as conn:
+        try:
+            cases = _existing_ids(conn, 'Cases', 'case_id', {case_id for case_id, _, _ in grants})
+            users = _existing_ids(conn, 'Users', 'user_id', {user_id for _, user_id, _ in grants})
+            results, valid = [], []
+            for case_id, user_id, access_level in grants:
+                if case_id not in cases:
+                    results.append("Case not found")
+                elif user_id not in users:
+                    results.append("User not found")
+                else:
+                    results.append(None)
+                    valid.append((case_id, user_id, access_level))
+
+            if valid:
+                new_version = write_grants(conn, valid)
+                change_events.record_events(conn, [grant_event(*grant) for grant in valid])
+            conn.commit()
+        except DatabaseError as e:
+            print(f"Database error: {e}")
+            conn.rollback()
+            return ["Failed to grant access"] * len(grants)
+
+    if valid:
+        grants_committed(new_version, valid)
+        change_events.notify_committed()
+    return results
+
+def grant_event(case_id, user_id, access_level):
+    """The access_granted change event, addressed to the grantee too in case their cached access is stale."""
+    return ('access_granted', case_id, {"case_id": case_id, "user_id": user_id, "access_level": access_level}, user_id)
+
+def _existing_ids(conn, table, column, ids):
+    """Returns the subset of ids present in table.column, querying in batches."""
+    ids = list(ids)
+    found = set()
+    for start in range(0, len(ids), IN_BATCH_SIZE):
+        batch = ids[start:start + IN_BATCH_SIZE]
+        placeholders = ', '.join('?' * len(batch))
+        rows = conn.execute(f"SELECT {column} FROM {table} WHERE {column} IN ({placeholders})", batch).fetchall()
+        found.update(row[column] for row in rows)
+    return found
 
 def check_access(case_id, user_id):
     """Checks if a user has any access to a given case."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    table_name = get_permissions_table_name(case_id)
-
-    try:
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name=?", (table_name,))
-        if cursor.fetchone() is None:
-            return False
-
-        cursor.execute(f"SELECT 1 FROM {table_name} WHERE user_id = ? AND case_id = ?", (user_id, case_id))
-        result = cursor.fetchone()
-        return result is not None
-    finally:
-        conn.close()
+    return get_user_access_level(case_id, user_id) is not None
 
 def get_user_access_level(case_id, user_id):
     """Gets the access level for a user on a specific case."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    table_name = get_permissions_table_name(case_id)
-
-    try:
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name=?", (table_name,))
-        if cursor.fetchone() is None:
-            return None
-
-        cursor.execute(f"SELECT access_level FROM {table_name} WHERE user_id = ? AND case_id = ?", (user_id, case_id))
+    _sync_acl_version()
+    access_level = _access_cache.get((case_id, user_id))
+    if access_level is not MISSING:
+        return access_level
+
+    version_before_read = _acl_version
+    with connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT access_level FROM CaseAccess WHERE case_id = ? AND user_id = ?",
+            (case_id, user_id)
+        )
         result = cursor.fetchone()
-        return result['access_level'] if result else None
-    finally:
-        conn.close()
+        access_level = result['access_level'] if result else None
+
+    # Skip caching if a grant landed in this process while we were reading.
+    with _acl_version_lock:
+        if _acl_version == version_before_read:
+            _access_cache.set((case_id, user_id), access_level)
+    return access_level
+
+def get_user_access_levels(case_ids, user_id):
+    """Gets a user's access level on each of several cases with at most one query.
+
+    Returns {case_id: access_level or None}.
+    """
+    _sync_acl_version()
+    levels, missing = {}, []
+    for case_id in dict.fromkeys(case_ids):
+        access_level = _access_cache.get((case_id, user_id))
+        if access_level is MISSING:
+            missing.append(case_id)
+        else:
+            levels[case_id] = access_level
+    if not missing:
+        return levels
+
+    version_before_read = _acl_version
+    found = {}
+    with connection() as conn:
+        for start in range(0, len(missing), IN_BATCH_SIZE):
+            batch = missing[start:start + IN_BATCH_SIZE]
+            placeholders = ', '.join('?' * len(batch))
+            rows = conn.execute(
+                f"SELECT case_id, access_level FROM CaseAccess WHERE user_id = ? AND case_id IN ({placeholders})",
+                [user_id] + batch
+            ).fetchall()
+            found.update((row['case_id'], row['access_level']) for row in rows)
+
+    with _acl_version_lock:
+        cache = _acl_version == version_before_read
+        for case_id in missing:
+            levels[case_id] = found.get(case_id)
+            if cache:
+                _access_cache.set((case_id, user_id), levels[case_id])
+    return levels
 
 def get_case_permissions(case_id):
     """Retrieves all user permissions for a specific case."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    table_name = get_permissions_table_name(case_id)
-
-    try:
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name=?", (table_name,))
-        if cursor.fetchone() is None:
-            return []
-
+    with connection() as conn:
+        cursor = conn.cursor()
         # Join with Users table to get user details
-        query = f"""
+        cursor.execute(
+            """
             SELECT p.user_id, u.full_name, u.email, p.access_level
-            FROM {table_name} p
+            FROM CaseAccess p
             JOIN Users u ON p.user_id = u.user_id
             WHERE p.case_id = ?
-        """
-        cursor.execute(query, (case_id,))
-        permissions = cursor.fetchall()
-        return permissions
-    finally:
-        conn.close()
\ No newline at end of file
+            """,
+            (case_id,)
+        )
+        return cursor.fetchall()
@@ -0,0 +1,171 @@
+import functools
+import threading
+import time
+import uuid
+
+import psycopg2
+import psycopg2.extensions
+import psycopg2.extras
+import psycopg2.pool
+
+# Timestamps come back as 'YYYY-MM-DD HH:MM:SS' text, the same form SQLite
+# stores, so cursors, JSON output and comparisons behave identically.
+# Columns are TIMESTAMP(0) in UTC, so there is no fractional part to drop.
+_TIMESTAMP_AS_TEXT = psycopg2.extensions.new_type(
+    (1114,), 'TIMESTAMP_AS_TEXT', lambda value, cursor: value
+)
+_TIMESTAMP_ARRAY_AS_TEXT = psycopg2.extensions.new_array_type(
+    (1115,), 'TIMESTAMP_ARRAY_AS_TEXT', _TIMESTAMP_AS_TEXT
+)
+
+@functools.lru_cache(maxsize=1024)
+def translate_placeholders(sql):
+    """Rewrites sqlite-style `?` placeholders as `%s`, escaping literal `%`.
+
+    Quoted strings and identifiers are left untouched.
+    """
+    out = []
+    quote = None
+    for char in sql:
+        if quote:
+            if char == quote:
+                quote = None
+            out.append('%%' if char == '%' else char)
+        elif char in ("'", '"'):
+            quote = char
+            out.append(char)
+        elif char == '?':
+            out.append('%s')
+        elif char == '%':
+            out.append('%%')
+        else:
+            out.append(char)
+    return ''.join(out)
+
+class PostgresCursor:
+    """A psycopg2 cursor that accepts `?` placeholders and returns dict-like rows."""
+
+    def __init__(self, raw, on_execute=None):
+        self._raw = raw
+        self._on_execute = on_execute
+
+    def execute(self, sql, params=None):
+        started = time.perf_counter()
+        try:
+            if params:
+                self._raw.execute(translate_placeholders(sql), tuple(params))
+            else:
+                self._raw.execute(sql)
+        finally:
+            if self._on_execute is not None:
+                self._on_execute(sql, time.perf_counter() - started)
+        return self
+
+    def executemany(self, sql, seq_of_params):
+        started = time.perf_counter()
+        try:
+            self._raw.executemany(translate_placeholders(sql), [tuple(p) for p in seq_of_params])
+        finally:
+            if self._on_execute is not None:
+                self._on_execute(sql, time.perf_counter() - started)
+        return self
+
+    def fetchone(self):
+        return self._raw.fetchone()
+
+    def fetchall(self):
+        return self._raw.fetchall()
+
+    def fetchmany(self, size):
+        return self._raw.fetchmany(size)
+
+    @property
+    def rowcount(self):
+        return self._raw.rowcount
+
+    def __iter__(self):
+        return iter(self._raw)
+
+    def close(self):
+        self._raw.close()
+
+class PostgresConnection:
+    """Wraps a psycopg2 connection in the subset of the sqlite3 API the managers use."""
+
+    def __init__(self, raw, on_execute=None):
+        self.raw = raw
+        self.on_execute = on_execute
+
+    def cursor(self, name=None):
+        return PostgresCursor(
+            self.raw.cursor(name=name, cursor_factory=psycopg2.extras.DictCursor), self.on_execute
+        )
+
+    def execute(self, sql, params=None):
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        return self.cursor().executemany(sql, seq_of_params)
+
+    def iterate(self, sql, params=None, batch_size=500):
+        """Streams rows through a server-side (named) cursor, batch_size at a time."""
+        cursor = self.cursor(name=f"stream_{uuid.uuid4().hex}")
+        cursor._raw.itersize = batch_size
+        try:
+            cursor.execute(sql, params)
+            yield from cursor
+        finally:
+            cursor.close()
+
+    def commit(self):
+        self.raw.commit()
+
+    def rollback(self):
+        self.raw.rollback()
+
+    @property
+    def in_transaction(self):
+        return self.raw.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+    @property
+    def broken(self):
+        return self.raw.closed or self.raw.get_transaction_status() == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN
+
+    def close(self):
+        self.raw.close()
+
+class PostgresPool:
+    """A bounded psycopg2 ThreadedConnectionPool; callers wait for a free connection.
+
+    on_execute(sql, seconds), if given, is called after each statement runs.
+    """
+
+    def __init__(self, dsn, max_connections, timeout, on_execute=None):
+        self._pool = psycopg2.pool.ThreadedConnectionPool(
+            0, max_connections, dsn,
+            # UTC so CURRENT_TIMESTAMP matches the timestamps SQLite writes
+            options='-c timezone=UTC',
+        )
+        self._slots = threading.BoundedSemaphore(max_connections)
+        self._timeout = timeout
+        self._on_execute = on_execute
+
+    def acquire(self):
+        if not self._slots.acquire(timeout=self._timeout):
+            raise psycopg2.OperationalError("Timed out waiting for a database connection")
+        try:
+            raw = self._pool.getconn()
+        except Exception:
+            self._slots.release()
+            raise
+        psycopg2.extensions.register_type(_TIMESTAMP_AS_TEXT, raw)
+        psycopg2.extensions.register_type(_TIMESTAMP_ARRAY_AS_TEXT, raw)
+        return PostgresConnection(raw, self._on_execute)
+
+    def release(self, conn):
+        try:
+            if not conn.broken and conn.in_transaction:
+                conn.rollback()
+            self._pool.putconn(conn.raw, close=conn.broken)
+        finally:
+            self._slots.release()
@@ -0,0 +1,84 @@
+import uuid
+from .db import DatabaseError, connection, utc_timestamp
+
+def create_upload_session(case_id, user_id, file_name, total_size):
+    """Starts a resumable upload and returns its upload_id."""
+    upload_id = str(uuid.uuid4())
+
+    with connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                "INSERT INTO UploadSessions (upload_id, case_id, user_id, file_name, total_size) VALUES (?, ?, ?, ?, ?)",
+                (upload_id, case_id, user_id, file_name, total_size)
+            )
+            conn.commit()
+            return upload_id
+        except DatabaseError as e:
+            print(f"Database error: {e}")
+            conn.rollback()
+            return None
+
+def get_upload_session(upload_id):
+    """Retrieves a resumable upload by its ID."""
+    with connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT * FROM UploadSessions WHERE upload_id = ?", (upload_id,))
+        return cursor.fetchone()
+
+def update_upload_offset(upload_id, received_bytes):
+    """Records how many bytes of an upload have been durably written."""
+    with connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "UPDATE UploadSessions SET received_bytes = ?, updated_at = CURRENT_TIMESTAMP WHERE upload_id = ?",
+            (received_bytes, upload_id)
+        )
+        conn.commit()
+        return cursor.rowcount > 0
+
+def claim_upload_session(upload_id):
+    """Marks a complete upload as being turned into a document.
+
+    Returns False if it is gone or another request has claimed it already.
+    """
+    with connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "UPDATE UploadSessions SET status = 'finalizing', updated_at = CURRENT_TIMESTAMP "
+            "WHERE upload_id = ? AND status = 'open'",
+            (upload_id,)
+        )
+        conn.commit()
+        return cursor.rowcount > 0
+
+def release_upload_session(upload_id):
+    """Reopens a claimed upload whose document could not be saved, so it can be retried."""
+    with connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "UPDATE UploadSessions SET status = 'open', updated_at = CURRENT_TIMESTAMP WHERE upload_id = ?",
+            (upload_id,)
+        )
+        conn.commit()
+        return cursor.rowcount > 0
+
+def delete_upload_session(upload_id):
+    """Removes a finished or abandoned upload."""
+    with connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM UploadSessions WHERE upload_id = ?", (upload_id,))
+        conn.commit()
+        return cursor.rowcount > 0
+
+def delete_expired_upload_sessions(max_age_hours):
+    """Removes uploads untouched for max_age_hours and returns their IDs."""
+    with connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "DELETE FROM UploadSessions WHERE updated_at < ? RETURNING upload_id",
+            (utc_timestamp(-max_age_hours * 3600),)
+        )
+        expired = [row['upload_id'] for row in cursor.fetchall()]
+        conn.commit()
+        return expired
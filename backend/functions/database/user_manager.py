@@ -1,67 +1,212 @@
-import sqlite3
 import uuid
-import bcrypt
-import os
-
-DB_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'DataBase', 'database.db'))
-
-def get_db_connection():
-    """Creates a database connection."""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+from .db import DIALECT, IntegrityError, connection
+from .pagination import decode_cursor, encode_cursor
+from .. import password_hashing
 
 def create_user(email, password, full_name, role):
-    """Creates a new user in the database."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    """Creates a new user in the database.
 
+    Raises password_hashing.HashingOverloaded if the hashing pool is saturated.
+    """
     user_id = str(uuid.uuid4())
-    hashed_password = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
+    hashed_password = password_hashing.hash_password(password)
 
-    try:
-        cursor.execute(
-            "INSERT INTO Users (user_id, email, hashed_password, full_name, role) VALUES (?, ?, ?, ?, ?)",
-            (user_id, email, hashed_password, full_name, role)
-        )
-        conn.commit()
-        return user_id
-    except sqlite3.IntegrityError:
-        return None  # User with this email already exists
-    finally:
-        conn.close()
+    with connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                "INSERT INTO Users (user_id, email, hashed_password, full_name, role) VALUES (?, ?, ?, ?, ?)",
+                (user_id, email, hashed_password, full_name, role)
+            )
+            conn.commit()
+            return user_id
+        except IntegrityError:
+            conn.rollback()
+            return None  # User with this email already exists
 
 def find_user_by_email(email):
     """Finds a user by their email address."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM Users WHERE email = ?", (email,))
-    user = cursor.fetchone()
-    conn.close()
-    return user
+    with connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT * FROM Users WHERE email = ?", (email,))
+        return cursor.fetchone()
 
 def find_user_by_id(user_id):
     """Finds a user by their user ID."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT user_id, email, full_name, role, created_at FROM Users WHERE user_id = ?", (user_id,))
-    user = cursor.fetchone()
-    conn.close()
-    return user
+    with connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT user_id, email, full_name, role, created_at FROM Users WHERE user_id = ?", (user_id,))
+        return cursor.fetchone()
 
 def verify_password(stored_hash, provided_password):
-    """Verifies a password against a stored hash."""
-    return bcrypt.checkpw(provided_password.encode('utf-8'), stored_hash)
-
-def search_users_by_email(email_query):
-    """Finds users by a partial email match."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    # Using LIKE for a partial match, and limiting results
-    cursor.execute(
-        "SELECT user_id, email, full_name FROM Users WHERE email LIKE ? LIMIT 10", 
-        (f'%{email_query}%',)
-    )
-    users = cursor.fetchall()
-    conn.close()
-    return users
+    """Verifies a password against a stored hash.
+
+    Raises password_hashing.HashingOverloaded if the hashing pool is saturated.
+    """
+    return password_hashing.check_password(provided_password, stored_hash)
+
+def rehash_password_if_needed(user_id, stored_hash, password):
+    """Re-hashes a just-verified password if the bcrypt cost has changed.
+
+    Best effort: skipped when the hashing pool is busy, since the user is
+    already authenticated and the next login will try again.
+    """
+    if not password_hashing.needs_rehash(stored_hash):
+        return False
+    try:
+        new_hash = password_hashing.hash_password(password)
+    except password_hashing.HashingOverloaded:
+        return False
+
+    with connection() as conn:
+        cursor = conn.cursor()
+        # Only replace the hash we verified, in case the password changed meanwhile
+        cursor.execute(
+            "UPDATE Users SET hashed_password = ? WHERE user_id = ? AND hashed_password = ?",
+            (new_hash, user_id, stored_hash)
+        )
+        conn.commit()
+        return cursor.rowcount > 0
+
+# Upper bound for prefix range scans; sorts after any real character
+_PREFIX_END = '\U0010ffff'
+
+def search_users(query, cursor=None, limit=10):
+    """Finds users whose email or full name contains the query (at least 3 characters).
+
+    Results are ranked by match quality: email prefix matches first, then
+    full-name prefix matches, then any other substring match. Matching is
+    case-insensitive. On SQLite the first two tiers are range scans on NOCASE
+    indexes and the last uses the UserSearch trigram index; on PostgreSQL
+    they use lower() expression indexes (and pg_trgm, when installed). Each
+    tier is keyset-paged.
+    Returns (rows, next_cursor), each row carrying its `match_rank` tier.
+    """
+    query = query.strip()
+    if len(query) < 3:
+        return [], None
+
+    tier, after = 0, None
+    if cursor:
+        tier, *after = decode_cursor(cursor, size=3)
+        if tier not in (0, 1, 2):
+            raise ValueError("Invalid cursor")
+
+    rows = []
+    with connection() as conn:
+        for current in range(tier, 3):
+            wanted = limit + 1 - len(rows)
+            if wanted <= 0:
+                break
+            rows += _USER_SEARCH_TIERS[current](conn, query, after if current == tier else None, wanted)
+
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor([last['match_rank'], last['key1'], last['key2']])
+
+def _email_prefix_matches(conn, query, after, limit):
+    sql = """
+        SELECT user_id, email, full_name, 0 AS match_rank, email AS key1, user_id AS key2
+        FROM Users
+        WHERE email >= ? COLLATE NOCASE AND email < ? COLLATE NOCASE
+    """
+    params = [query, query + _PREFIX_END]
+    if after:
+        sql += " AND (email COLLATE NOCASE, user_id) > (?, ?)"
+        params.extend(after)
+    sql += " ORDER BY email COLLATE NOCASE, user_id LIMIT ?"
+    params.append(limit)
+    return conn.execute(sql, params).fetchall()
+
+def _name_prefix_matches(conn, query, after, limit):
+    sql = """
+        SELECT user_id, email, full_name, 1 AS match_rank, full_name AS key1, user_id AS key2
+        FROM Users
+        WHERE full_name >= ? COLLATE NOCASE AND full_name < ? COLLATE NOCASE
+          AND NOT (email >= ? COLLATE NOCASE AND email < ? COLLATE NOCASE)
+    """
+    params = [query, query + _PREFIX_END, query, query + _PREFIX_END]
+    if after:
+        sql += " AND (full_name COLLATE NOCASE, user_id) > (?, ?)"
+        params.extend(after)
+    sql += " ORDER BY full_name COLLATE NOCASE, user_id LIMIT ?"
+    params.append(limit)
+    return conn.execute(sql, params).fetchall()
+
+def _substring_matches(conn, query, after, limit):
+    # Walking the index in rowid order lets FTS5 stop after `limit` hits,
+    # even for substrings (like "com") that match most users.
+    sql = """
+        SELECT u.user_id, u.email, u.full_name, 2 AS match_rank, s.rowid AS key1, NULL AS key2
+        FROM UserSearch s
+        JOIN Users u ON u.user_id = s.user_id
+        WHERE UserSearch MATCH ?
+          AND NOT (u.email >= ? COLLATE NOCASE AND u.email < ? COLLATE NOCASE)
+          AND NOT (u.full_name >= ? COLLATE NOCASE AND u.full_name < ? COLLATE NOCASE)
+    """
+    phrase = '"' + query.replace('"', '""') + '"'
+    params = [f"{{email full_name}} : {phrase}", query, query + _PREFIX_END, query, query + _PREFIX_END]
+    if after:
+        sql += " AND s.rowid > ?"
+        params.append(after[0])
+    sql += " ORDER BY s.rowid LIMIT ?"
+    params.append(limit)
+    return conn.execute(sql, params).fetchall()
+
+def _pg_email_prefix_matches(conn, query, after, limit):
+    # Byte-order ("C") comparisons on lower(email) match the expression index
+    # and make _PREFIX_END a valid upper bound.
+    sql = """
+        SELECT user_id, email, full_name, 0 AS match_rank, lower(email) AS key1, user_id AS key2
+        FROM Users
+        WHERE lower(email) COLLATE "C" >= ? AND lower(email) COLLATE "C" < ?
+    """
+    params = [query.lower(), query.lower() + _PREFIX_END]
+    if after:
+        sql += """ AND (lower(email) COLLATE "C", user_id) > (?, ?)"""
+        params.extend(after)
+    sql += """ ORDER BY lower(email) COLLATE "C", user_id LIMIT ?"""
+    params.append(limit)
+    return conn.execute(sql, params).fetchall()
+
+def _pg_name_prefix_matches(conn, query, after, limit):
+    sql = """
+        SELECT user_id, email, full_name, 1 AS match_rank, lower(full_name) AS key1, user_id AS key2
+        FROM Users
+        WHERE lower(full_name) COLLATE "C" >= ? AND lower(full_name) COLLATE "C" < ?
+          AND NOT (lower(email) COLLATE "C" >= ? AND lower(email) COLLATE "C" < ?)
+    """
+    params = [query.lower(), query.lower() + _PREFIX_END] * 2
+    if after:
+        sql += """ AND (lower(full_name) COLLATE "C", user_id) > (?, ?)"""
+        params.extend(after)
+    sql += """ ORDER BY lower(full_name) COLLATE "C", user_id LIMIT ?"""
+    params.append(limit)
+    return conn.execute(sql, params).fetchall()
+
+def _pg_substring_matches(conn, query, after, limit):
+    sql = """
+        SELECT user_id, email, full_name, 2 AS match_rank, user_id AS key1, NULL AS key2
+        FROM Users
+        WHERE (lower(email) LIKE ? OR lower(full_name) LIKE ?)
+          AND NOT (lower(email) COLLATE "C" >= ? AND lower(email) COLLATE "C" < ?)
+          AND NOT (lower(full_name) COLLATE "C" >= ? AND lower(full_name) COLLATE "C" < ?)
+    """
+    pattern = '%' + _escape_like(query.lower()) + '%'
+    params = [pattern, pattern] + [query.lower(), query.lower() + _PREFIX_END] * 2
+    if after:
+        sql += " AND user_id > ?"
+        params.append(after[0])
+    sql += " ORDER BY user_id LIMIT ?"
+    params.append(limit)
+    return conn.execute(sql, params).fetchall()
+
+def _escape_like(text):
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+if DIALECT == 'postgresql':
+    _USER_SEARCH_TIERS = (_pg_email_prefix_matches, _pg_name_prefix_matches, _pg_substring_matches)
+else:
+    _USER_SEARCH_TIERS = (_email_prefix_matches, _name_prefix_matches, _substring_matches)
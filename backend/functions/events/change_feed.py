@@ -0,0 +1,275 @@
+import os
+import queue
+import sys
+import threading
+import time
+from collections import namedtuple
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from functions.database import change_events, permissions_manager
+from functions.database.db import DatabaseError
+
+# Events are read from the ChangeEvents table by one thread per worker
+# process and fanned out to that process's open streams. Events committed in
+# this process are read at once; events from other processes are picked up
+# by polling this often while any stream is open.
+EVENT_POLL_INTERVAL = float(os.environ.get('EVENT_POLL_INTERVAL', '1'))
+
+# Optional redis:// URL. Each commit is then announced over Redis pub/sub,
+# so other processes read it at once rather than on their next poll.
+EVENT_REDIS_URL = os.environ.get('EVENT_REDIS_URL')
+
+# Streams are closed after this long, freeing their server thread; browsers
+# reconnect on their own and resume with Last-Event-ID
+EVENT_STREAM_MAX_SECONDS = float(os.environ.get('EVENT_STREAM_MAX_SECONDS', '300'))
+
+# Open streams per process. Further clients are told to retry later.
+EVENT_MAX_SUBSCRIBERS = int(os.environ.get('EVENT_MAX_SUBSCRIBERS', '100'))
+
+# A client resuming further back than this many events gets a reset instead
+EVENT_REPLAY_LIMIT = int(os.environ.get('EVENT_REPLAY_LIMIT', '1000'))
+
+# Idle streams get a comment line this often, so proxies keep them open and
+# dropped clients are noticed
+KEEPALIVE_SECONDS = 15
+
+# Reconnection delays suggested to the browser, in milliseconds
+RECONNECT_MS = 3000
+BUSY_RECONNECT_MS = 30000
+
+# Events buffered per stream; a stream that falls further behind re-reads the table
+SUBSCRIBER_QUEUE_SIZE = 1000
+READ_BATCH_SIZE = 500
+REDIS_CHANNEL = 'change-events'
+
+_Event = namedtuple('_Event', ['event_id', 'case_id', 'user_id', 'message'])
+
+class _Subscriber:
+    def __init__(self, start):
+        # Every event after start is queued for this stream
+        self.start = start
+        self.queue = queue.Queue(SUBSCRIBER_QUEUE_SIZE)
+        self.overflowed = False
+
+_subscribers = set()
+_lock = threading.Lock()
+_wakeup = threading.Event()
+# Newest event ID read by this process
+_head = 0
+
+_reader_pid = None
+_start_lock = threading.Lock()
+_redis = None
+
+_stats = {"delivered": 0, "resets": 0, "overflows": 0, "rejected": 0, "reads": 0}
+_stats_lock = threading.Lock()
+
+def _count(name, amount=1):
+    with _stats_lock:
+        _stats[name] += amount
+
+def get_feed_stats():
+    """Returns change feed counters for this process, plus the number of open streams."""
+    with _stats_lock:
+        stats = dict(_stats)
+    with _lock:
+        stats["subscribers"] = len(_subscribers)
+    return stats
+
+def ensure_started():
+    """Starts this process's reader thread (and Redis listener) if not yet running."""
+    global _reader_pid
+    if _reader_pid == os.getpid():
+        return
+    with _start_lock:
+        if _reader_pid == os.getpid():
+            return
+        _reader_pid = os.getpid()
+        threading.Thread(target=_read_events, name='change-feed', daemon=True).start()
+        if EVENT_REDIS_URL:
+            threading.Thread(target=_listen_redis, name='change-feed-redis', daemon=True).start()
+
+def stream_events(user_id, is_judge, last_event_id=None):
+    """Yields a user's change events as server-sent event text.
+
+    Judges see every event; other users see events on cases they have
+    access to, plus events addressed to them. With last_event_id, missed
+    events are replayed first, or a `reset` event is sent if they are no
+    longer available and the client should reload. Ends after
+    EVENT_STREAM_MAX_SECONDS.
+    """
+    subscriber = _subscribe()
+    if subscriber is None:
+        _count("rejected")
+        yield f"retry: {BUSY_RECONNECT_MS}\n: too many open streams\n\n"
+        return
+
+    try:
+        yield f"retry: {RECONNECT_MS}\n\n"
+        position = subscriber.start
+        if last_event_id is not None:
+            position, backlog = _catch_up(last_event_id, subscriber.start)
+            yield from _filtered(backlog, user_id, is_judge)
+
+        deadline = time.monotonic() + EVENT_STREAM_MAX_SECONDS
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            if subscriber.overflowed:
+                position, backlog = _catch_up(position, _resync(subscriber))
+                yield from _filtered(backlog, user_id, is_judge)
+                continue
+            try:
+                batch = [subscriber.queue.get(timeout=min(KEEPALIVE_SECONDS, remaining))]
+            except queue.Empty:
+                yield ": keepalive\n\n"
+                continue
+            while True:
+                try:
+                    batch.append(subscriber.queue.get_nowait())
+                except queue.Empty:
+                    break
+            batch = [event for event in batch if event.event_id > position]
+            if batch:
+                position = batch[-1].event_id
+                yield from _filtered(batch, user_id, is_judge)
+    finally:
+        with _lock:
+            _subscribers.discard(subscriber)
+
+def _subscribe():
+    global _head
+    ensure_started()
+    with _lock:
+        if len(_subscribers) >= EVENT_MAX_SUBSCRIBERS:
+            return None
+        if not _subscribers:
+            # Nothing was read while no one was listening
+            _head = max(_head, change_events.get_latest_event_id())
+        subscriber = _Subscriber(_head)
+        _subscribers.add(subscriber)
+    return subscriber
+
+def _resync(subscriber):
+    """Empties an overflowed stream's queue and returns the ID it now continues after."""
+    with _lock:
+        while True:
+            try:
+                subscriber.queue.get_nowait()
+            except queue.Empty:
+                break
+        subscriber.overflowed = False
+        subscriber.start = _head
+        return _head
+
+def _catch_up(position, start):
+    """Returns (new position, events after position up to start) read back from the table.
+
+    If those events were purged or there are too many, the backlog is a
+    single reset event and the client continues from start.
+    """
+    if position > start and position > change_events.get_latest_event_id():
+        # An ID from before the table was emptied or recreated
+        return start, [_reset_event(start)]
+    if position >= start:
+        return position, []
+    rows = [row for row in change_events.get_events_after(position, EVENT_REPLAY_LIMIT + 1) if row['event_id'] <= start]
+    if len(rows) > EVENT_REPLAY_LIMIT or not rows or rows[0]['event_id'] > position + 1:
+        return start, [_reset_event(start)]
+    return start, [_to_event(row) for row in rows]
+
+def _reset_event(event_id):
+    _count("resets")
+    return _Event(event_id, None, None, f"id: {event_id}\nevent: reset\ndata: {{}}\n\n")
+
+def _to_event(row):
+    message = f"id: {row['event_id']}\nevent: {row['kind']}\ndata: {row['data']}\n\n"
+    return _Event(row['event_id'], row['case_id'], row['user_id'], message)
+
+def _filtered(events, user_id, is_judge):
+    """Yields the messages of the events this user may see."""
+    if not events:
+        return
+    levels = {}
+    if not is_judge:
+        case_ids = {event.case_id for event in events if event.case_id is not None and event.user_id != user_id}
+        if case_ids:
+            levels = permissions_manager.get_user_access_levels(case_ids, user_id)
+    visible = [
+        event.message for event in events
+        if is_judge or event.case_id is None or event.user_id == user_id or levels.get(event.case_id) is not None
+    ]
+    _count("delivered", len(visible))
+    yield from visible
+
+def _read_events():
+    """Reads new events from the table and queues them for every open stream."""
+    while True:
+        _wakeup.wait(EVENT_POLL_INTERVAL)
+        _wakeup.clear()
+        with _lock:
+            if not _subscribers:
+                continue
+            head = _head
+        try:
+            while True:
+                rows = change_events.get_events_after(head, READ_BATCH_SIZE)
+                _count("reads")
+                if rows:
+                    _fan_out([_to_event(row) for row in rows])
+                    head = rows[-1]['event_id']
+                if len(rows) < READ_BATCH_SIZE:
+                    break
+        except DatabaseError as e:
+            print(f"Database error: {e}")
+
+def _fan_out(events):
+    global _head
+    with _lock:
+        events = [event for event in events if event.event_id > _head]
+        if not events:
+            return
+        _head = events[-1].event_id
+        subscribers = list(_subscribers)
+    for subscriber in subscribers:
+        if subscriber.overflowed:
+            continue
+        for event in events:
+            try:
+                subscriber.queue.put_nowait(event)
+            except queue.Full:
+                # The stream re-reads what it missed from the table
+                subscriber.overflowed = True
+                _count("overflows")
+                break
+
+def _on_commit():
+    _wakeup.set()
+    if EVENT_REDIS_URL:
+        try:
+            _redis_client().publish(REDIS_CHANNEL, b'1')
+        except Exception as e:
+            print(f"Change feed Redis error: {e}")
+
+def _redis_client():
+    global _redis
+    if _redis is None:
+        import redis
+
+        _redis = redis.Redis.from_url(EVENT_REDIS_URL)
+    return _redis
+
+def _listen_redis():
+    """Wakes the reader whenever any process announces a commit."""
+    while True:
+        try:
+            pubsub = _redis_client().pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(REDIS_CHANNEL)
+            for _ in pubsub.listen():
+                _wakeup.set()
+        except Exception as e:
+            print(f"Change feed Redis error: {e}")
+            time.sleep(EVENT_POLL_INTERVAL)
+
+change_events.commit_listeners.append(_on_commit)
@@ -0,0 +1,87 @@
+import hashlib
+import json
+from datetime import datetime
+from functools import partial
+
+from functions.database import document_manager
+from functions.export.zipstream import ZipEntry, ZipStream
+
+MANIFEST_NAME = 'manifest.json'
+CHECKSUMS_NAME = 'SHA256SUMS'
+DOCUMENTS_DIR = 'documents'
+
+# Bump when the archive layout changes, so old ETags stop matching
+EXPORT_FORMAT = 1
+
+def build_case_archive(case, documents, blob_store):
+    """Lays out a ZIP of a case's documents, oldest first, plus a manifest.
+
+    The archive holds manifest.json (each document's path, ID, SHA-256,
+    size and upload details), a SHA256SUMS file for `sha256sum -c`, and the
+    documents under documents/. Nothing is read until the returned
+    ZipStream is streamed. Returns (ZipStream, etag); the etag changes
+    whenever any document is added, removed or renamed.
+    """
+    documents = sorted(documents, key=lambda doc: (doc['uploaded_at'], doc['doc_id']))
+    paths = archive_paths(documents)
+
+    manifest = json.dumps({
+        "format": EXPORT_FORMAT,
+        "case_id": case['case_id'],
+        "case_name": case['case_name'],
+        "document_count": len(documents),
+        "total_bytes": sum(doc['size_bytes'] for doc in documents),
+        "documents": [
+            {
+                "path": path,
+                "doc_id": doc['doc_id'],
+                "file_name": doc['file_name'],
+                "sha256": doc['content_hash'],
+                "size_bytes": doc['size_bytes'],
+                "uploaded_at": doc['uploaded_at'],
+                "uploader_id": doc['uploader_id'],
+            }
+            for doc, path in zip(documents, paths)
+        ],
+    }, indent=2).encode('utf-8')
+    checksums = ''.join(f"{doc['content_hash']}  {path}\n" for doc, path in zip(documents, paths)).encode('utf-8')
+
+    # Fixed timestamps keep the archive byte-for-byte reproducible
+    timestamps = [_parse_timestamp(doc['uploaded_at']) for doc in documents]
+    exported = max(timestamps, default=datetime(1980, 1, 1))
+    entries = [
+        ZipEntry.from_bytes(MANIFEST_NAME, manifest, exported),
+        ZipEntry.from_bytes(CHECKSUMS_NAME, checksums, exported),
+    ]
+    for doc, path, modified in zip(documents, paths, timestamps):
+        entries.append(ZipEntry(
+            path, doc['size_bytes'], modified,
+            read=partial(blob_store.read_range, doc['storage_key']),
+            crc32=doc['crc32'],
+            on_crc=partial(document_manager.set_blob_crc32, doc['content_hash']),
+        ))
+    return ZipStream(entries), hashlib.sha256(manifest).hexdigest()
+
+def archive_paths(documents):
+    """Returns a unique documents/<name> path for each document, numbering repeated names."""
+    paths = []
+    seen = set()
+    for doc in documents:
+        # Stored names are already sanitized; this only guards against older rows
+        name = doc['file_name'].replace('\\', '/').rsplit('/', 1)[-1].lstrip('.') or doc['doc_id']
+        stem, dot, extension = name.rpartition('.')
+        if not stem:
+            stem, dot, extension = name, '', ''
+        candidate, n = name, 1
+        while candidate.lower() in seen:
+            n += 1
+            candidate = f"{stem} ({n}){dot}{extension}"
+        seen.add(candidate.lower())
+        paths.append(f"{DOCUMENTS_DIR}/{candidate}")
+    return paths
+
+def _parse_timestamp(value):
+    try:
+        return datetime.fromisoformat(str(value)[:19])
+    except ValueError:
+        return datetime(1980, 1, 1)
@@ -0,0 +1,175 @@
+import struct
+import zlib
+from datetime import datetime
+
+# Same threshold as Python's zipfile: sizes and offsets above it use ZIP64 fields
+ZIP64_LIMIT = (1 << 31) - 1
+ZIP_MAX_ENTRIES = 0xFFFF
+
+_FLAGS = 0x0008 | 0x0800  # sizes and CRC in a data descriptor; UTF-8 names
+_MADE_BY = (3 << 8) | 45  # Unix, ZIP 4.5
+_FILE_ATTRIBUTES = 0o100644 << 16
+
+class ZipEntry:
+    """One stored (uncompressed) file in a ZipStream.
+
+    read(start, stop) yields the file's bytes [start, stop). crc32 may be
+    given if known; otherwise it is computed the first time the whole file
+    is streamed and passed to on_crc(crc) so the caller can keep it.
+    """
+
+    def __init__(self, name, size, modified, read, crc32=None, on_crc=None):
+        self.name = name
+        self.size = size
+        self.modified = modified
+        self.read = read
+        self.crc32 = crc32
+        self.on_crc = on_crc
+
+    @classmethod
+    def from_bytes(cls, name, data, modified):
+        return cls(name, len(data), modified, lambda start, stop: iter((data[start:stop],)), zlib.crc32(data))
+
+class ZipStream:
+    """A ZIP64 archive generated on the fly, with its length and layout known up front.
+
+    Entries are stored without compression and with data descriptors, so
+    every header, and therefore every offset, depends only on names, sizes
+    and timestamps. CRCs are needed only in the descriptors and the central
+    directory, which come after the file data. That makes any byte range
+    reproducible, so interrupted downloads can resume with Range requests,
+    and memory use does not depend on file sizes.
+    """
+
+    def __init__(self, entries):
+        self.entries = list(entries)
+        self._layout = []
+        offset = 0
+        for entry in self.entries:
+            header = _local_header(entry)
+            descriptor_length = 24 if entry.size > ZIP64_LIMIT else 16
+            self._layout.append((offset, header, descriptor_length))
+            offset += len(header) + entry.size + descriptor_length
+        self.central_directory_offset = offset
+        self.central_directory_length = sum(
+            len(_central_header(entry, 0, offset)) for entry, (offset, _, _) in zip(self.entries, self._layout)
+        )
+        self._end_records = _end_records(
+            len(self.entries), self.central_directory_offset, self.central_directory_length
+        )
+        self.length = self.central_directory_offset + self.central_directory_length + len(self._end_records)
+
+    def read_range(self, start, stop):
+        """Yields the archive's bytes [start, stop)."""
+        for entry, (offset, header, descriptor_length) in zip(self.entries, self._layout):
+            data_start = offset + len(header)
+            data_stop = data_start + entry.size
+            if data_stop + descriptor_length <= start:
+                continue
+            if offset >= stop:
+                return
+            yield from _slice(header, offset, start, stop)
+            if data_start < stop and data_stop > start:
+                yield from self._read_data(entry, max(start, data_start) - data_start, min(stop, data_stop) - data_start)
+            if data_stop < stop:
+                yield from _slice(self._descriptor(entry), data_stop, start, stop)
+
+        if self.central_directory_offset < stop:
+            central_directory = b''.join(
+                _central_header(entry, self._crc(entry), offset)
+                for entry, (offset, _, _) in zip(self.entries, self._layout)
+            )
+            yield from _slice(central_directory, self.central_directory_offset, start, stop)
+        yield from _slice(self._end_records, self.central_directory_offset + self.central_directory_length, start, stop)
+
+    def _read_data(self, entry, start, stop):
+        # The CRC comes for free when the whole file passes through
+        crc = 0 if start == 0 and entry.crc32 is None else None
+        position = start
+        for chunk in entry.read(start, stop):
+            if crc is not None:
+                crc = zlib.crc32(chunk, crc)
+            position += len(chunk)
+            yield chunk
+        if position != stop:
+            # Headers already promised this many bytes; better to fail than send a corrupt archive
+            raise IOError(f"{entry.name}: expected {stop - start} bytes, read {position - start}")
+        if crc is not None and stop == entry.size:
+            self._set_crc(entry, crc)
+
+    def _crc(self, entry):
+        if entry.crc32 is None:
+            crc = 0
+            for chunk in entry.read(0, entry.size):
+                crc = zlib.crc32(chunk, crc)
+            self._set_crc(entry, crc)
+        return entry.crc32
+
+    def _set_crc(self, entry, crc):
+        entry.crc32 = crc
+        if entry.on_crc is not None:
+            entry.on_crc(crc)
+
+    def _descriptor(self, entry):
+        if entry.size > ZIP64_LIMIT:
+            return struct.pack('<LLQQ', 0x08074b50, self._crc(entry), entry.size, entry.size)
+        return struct.pack('<LLLL', 0x08074b50, self._crc(entry), entry.size, entry.size)
+
+def _slice(data, data_offset, start, stop):
+    """Yields the part of data (which starts at data_offset in the archive) inside [start, stop)."""
+    begin = max(start - data_offset, 0)
+    end = min(stop - data_offset, len(data))
+    if begin < end:
+        yield data[begin:end]
+
+def _dos_datetime(modified):
+    modified = max(modified, datetime(1980, 1, 1))
+    time = (modified.hour << 11) | (modified.minute << 5) | (modified.second // 2)
+    date = ((modified.year - 1980) << 9) | (modified.month << 5) | modified.day
+    return time, date
+
+def _local_header(entry):
+    name = entry.name.encode('utf-8')
+    time, date = _dos_datetime(entry.modified)
+    if entry.size > ZIP64_LIMIT:
+        # Real sizes follow in the data descriptor
+        extra = struct.pack('<HHQQ', 0x0001, 16, 0, 0)
+        size, version = 0xFFFFFFFF, 45
+    else:
+        extra, size, version = b'', 0, 20
+    return struct.pack(
+        '<LHHHHHLLLHH', 0x04034b50, version, _FLAGS, 0, time, date, 0, size, size, len(name), len(extra)
+    ) + name + extra
+
+def _central_header(entry, crc, offset):
+    name = entry.name.encode('utf-8')
+    time, date = _dos_datetime(entry.modified)
+    zip64_fields = []
+    size = entry.size
+    if size > ZIP64_LIMIT:
+        zip64_fields += [size, size]
+        size = 0xFFFFFFFF
+    if offset > ZIP64_LIMIT:
+        zip64_fields.append(offset)
+        offset = 0xFFFFFFFF
+    extra = struct.pack(f'<HH{len(zip64_fields)}Q', 0x0001, 8 * len(zip64_fields), *zip64_fields) if zip64_fields else b''
+    version = 45 if zip64_fields else 20
+    return struct.pack(
+        '<LHHHHHHLLLHHHHHLL', 0x02014b50, _MADE_BY, version, _FLAGS, 0, time, date,
+        crc, size, size, len(name), len(extra), 0, 0, 0, _FILE_ATTRIBUTES, offset
+    ) + name + extra
+
+def _end_records(count, central_directory_offset, central_directory_length):
+    records = b''
+    if count >= ZIP_MAX_ENTRIES or central_directory_offset > ZIP64_LIMIT or central_directory_length > ZIP64_LIMIT:
+        zip64_end_offset = central_directory_offset + central_directory_length
+        records += struct.pack(
+            '<LQHHLLQQQQ', 0x06064b50, 44, _MADE_BY, 45, 0, 0,
+            count, count, central_directory_length, central_directory_offset
+        )
+        records += struct.pack('<LLQL', 0x07064b50, 0, zip64_end_offset, 1)
+    records += struct.pack(
+        '<LHHHHLLH', 0x06054b50, 0, 0, min(count, ZIP_MAX_ENTRIES), min(count, ZIP_MAX_ENTRIES),
+        min(central_directory_length, 0xFFFFFFFF), min(central_directory_offset, 0xFFFFFFFF), 0
+    )
+    return records
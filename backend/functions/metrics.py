@@ -0,0 +1,235 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import Response, g, has_app_context, request
+
+# Collect request metrics and serve /metrics. Off, the instruments still
+# count but no request hooks are installed.
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1').lower() in ('1', 'true', 'yes')
+
+# Add a Server-Timing header (db, bcrypt, ai and total time) to every
+# response. It reveals internal timings, so it is off by default.
+SERVER_TIMING = os.environ.get('SERVER_TIMING', '').lower() in ('1', 'true', 'yes')
+
+# Prometheus' default buckets, in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_metrics = []
+_collectors = []
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+        for value in labels.values()
+    )
+    return '{' + ','.join(f'{key}="{value}"' for key, value in zip(labels, escaped)) + '}'
+
+class _Metric:
+    kind = 'untyped'
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def _key(self, labels):
+        if set(labels) != set(self.label_names):
+            raise ValueError(f"{self.name} expects labels {self.label_names}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def samples(self):
+        """Yields (name, labels, value) for every label combination seen so far."""
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield self.name, dict(zip(self.label_names, key)), value
+
+class Counter(_Metric):
+    """A total that only goes up, e.g. requests served or bytes uploaded."""
+
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+class Gauge(_Metric):
+    """A value that can go up and down, e.g. requests in flight."""
+
+    kind = 'gauge'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+class Histogram(_Metric):
+    """Counts observations into cumulative buckets, plus their sum and count."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+                    break
+            entry[1] += value
+            entry[2] += 1
+
+    def samples(self):
+        with self._lock:
+            items = [(key, (list(counts), total, count)) for key, (counts, total, count) in self._values.items()]
+        for key, (counts, total, count) in items:
+            labels = dict(zip(self.label_names, key))
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                yield f"{self.name}_bucket", {**labels, 'le': _format_value(float(bound))}, cumulative
+            yield f"{self.name}_sum", labels, total
+            yield f"{self.name}_count", labels, count
+
+def register_stats(prefix, get_stats, documentation, counters=()):
+    """Exposes a module's stats() dict, read at scrape time.
+
+    Keys listed in counters become `<prefix>_<key>_total` counters; other
+    numeric values become `<prefix>_<key>` gauges.
+    """
+    def collect():
+        for key, value in get_stats().items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            if key in counters:
+                yield f"{prefix}_{key}_total", 'counter', value
+            else:
+                yield f"{prefix}_{key}", 'gauge', value
+    _collectors.append((collect, documentation))
+
+def render():
+    """Returns every metric in the Prometheus text exposition format."""
+    lines = []
+    for metric in _metrics:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for name, labels, value in metric.samples():
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+    for collect, documentation in _collectors:
+        try:
+            samples = list(collect())
+        except Exception as e:
+            print(f"Metrics collector error: {e}")
+            continue
+        for name, kind, value in samples:
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.append(f"{name} {_format_value(value)}")
+    return '\n'.join(lines) + '\n'
+
+def metrics_response():
+    return Response(render(), mimetype='text/plain; version=0.0.4')
+
+REQUEST_SECONDS = Histogram(
+    'http_request_duration_seconds', "Time to produce a response, by route.", labels=('method', 'route')
+)
+REQUESTS = Counter('http_requests_total', "Responses sent, by route and status.", labels=('method', 'route', 'status'))
+IN_FLIGHT = Gauge('http_requests_in_flight', "Requests currently being handled.")
+OPERATION_SECONDS = Histogram(
+    'operation_duration_seconds', "Time spent in slow dependencies (bcrypt, AI model calls, preview rendering).", labels=('operation',)
+)
+UPLOAD_BYTES = Counter('upload_bytes_total', "Document bytes received from clients.")
+DOWNLOAD_BYTES = Counter('download_bytes_total', "Document bytes sent to clients (not counting proxy or presigned downloads).")
+
+def record_timing(name, seconds):
+    """Adds time to the current request's Server-Timing entry for name."""
+    if has_app_context():
+        timings = g.setdefault('_timings', {})
+        total, count = timings.get(name, (0.0, 0))
+        timings[name] = (total + seconds, count + 1)
+
+def request_timing(name):
+    """Returns (seconds, count) recorded under name in the current request."""
+    if not has_app_context():
+        return 0.0, 0
+    return g.get('_timings', {}).get(name, (0.0, 0))
+
+@contextmanager
+def timed(operation):
+    """Times a block into operation_duration_seconds and the request's Server-Timing."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - started
+        OPERATION_SECONDS.observe(seconds, operation=operation)
+        record_timing(operation, seconds)
+
+def route_label():
+    """The matched URL rule, so IDs in paths do not create new series."""
+    return request.url_rule.rule if request.url_rule is not None else 'unmatched'
+
+def _start_request():
+    g._request_started = time.perf_counter()
+    IN_FLIGHT.inc()
+
+def _finish_request(response):
+    started = g.pop('_request_started', None)
+    if started is None:
+        return response
+    seconds = time.perf_counter() - started
+    route = route_label()
+    REQUEST_SECONDS.observe(seconds, method=request.method, route=route)
+    REQUESTS.inc(method=request.method, route=route, status=response.status_code)
+    IN_FLIGHT.dec()
+    if SERVER_TIMING:
+        entries = [
+            f'{name};dur={total * 1000:.1f};desc="{count}"'
+            for name, (total, count) in g.get('_timings', {}).items()
+        ]
+        entries.append(f'total;dur={seconds * 1000:.1f}')
+        response.headers['Server-Timing'] = ', '.join(entries)
+    return response
+
+def _abandon_request(exception=None):
+    # after_request is skipped if a response could not be built at all
+    if g.pop('_request_started', None) is not None:
+        IN_FLIGHT.dec()
+
+def init_app(app):
+    """Installs the request hooks. Call before other extensions so the
+    latency covers their after_request work too."""
+    if not METRICS_ENABLED:
+        return
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    app.teardown_request(_abandon_request)
@@ -0,0 +1,112 @@
+import multiprocessing
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import bcrypt
+
+from . import metrics
+
+# bcrypt work factor for new hashes. Raising it takes effect for existing
+# users the next time they log in (see needs_rehash).
+BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', '12'))
+
+# Hashing runs in a pool of processes per app worker so it never holds the
+# GIL of a request thread. 0 hashes inline on the request thread instead.
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', str(os.cpu_count() or 1)))
+
+# Hashes allowed to wait for a free pool process; beyond this, requests are
+# refused with HashingOverloaded rather than queueing without bound.
+PASSWORD_HASH_QUEUE_LIMIT = int(os.environ.get('PASSWORD_HASH_QUEUE_LIMIT', str(4 * PASSWORD_HASH_WORKERS)))
+
+# Suggested Retry-After (seconds) when the pool is saturated
+PASSWORD_HASH_RETRY_AFTER = int(os.environ.get('PASSWORD_HASH_RETRY_AFTER', '2'))
+
+_COST_RE = re.compile(rb'^\$2[aby]?\$(\d\d)\$')
+
+REJECTED = metrics.Counter('password_hash_rejected_total', "Hashes refused because the pool's queue was full.")
+
+class HashingOverloaded(Exception):
+    """Raised when too many password hashes are already queued."""
+
+    def __init__(self, retry_after=PASSWORD_HASH_RETRY_AFTER):
+        super().__init__("Password hashing is overloaded")
+        self.retry_after = retry_after
+
+_pool = None
+_pool_pid = None
+_slots = None
+_pool_lock = threading.Lock()
+
+def configure(workers=None, queue_limit=None, rounds=None):
+    """Changes pool size, queue limit or cost at runtime (used by the benchmark)."""
+    global PASSWORD_HASH_WORKERS, PASSWORD_HASH_QUEUE_LIMIT, BCRYPT_ROUNDS, _pool, _pool_pid
+    with _pool_lock:
+        if workers is not None:
+            PASSWORD_HASH_WORKERS = workers
+        if queue_limit is not None:
+            PASSWORD_HASH_QUEUE_LIMIT = queue_limit
+        if rounds is not None:
+            BCRYPT_ROUNDS = rounds
+        if _pool is not None and _pool_pid == os.getpid():
+            _pool.shutdown(wait=True)
+        _pool, _pool_pid = None, None
+
+def hash_password(password):
+    """Hashes a password at the configured cost. Returns the hash as ASCII text.
+
+    Raises HashingOverloaded if the pool's queue is full.
+    """
+    return _run(_hashpw, _to_bytes(password), BCRYPT_ROUNDS).decode('ascii')
+
+def check_password(password, stored_hash):
+    """Checks a password against a bcrypt hash.
+
+    Raises HashingOverloaded if the pool's queue is full.
+    """
+    return _run(_checkpw, _to_bytes(password), _to_bytes(stored_hash))
+
+def needs_rehash(stored_hash):
+    """True if a hash was made with a different cost than BCRYPT_ROUNDS."""
+    match = _COST_RE.match(_to_bytes(stored_hash))
+    return match is None or int(match.group(1)) != BCRYPT_ROUNDS
+
+def _to_bytes(value):
+    return value.encode('utf-8') if isinstance(value, str) else value
+
+def _hashpw(password, rounds):
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds))
+
+def _checkpw(password, stored_hash):
+    return bcrypt.checkpw(password, stored_hash)
+
+def _get_pool():
+    global _pool, _pool_pid, _slots
+    if _pool_pid != os.getpid():
+        with _pool_lock:
+            if _pool_pid != os.getpid():
+                # spawn rather than fork: the app process has threads running
+                _pool = ProcessPoolExecutor(
+                    max_workers=PASSWORD_HASH_WORKERS,
+                    mp_context=multiprocessing.get_context('spawn'),
+                )
+                _slots = threading.BoundedSemaphore(PASSWORD_HASH_WORKERS + PASSWORD_HASH_QUEUE_LIMIT)
+                _pool_pid = os.getpid()
+    return _pool, _slots
+
+def _run(fn, *args):
+    if PASSWORD_HASH_WORKERS <= 0:
+        with metrics.timed('bcrypt'):
+            return fn(*args)
+
+    pool, slots = _get_pool()
+    if not slots.acquire(blocking=False):
+        REJECTED.inc()
+        raise HashingOverloaded()
+    try:
+        # Includes time queued for a pool process
+        with metrics.timed('bcrypt'):
+            return pool.submit(fn, *args).result()
+    finally:
+        slots.release()
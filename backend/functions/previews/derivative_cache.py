@@ -0,0 +1,145 @@
+import os
+import threading
+import time
+import uuid
+
+# A cached file's mtime is refreshed on access at most this often, so hot
+# previews do not cause a metadata write per request
+TOUCH_INTERVAL_SECONDS = 60
+
+class DerivativeCache:
+    """Files derived from stored blobs (e.g. previews), kept on local disk.
+
+    Entries are keyed by the source's content hash plus a variant name and
+    stored under <root>/<aa>/<hash>-<variant>.<ext>, so identical uploads
+    share them. Once the total size passes max_bytes the least recently used
+    files are deleted, using mtime as the access time, until it is back
+    under low_water of the limit. Several processes can share one root.
+    """
+
+    def __init__(self, root, max_bytes, extension, low_water=0.9):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.extension = extension
+        self.low_water = low_water
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._total_bytes = None
+        self._lock = threading.Lock()
+
+    def path_for(self, content_hash, variant):
+        return os.path.join(self.root, content_hash[:2], f"{content_hash}-{variant}.{self.extension}")
+
+    def get(self, content_hash, variant):
+        """Returns the path of a cached file and marks it as recently used, or None."""
+        path = self.path_for(content_hash, variant)
+        try:
+            stat = os.stat(path)
+            now = time.time()
+            if now - stat.st_mtime > TOUCH_INTERVAL_SECONDS:
+                os.utime(path, (now, now))
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return path
+
+    def contains(self, content_hash, variant):
+        """Like get(), without counting a lookup or refreshing the entry."""
+        return os.path.exists(self.path_for(content_hash, variant))
+
+    def put(self, content_hash, variant, data):
+        """Stores a file atomically and evicts old entries if the cache is over its limit."""
+        path = self.path_for(content_hash, variant)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(temp_path, 'wb') as out:
+            out.write(data)
+        os.replace(temp_path, path)
+        with self._lock:
+            if self._total_bytes is not None:
+                self._total_bytes += len(data)
+        if self.size_bytes() > self.max_bytes:
+            self.evict()
+        return path
+
+    def discard(self, content_hash):
+        """Deletes every variant cached for a content hash."""
+        directory = os.path.join(self.root, content_hash[:2])
+        try:
+            names = os.listdir(directory)
+        except FileNotFoundError:
+            return
+        for name in names:
+            if not name.startswith(f"{content_hash}-"):
+                continue
+            path = os.path.join(directory, name)
+            try:
+                size = os.path.getsize(path)
+            except FileNotFoundError:
+                continue
+            if self._remove(path):
+                with self._lock:
+                    if self._total_bytes is not None:
+                        self._total_bytes -= size
+
+    def size_bytes(self):
+        """Total size of the cache, scanned from disk the first time and then tracked."""
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = sum(size for _, size, _ in self._scan())
+            return self._total_bytes
+
+    def evict(self):
+        """Deletes least recently used files until the cache is under its low-water mark.
+
+        Rescans the directory, so files written by other processes are counted too.
+        """
+        with self._lock:
+            entries = sorted(self._scan(), key=lambda entry: entry[2])
+            total = sum(size for _, size, _ in entries)
+            target = self.max_bytes * self.low_water
+            for path, size, _ in entries:
+                if total <= target:
+                    break
+                if self._remove(path):
+                    total -= size
+                    self.evictions += 1
+            self._total_bytes = total
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size_bytes": self.size_bytes(),
+            "max_bytes": self.max_bytes,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def _scan(self):
+        """Yields (path, size, mtime) for every cached file."""
+        if not os.path.isdir(self.root):
+            return
+        for directory in os.scandir(self.root):
+            if not directory.is_dir():
+                continue
+            for entry in os.scandir(directory.path):
+                if entry.name.endswith('.tmp'):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                yield entry.path, stat.st_size, stat.st_mtime
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+            return True
+        except FileNotFoundError:
+            return False
@@ -0,0 +1,142 @@
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from functions import metrics
+from functions.cache import LRUCache
+from functions.database import document_manager
+from functions.previews.derivative_cache import DerivativeCache
+from functions.previews.rendering import PREVIEW_EXTENSION, PREVIEW_SIZES, can_preview, render_previews
+from functions.storage import UPLOAD_FOLDER, create_blob_store
+
+# Previews are rendered on a small thread pool inside each worker process,
+# so uploads return before any image decoding runs.
+PREVIEW_WORKERS = int(os.environ.get('PREVIEW_WORKERS', '1'))
+
+# Larger files get no preview
+PREVIEW_MAX_SOURCE_BYTES = int(os.environ.get('PREVIEW_MAX_SOURCE_BYTES', 64 * 1024 * 1024))
+
+# Rendered previews live on local disk (shared by the workers on one host),
+# evicted least-recently-used beyond this many bytes
+PREVIEW_CACHE_DIR = os.environ.get('PREVIEW_CACHE_DIR') or os.path.join(UPLOAD_FOLDER, 'previews')
+PREVIEW_CACHE_MAX_BYTES = int(os.environ.get('PREVIEW_CACHE_MAX_BYTES', 1024 ** 3))
+
+# How long a file that failed to render is not retried, in seconds
+PREVIEW_FAILURE_TTL = int(os.environ.get('PREVIEW_FAILURE_TTL', 3600))
+
+_cache = DerivativeCache(PREVIEW_CACHE_DIR, PREVIEW_CACHE_MAX_BYTES, PREVIEW_EXTENSION)
+_failures = LRUCache(maxsize=4096, ttl=PREVIEW_FAILURE_TTL)
+
+_executor = None
+_executor_pid = None
+_start_lock = threading.Lock()
+_blob_store = None
+
+# Striped by content hash so a request and the background worker do not
+# render the same file twice
+_render_locks = [threading.Lock() for _ in range(32)]
+
+_stats = {"generated": 0, "failed": 0, "queue_length": 0}
+_stats_lock = threading.Lock()
+
+def _count(name, amount=1):
+    with _stats_lock:
+        _stats[name] += amount
+
+def get_preview_stats():
+    """Returns rendering counters for this process plus the derivative cache's statistics."""
+    with _stats_lock:
+        stats = dict(_stats)
+    cache_stats = _cache.stats()
+    stats.update({
+        "cache_hits": cache_stats["hits"],
+        "cache_misses": cache_stats["misses"],
+        "cache_evictions": cache_stats["evictions"],
+        "cache_bytes": cache_stats["size_bytes"],
+    })
+    return stats
+
+def ensure_started():
+    """Starts this process's render pool (again after a fork)."""
+    global _executor, _executor_pid
+    if _executor_pid == os.getpid():
+        return
+    with _start_lock:
+        if _executor_pid == os.getpid():
+            return
+        _executor = ThreadPoolExecutor(max_workers=PREVIEW_WORKERS, thread_name_prefix='previews')
+        _executor_pid = os.getpid()
+
+def schedule_document(doc_id):
+    """Queues a newly uploaded document for preview rendering."""
+    ensure_started()
+    _count("queue_length")
+    _executor.submit(_render_queued, doc_id)
+
+def get_preview(document, size):
+    """Returns the path of a document's preview at a size in PREVIEW_SIZES, or None.
+
+    document needs content_hash, file_name, size_bytes and storage_key.
+    Previews missing from the cache (evicted, or uploaded before previews
+    existed) are rendered now. None means the file has no preview.
+    """
+    if not _previewable(document):
+        return None
+    path = _cache.get(document['content_hash'], size)
+    if path is not None:
+        return path
+    if not render_document(document):
+        return None
+    return _cache.path_for(document['content_hash'], size)
+
+def render_document(document):
+    """Renders and caches every preview size of a document, unless already cached.
+
+    Returns False if the file has no preview or fails to render.
+    """
+    content_hash = document['content_hash']
+    if not _previewable(document):
+        return False
+    with _render_locks[hash(content_hash) % len(_render_locks)]:
+        if all(_cache.contains(content_hash, size) for size in PREVIEW_SIZES):
+            return True
+        if _failures.get(content_hash, None) is not None:
+            return False
+        try:
+            data = _read_blob(document)
+            with metrics.timed('preview'):
+                previews = render_previews(data, document['file_name'], PREVIEW_SIZES)
+        except Exception as e:
+            print(f"Preview error for {document['file_name']}: {e}")
+            _failures.set(content_hash, str(e))
+            _count("failed")
+            return False
+        for size, image in previews.items():
+            _cache.put(content_hash, size, image)
+        _count("generated")
+        return True
+
+def discard_previews(content_hash):
+    """Deletes a blob's cached previews, once no document references it."""
+    _cache.discard(content_hash)
+
+def _previewable(document):
+    return document['size_bytes'] <= PREVIEW_MAX_SOURCE_BYTES and can_preview(document['file_name'])
+
+def _read_blob(document):
+    global _blob_store
+    if _blob_store is None:
+        _blob_store = create_blob_store()
+    return b''.join(_blob_store.read_range(document['storage_key'], 0, document['size_bytes']))
+
+def _render_queued(doc_id):
+    try:
+        document = document_manager.get_document_by_id(doc_id)
+        if document is not None:
+            render_document(document)
+    except Exception as e:
+        print(f"Preview error for {doc_id}: {e}")
+    finally:
+        _count("queue_length", -1)
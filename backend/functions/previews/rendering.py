@@ -0,0 +1,101 @@
+import io
+import threading
+
+from functions.storage.serving import guess_mimetype
+
+# Longest edge, in pixels, of each preview size
+PREVIEW_SIZES = {'small': 160, 'medium': 480, 'large': 1200}
+
+PREVIEW_MIMETYPE = 'image/jpeg'
+PREVIEW_EXTENSION = 'jpg'
+JPEG_QUALITY = 80
+
+# Formats Pillow can decode; others (e.g. SVG) get no preview
+IMAGE_MIMETYPES = (
+    'image/bmp', 'image/gif', 'image/jpeg', 'image/png', 'image/tiff', 'image/webp', 'image/x-ms-bmp',
+)
+
+# PDFium must not be used from several threads at once
+_pdfium_lock = threading.Lock()
+
+class PreviewUnavailable(Exception):
+    """Raised when a document's type has no preview, or the library to render it is missing."""
+
+def can_preview(file_name):
+    """True if previews can be rendered for this file type with the installed libraries."""
+    mimetype = guess_mimetype(file_name)
+    if mimetype in IMAGE_MIMETYPES:
+        return _has_module('PIL')
+    if mimetype == 'application/pdf':
+        return _has_module('PIL') and _has_module('pypdfium2')
+    return False
+
+def render_previews(data, file_name, sizes):
+    """Renders JPEG previews of an image, or of a PDF's first page.
+
+    sizes maps size names to the longest edge in pixels. Smaller images are
+    not enlarged. Returns {size name: JPEG bytes}.
+    Raises PreviewUnavailable if the file type cannot be previewed.
+    """
+    if not can_preview(file_name):
+        raise PreviewUnavailable(file_name)
+    largest = max(sizes.values())
+    if guess_mimetype(file_name) == 'application/pdf':
+        image = _pdf_first_page(data, largest)
+    else:
+        image = _open_image(data, largest)
+    image = _flatten(image)
+
+    from PIL import Image
+
+    previews = {}
+    # Largest first, each one shrinking the previous in place
+    for name, edge in sorted(sizes.items(), key=lambda item: -item[1]):
+        image.thumbnail((edge, edge), Image.LANCZOS, reducing_gap=3.0)
+        out = io.BytesIO()
+        image.save(out, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+        previews[name] = out.getvalue()
+    return previews
+
+def _has_module(name):
+    try:
+        __import__(name)
+    except ImportError:
+        return False
+    return True
+
+def _open_image(data, edge):
+    from PIL import Image, ImageOps
+
+    image = Image.open(io.BytesIO(data))
+    # JPEGs can be decoded at 1/2, 1/4 or 1/8 scale, which is much faster for scans
+    image.draft('RGB', (edge, edge))
+    # Phone photos of exhibits are often stored sideways with an EXIF rotation
+    return ImageOps.exif_transpose(image)
+
+def _pdf_first_page(data, edge):
+    import pypdfium2
+
+    with _pdfium_lock:
+        pdf = pypdfium2.PdfDocument(data)
+        try:
+            if len(pdf) == 0:
+                raise PreviewUnavailable("PDF has no pages")
+            page = pdf[0]
+            width, height = page.get_size()
+            return page.render(scale=edge / max(width, height, 1)).to_pil()
+        finally:
+            pdf.close()
+
+def _flatten(image):
+    """Converts to RGB, putting any transparency on a white background."""
+    from PIL import Image
+
+    if image.mode == 'RGB':
+        return image
+    if image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info:
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
@@ -0,0 +1,290 @@
+import os
+import re
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from html import escape
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from functions.database import db
+from functions.database.db import DatabaseError, connection
+from functions.search.extraction import extract_text
+from functions.storage import create_blob_store
+
+# Documents are indexed on a small thread pool inside each worker process,
+# so uploads return before text extraction runs.
+SEARCH_INDEX_WORKERS = int(os.environ.get('SEARCH_INDEX_WORKERS', '1'))
+
+# Larger files are indexed by file name only
+SEARCH_MAX_EXTRACT_BYTES = int(os.environ.get('SEARCH_MAX_EXTRACT_BYTES', 64 * 1024 * 1024))
+
+# Extracted text is truncated to this many characters
+SEARCH_MAX_TEXT_CHARS = int(os.environ.get('SEARCH_MAX_TEXT_CHARS', 1024 * 1024))
+
+# Private-use characters mark snippet highlights until the text is HTML-escaped
+_MARK_OPEN, _MARK_CLOSE = '\ue000', '\ue001'
+
+_executor = None
+_executor_pid = None
+_start_lock = threading.Lock()
+_blob_store = None
+
+_stats = {"indexed": 0, "failed": 0, "text_reused": 0, "searches": 0, "queue_length": 0}
+_stats_lock = threading.Lock()
+
+def _count(name, amount=1):
+    with _stats_lock:
+        _stats[name] += amount
+
+def get_search_stats():
+    """Returns indexing and search counters for this process, plus the indexing backlog."""
+    with _stats_lock:
+        return dict(_stats)
+
+def ensure_started():
+    """Starts this process's indexer and queues documents not yet indexed."""
+    global _executor, _executor_pid
+    if _executor_pid == os.getpid():
+        return
+    with _start_lock:
+        if _executor_pid == os.getpid():
+            return
+        _executor = ThreadPoolExecutor(max_workers=SEARCH_INDEX_WORKERS, thread_name_prefix='search-index')
+        _executor_pid = os.getpid()
+        _executor.submit(_index_unindexed)
+
+def init_app(app):
+    """Starts the indexer lazily on the first request (after any gunicorn fork)."""
+    app.before_request(ensure_started)
+
+def schedule_document(doc_id):
+    """Queues a newly uploaded document for indexing."""
+    ensure_started()
+    _count("queue_length")
+    _executor.submit(_index_queued, doc_id)
+
+def index_document(doc_id):
+    """Extracts a document's text and adds or replaces its search index entry.
+
+    Text already extracted for another document with the same content is
+    reused. Returns False if the document no longer exists.
+    """
+    with connection() as conn:
+        doc = conn.execute(
+            """
+            SELECT d.doc_id, d.case_id, d.file_name, d.content_hash, d.size_bytes, b.storage_key
+            FROM Documents d JOIN Blobs b ON b.content_hash = d.content_hash
+            WHERE d.doc_id = ?
+            """,
+            (doc_id,)
+        ).fetchone()
+        if doc is None:
+            return False
+        existing = conn.execute(
+            """
+            SELECT s.body FROM DocumentIndex i
+            JOIN Documents d ON d.doc_id = i.doc_id
+            JOIN DocumentSearch s ON s.rowid = i.search_rowid
+            WHERE d.content_hash = ? AND i.status = 'indexed'
+            LIMIT 1
+            """,
+            (doc['content_hash'],)
+        ).fetchone()
+
+    status, error = 'indexed', None
+    if existing is not None:
+        body = existing['body']
+        _count("text_reused")
+    else:
+        try:
+            body = _extract(doc)
+        except Exception as e:
+            body, status, error = '', 'failed', str(e)
+
+    with connection() as conn:
+        try:
+            row = conn.execute(
+                """
+                INSERT INTO DocumentIndex (doc_id, case_id, status, error)
+                SELECT doc_id, case_id, ?, ? FROM Documents WHERE doc_id = ?
+                ON CONFLICT(doc_id) DO UPDATE SET
+                    status = excluded.status, error = excluded.error, indexed_at = CURRENT_TIMESTAMP
+                RETURNING search_rowid
+                """,
+                (status, error, doc_id)
+            ).fetchone()
+            if row is None:
+                # Deleted while we were extracting
+                conn.rollback()
+                return False
+            conn.execute("DELETE FROM DocumentSearch WHERE rowid = ?", (row['search_rowid'],))
+            conn.execute(
+                "INSERT INTO DocumentSearch (rowid, file_name, body) VALUES (?, ?, ?)",
+                (row['search_rowid'], doc['file_name'], body)
+            )
+            conn.commit()
+            _count(status)
+            return True
+        except DatabaseError as e:
+            print(f"Database error: {e}")
+            conn.rollback()
+            return False
+
+def search_documents(query, user_id=None, case_id=None, limit=20):
+    """Full-text search over file names and document text, best matches first.
+
+    If user_id is given, only cases the user has a grant on are searched
+    (judges pass None). Each result carries a snippet with matches wrapped
+    in <mark> tags; the rest of the snippet is HTML-escaped.
+    """
+    if db.DIALECT == 'postgresql':
+        match, statements = build_tsquery(query), _POSTGRES_SEARCH
+    else:
+        match, statements = build_match_query(query), _SQLITE_SEARCH
+    if match is None:
+        return []
+    _count("searches")
+
+    # Rank and ACL-filter first, then build snippets only for the rows kept
+    sql = statements['rank']
+    params = [match]
+    if user_id is not None:
+        sql += " AND i.case_id IN (SELECT case_id FROM CaseAccess WHERE user_id = ?)"
+        params.append(user_id)
+    if case_id is not None:
+        sql += " AND i.case_id = ?"
+        params.append(case_id)
+    sql += statements['order'] + " LIMIT ?"
+    params.append(limit)
+
+    with connection() as conn:
+        rowids = [row['rowid'] for row in conn.execute(sql, params).fetchall()]
+        if not rowids:
+            return []
+        placeholders = ', '.join('?' * len(rowids))
+        rows = conn.execute(
+            statements['snippets'].format(placeholders=placeholders), [match] + rowids
+        ).fetchall()
+
+    results = []
+    for row in rows:
+        result = dict(row)
+        result['snippet'] = (
+            escape(row['snippet']).replace(_MARK_OPEN, '<mark>').replace(_MARK_CLOSE, '</mark>')
+        )
+        results.append(result)
+    return results
+
+_SQLITE_SEARCH = {
+    'rank': """
+        SELECT s.rowid FROM DocumentSearch s
+        JOIN DocumentIndex i ON i.search_rowid = s.rowid
+        WHERE DocumentSearch MATCH ?
+    """,
+    'order': " ORDER BY bm25(DocumentSearch, 4.0, 1.0)",
+    'snippets': f"""
+        SELECT d.doc_id, d.case_id, d.file_name, d.size_bytes, d.uploaded_at, c.case_name,
+               snippet(DocumentSearch, -1, '{_MARK_OPEN}', '{_MARK_CLOSE}', '...', 12) AS snippet,
+               bm25(DocumentSearch, 4.0, 1.0) AS score
+        FROM DocumentSearch
+        JOIN DocumentIndex i ON i.search_rowid = DocumentSearch.rowid
+        JOIN Documents d ON d.doc_id = i.doc_id
+        JOIN Cases c ON c.case_id = d.case_id
+        WHERE DocumentSearch MATCH ? AND DocumentSearch.rowid IN ({{placeholders}})
+        ORDER BY score
+    """,
+}
+
+# File names carry weight A and body text weight B in the generated tsvector;
+# the ts_rank weights ({D, C, B, A}) mirror bm25's 4:1 column weighting above.
+_TS_RANK = "ts_rank(ARRAY[0.1, 0.2, 0.25, 1.0]::real[], s.document, q)"
+
+_POSTGRES_SEARCH = {
+    'rank': """
+        SELECT s.rowid FROM to_tsquery('english', ?) q, DocumentSearch s
+        JOIN DocumentIndex i ON i.search_rowid = s.rowid
+        WHERE s.document @@ q
+    """,
+    'order': f" ORDER BY {_TS_RANK} DESC, s.rowid",
+    'snippets': f"""
+        SELECT d.doc_id, d.case_id, d.file_name, d.size_bytes, d.uploaded_at, c.case_name,
+               ts_headline('english', CASE WHEN s.body <> '' THEN s.body ELSE s.file_name END, q,
+                           'StartSel={_MARK_OPEN}, StopSel={_MARK_CLOSE}, MaxWords=24, MinWords=8')
+                   AS snippet,
+               -{_TS_RANK} AS score
+        FROM to_tsquery('english', ?) q, DocumentSearch s
+        JOIN DocumentIndex i ON i.search_rowid = s.rowid
+        JOIN Documents d ON d.doc_id = i.doc_id
+        JOIN Cases c ON c.case_id = d.case_id
+        WHERE s.rowid IN ({{placeholders}})
+        ORDER BY score
+    """,
+}
+
+def build_match_query(text):
+    """Turns free text into an FTS5 query: every word must match, the last one as a prefix.
+
+    Returns None if the text has no searchable words.
+    """
+    words = re.findall(r'\w+', text or '')
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+def build_tsquery(text):
+    """PostgreSQL counterpart of build_match_query, in to_tsquery() syntax.
+
+    Returns None if the text has no searchable words.
+    """
+    words = re.findall(r'\w+', text or '')
+    if not words:
+        return None
+    terms = [f"'{word}'" for word in words]
+    terms[-1] += ':*'
+    return ' & '.join(terms)
+
+def get_index_status():
+    """Counts documents by index status, including those not yet indexed."""
+    with connection() as conn:
+        rows = conn.execute("SELECT status, COUNT(*) AS n FROM DocumentIndex GROUP BY status").fetchall()
+        pending = conn.execute(
+            "SELECT COUNT(*) AS n FROM Documents d "
+            "WHERE NOT EXISTS (SELECT 1 FROM DocumentIndex i WHERE i.doc_id = d.doc_id)"
+        ).fetchone()['n']
+    status = {row['status']: row['n'] for row in rows}
+    status['pending'] = pending
+    return status
+
+def _extract(doc):
+    global _blob_store
+    if doc['size_bytes'] > SEARCH_MAX_EXTRACT_BYTES:
+        return ''
+    if _blob_store is None:
+        _blob_store = create_blob_store()
+    data = b''.join(_blob_store.read_range(doc['storage_key'], 0, doc['size_bytes']))
+    return extract_text(data, doc['file_name'], SEARCH_MAX_TEXT_CHARS)
+
+def _index_safely(doc_id):
+    try:
+        index_document(doc_id)
+    except Exception as e:
+        print(f"Search index error for {doc_id}: {e}")
+
+def _index_queued(doc_id):
+    try:
+        _index_safely(doc_id)
+    finally:
+        _count("queue_length", -1)
+
+def _index_unindexed():
+    """Indexes documents uploaded while no indexer was running (or before the index existed)."""
+    with connection() as conn:
+        doc_ids = [row['doc_id'] for row in db.iterate(
+            conn,
+            "SELECT doc_id FROM Documents d "
+            "WHERE NOT EXISTS (SELECT 1 FROM DocumentIndex i WHERE i.doc_id = d.doc_id)"
+        )]
+    for doc_id in doc_ids:
+        _index_safely(doc_id)
@@ -0,0 +1,146 @@
+import re
+import struct
+import zlib
+
+from functions.storage.serving import guess_mimetype
+
+TEXT_MIMETYPES = ('application/json', 'application/xml', 'text/csv')
+
+# Negative TJ adjustments wider than this (thousandths of an em) are read as word breaks
+WORD_GAP = 150
+
+def extract_text(data, file_name, max_chars):
+    """Extracts searchable text from a document's bytes.
+
+    - Text files are decoded as UTF-8.
+    - PDFs use pypdf when it is installed, otherwise a small built-in parser
+      that reads text-showing operators from (Flate-compressed) content streams.
+    - Images are not OCR'd; their dimensions and embedded text metadata
+      (PNG tEXt/iTXt chunks, JPEG comments) are indexed instead.
+
+    Returns at most max_chars characters, or '' for other file types.
+    """
+    mimetype = guess_mimetype(file_name)
+    if mimetype.startswith('text/') or mimetype in TEXT_MIMETYPES:
+        text = data.decode('utf-8', errors='replace')
+    elif mimetype == 'application/pdf':
+        text = _pdf_text(data)
+    elif mimetype.startswith('image/'):
+        text = _image_metadata(data, mimetype)
+    else:
+        text = ''
+    return text[:max_chars]
+
+def _pdf_text(data):
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        return _pdf_text_fallback(data)
+
+    import io
+
+    reader = PdfReader(io.BytesIO(data))
+    return '\n'.join(page.extract_text() or '' for page in reader.pages)
+
+_STREAM_RE = re.compile(rb'<<(.*?)>>\s*stream\r?\n(.*?)\r?\nendstream', re.S)
+_STRING_RE = re.compile(rb'\((?:\\.|[^\\()])*\)|(-?\d+(?:\.\d+)?)')
+_TEXT_OP_RE = re.compile(rb'(\[(?:[^\]\\]|\\.)*\]|\((?:\\.|[^\\()])*\))\s*(Tj|TJ|\'|")|(T\*|ET)')
+_ESCAPES = {b'n': b'\n', b'r': b'\r', b't': b'\t', b'b': b'\b', b'f': b'\f'}
+
+def _pdf_text_fallback(data):
+    """Best-effort text from uncompressed or Flate-compressed PDF content streams."""
+    chunks = []
+    for match in _STREAM_RE.finditer(data):
+        header, stream = match.groups()
+        if b'/FlateDecode' in header:
+            try:
+                stream = zlib.decompress(stream)
+            except zlib.error:
+                continue
+        elif b'/Filter' in header:
+            continue  # Images and other encodings carry no text we can read
+        for op in _TEXT_OP_RE.finditer(stream):
+            operand, _, break_op = op.groups()
+            if break_op:
+                chunks.append(b'\n')
+                continue
+            for item in _STRING_RE.finditer(operand):
+                if item.group(1) is None:
+                    chunks.append(_unescape_pdf_string(item.group()[1:-1]))
+                elif float(item.group(1)) < -WORD_GAP:
+                    # A wide negative adjustment inside TJ is how PDFs set word spacing
+                    chunks.append(b' ')
+            chunks.append(b' ')
+    return b''.join(chunks).decode('latin-1')
+
+def _unescape_pdf_string(raw):
+    out = bytearray()
+    i = 0
+    while i < len(raw):
+        char = raw[i:i + 1]
+        if char != b'\\' or i + 1 == len(raw):
+            out += char
+            i += 1
+            continue
+        nxt = raw[i + 1:i + 2]
+        if nxt in _ESCAPES:
+            out += _ESCAPES[nxt]
+            i += 2
+        elif nxt.isdigit():
+            octal = re.match(rb'[0-7]{1,3}', raw[i + 1:i + 4]).group()
+            out.append(int(octal, 8) & 0xFF)
+            i += 1 + len(octal)
+        elif nxt in (b'\r', b'\n'):
+            i += 2  # Line continuation
+        else:
+            out += nxt
+            i += 2
+    return bytes(out)
+
+def _image_metadata(data, mimetype):
+    fields = [mimetype]
+    if mimetype == 'image/png':
+        fields += _png_metadata(data)
+    elif mimetype == 'image/jpeg':
+        fields += _jpeg_metadata(data)
+    return '\n'.join(fields)
+
+def _png_metadata(data):
+    fields = []
+    pos = 8
+    while pos + 8 <= len(data):
+        length, kind = struct.unpack('>I4s', data[pos:pos + 8])
+        body = data[pos + 8:pos + 8 + length]
+        if kind == b'IHDR' and len(body) >= 8:
+            width, height = struct.unpack('>II', body[:8])
+            fields.append(f"{width}x{height}")
+        elif kind == b'tEXt':
+            key, _, value = body.partition(b'\0')
+            fields.append(f"{key.decode('latin-1')}: {value.decode('latin-1')}")
+        elif kind == b'iTXt':
+            key, _, rest = body.partition(b'\0')
+            # compression flag, method, language tag, translated keyword
+            if rest[:1] == b'\0':
+                value = rest[2:].split(b'\0', 2)[-1]
+                fields.append(f"{key.decode('latin-1')}: {value.decode('utf-8', errors='replace')}")
+        elif kind == b'IEND':
+            break
+        pos += 12 + length
+    return fields
+
+def _jpeg_metadata(data):
+    fields = []
+    pos = 2
+    while pos + 4 <= len(data) and data[pos] == 0xFF:
+        marker = data[pos + 1]
+        length = struct.unpack('>H', data[pos + 2:pos + 4])[0]
+        body = data[pos + 4:pos + 2 + length]
+        if marker == 0xFE:
+            fields.append(body.decode('utf-8', errors='replace'))
+        elif marker in (0xC0, 0xC1, 0xC2) and len(body) >= 5:
+            height, width = struct.unpack('>HH', body[1:5])
+            fields.append(f"{width}x{height}")
+        elif marker == 0xDA:
+            break  # Image data follows
+        pos += 2 + length
+    return fields
@@ -0,0 +1,32 @@
+import os
+
+from .interface import KeyringCookieSessionInterface, ServerSession, ServerSideSessionInterface
+from .keyring import load_secret_keys
+from .stores import LocalRedis, RedisSessionStore, SQLiteSessionStore
+
+# 'cookie' (signed client-side sessions), 'sqlite' or 'redis'
+SESSION_STORE = os.environ.get('SESSION_STORE', 'cookie')
+
+# redis:// URL for SESSION_STORE=redis; 'local' uses an in-process stand-in
+SESSION_REDIS_URL = os.environ.get('SESSION_REDIS_URL', 'local')
+
+def init_app(app):
+    """Configures signing keys and the session backend selected by SESSION_STORE."""
+    secret_keys = load_secret_keys()
+    app.secret_key = secret_keys[0]
+    app.session_interface = create_session_interface(secret_keys)
+
+def create_session_interface(secret_keys):
+    if SESSION_STORE == 'cookie':
+        return KeyringCookieSessionInterface(secret_keys)
+    if SESSION_STORE == 'sqlite':
+        return ServerSideSessionInterface(SQLiteSessionStore(), secret_keys)
+    if SESSION_STORE == 'redis':
+        if SESSION_REDIS_URL == 'local':
+            client = LocalRedis()
+        else:
+            import redis
+
+            client = redis.Redis.from_url(SESSION_REDIS_URL)
+        return ServerSideSessionInterface(RedisSessionStore(client), secret_keys)
+    raise ValueError(f"Unknown SESSION_STORE: {SESSION_STORE}")
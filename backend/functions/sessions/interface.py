@@ -0,0 +1,106 @@
+import hashlib
+import secrets
+
+from flask.sessions import SecureCookieSession, SecureCookieSessionInterface, SessionInterface
+from flask.sessions import session_json_serializer
+from itsdangerous import BadSignature, Signer, URLSafeTimedSerializer
+
+class KeyringCookieSessionInterface(SecureCookieSessionInterface):
+    """Flask's signed-cookie sessions, verified against a list of keys.
+
+    `secret_keys` is newest first; the newest signs, all of them verify.
+    """
+
+    def __init__(self, secret_keys):
+        self.secret_keys = list(secret_keys)
+
+    def get_signing_serializer(self, app):
+        # itsdangerous takes keys oldest to newest and signs with the last
+        return URLSafeTimedSerializer(
+            list(reversed(self.secret_keys)),
+            salt=self.salt,
+            serializer=self.serializer,
+            signer_kwargs={"key_derivation": self.key_derivation, "digest_method": self.digest_method},
+        )
+
+class ServerSession(SecureCookieSession):
+    """Session whose data lives in a store; the cookie only carries its signed ID."""
+
+    def __init__(self, initial=None, session_id=None):
+        super().__init__(initial)
+        self.session_id = session_id
+        self.rotate = False
+
+    def clear(self):
+        # Clearing (login, logout) issues a new ID, so an ID seen before
+        # authentication can't be reused after it
+        super().clear()
+        self.rotate = True
+
+class ServerSideSessionInterface(SessionInterface):
+    """Stores session data server-side in a SQLite or Redis-style store."""
+
+    session_class = ServerSession
+    salt = 'server-session'
+    serializer = session_json_serializer
+
+    def __init__(self, store, secret_keys):
+        self.store = store
+        self.secret_keys = list(secret_keys)
+
+    def _signer(self):
+        return Signer(
+            list(reversed(self.secret_keys)), salt=self.salt,
+            key_derivation='hmac', digest_method=hashlib.sha256,
+        )
+
+    def open_session(self, app, request):
+        cookie = request.cookies.get(self.get_cookie_name(app))
+        if cookie:
+            try:
+                session_id = self._signer().unsign(cookie).decode('ascii')
+            except BadSignature:
+                session_id = None
+            if session_id:
+                data = self.store.load(session_id)
+                if data is not None:
+                    return self.session_class(self.serializer.loads(data), session_id=session_id)
+        return self.session_class()
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if session.accessed:
+            response.vary.add('Cookie')
+
+        if session.rotate and session.session_id:
+            self.store.delete(session.session_id)
+            session.session_id = None
+
+        if not session:
+            if session.modified:
+                response.delete_cookie(name, domain=domain, path=path)
+                response.vary.add('Cookie')
+            return
+
+        if session.session_id and not self.should_set_cookie(app, session):
+            return
+
+        if session.session_id is None:
+            session.session_id = secrets.token_urlsafe(32)
+        ttl = app.permanent_session_lifetime.total_seconds()
+        self.store.save(session.session_id, self.serializer.dumps(dict(session)), ttl)
+
+        response.set_cookie(
+            name,
+            self._signer().sign(session.session_id).decode('ascii'),
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app),
+        )
+        response.vary.add('Cookie')
@@ -0,0 +1,43 @@
+import os
+import secrets
+
+# Default location of the shared key file when SECRET_KEYS is not set
+SECRET_KEYS_FILE = os.environ.get('SECRET_KEYS_FILE') or os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..', '..', 'instance', 'secret_keys')
+)
+
+def load_secret_keys():
+    """Returns the session signing keys, newest first.
+
+    The newest key signs new cookies; every key in the list is accepted when
+    verifying, so a key can be rotated in by prepending it and retired later
+    by removing it. Keys come from SECRET_KEYS (comma-separated) or, if that
+    is unset, from SECRET_KEYS_FILE (one key per line). A missing key file is
+    created with a random key, so every worker on a host shares it.
+    """
+    keys = [key.strip() for key in os.environ.get('SECRET_KEYS', '').split(',') if key.strip()]
+    if keys:
+        return keys
+
+    if not os.path.exists(SECRET_KEYS_FILE):
+        _create_key_file(SECRET_KEYS_FILE)
+    with open(SECRET_KEYS_FILE) as f:
+        keys = [line.strip() for line in f if line.strip() and not line.startswith('#')]
+    if not keys:
+        raise RuntimeError(f"No session signing keys in {SECRET_KEYS_FILE}")
+    return keys
+
+def _create_key_file(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'w') as f:
+        f.write(secrets.token_hex(32) + '\n')
+    try:
+        # link() fails if the file exists: when several workers start at once,
+        # exactly one key wins and nobody reads a half-written file
+        os.link(temp_path, path)
+    except FileExistsError:
+        pass
+    finally:
+        os.remove(temp_path)
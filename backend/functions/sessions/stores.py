@@ -0,0 +1,88 @@
+import random
+import threading
+import time
+
+from ..database.db import connection, utc_timestamp
+
+class SQLiteSessionStore:
+    """Keeps session data in the Sessions table of the application database.
+
+    Suits one host (or several sharing the database file). Expired rows are
+    purged on roughly one save in `purge_every`.
+    """
+
+    def __init__(self, purge_every=100):
+        self.purge_every = purge_every
+
+    def load(self, session_id):
+        with connection() as conn:
+            row = conn.execute(
+                "SELECT data FROM Sessions WHERE session_id = ? AND expires_at > ?",
+                (session_id, utc_timestamp())
+            ).fetchone()
+        return row['data'] if row else None
+
+    def save(self, session_id, data, ttl_seconds):
+        with connection() as conn:
+            conn.execute(
+                """
+                INSERT INTO Sessions (session_id, data, expires_at) VALUES (?, ?, ?)
+                ON CONFLICT(session_id) DO UPDATE SET data = excluded.data, expires_at = excluded.expires_at
+                """,
+                (session_id, data, utc_timestamp(ttl_seconds))
+            )
+            if random.randrange(self.purge_every) == 0:
+                conn.execute("DELETE FROM Sessions WHERE expires_at <= ?", (utc_timestamp(),))
+            conn.commit()
+
+    def delete(self, session_id):
+        with connection() as conn:
+            conn.execute("DELETE FROM Sessions WHERE session_id = ?", (session_id,))
+            conn.commit()
+
+class RedisSessionStore:
+    """Keeps session data in Redis (or any client with get/setex/delete)."""
+
+    def __init__(self, client, prefix='session:'):
+        self.client = client
+        self.prefix = prefix
+
+    def load(self, session_id):
+        data = self.client.get(self.prefix + session_id)
+        return data.decode('utf-8') if isinstance(data, bytes) else data
+
+    def save(self, session_id, data, ttl_seconds):
+        self.client.setex(self.prefix + session_id, int(ttl_seconds), data)
+
+    def delete(self, session_id):
+        self.client.delete(self.prefix + session_id)
+
+class LocalRedis:
+    """In-process stand-in for the parts of a Redis client the session store uses.
+
+    For development and tests only: data lives in one process, so it does not
+    survive restarts or work across gunicorn workers.
+    """
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return None
+            return value
+
+    def setex(self, key, ttl_seconds, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl_seconds)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
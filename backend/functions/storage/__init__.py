@@ -0,0 +1,41 @@
+import os
+
+from .compression import STORAGE_COMPRESSION, choose_encoding, get_codec
+from .local import CHUNK_SIZE, LocalBlobStore, PartialUploadBusy, StagedBlob
+
+# Root directory for stored document bytes (and local staging for remote backends)
+UPLOAD_FOLDER = os.environ.get('UPLOAD_FOLDER') or os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..', '..', 'uploads')
+)
+
+# 'local' or 's3'
+STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'local')
+
+def create_blob_store():
+    """Builds the blob store selected by STORAGE_BACKEND.
+
+    S3 settings: S3_BUCKET, S3_PREFIX, S3_ENDPOINT_URL (for MinIO and other
+    S3-compatible services), S3_PART_SIZE, S3_MAX_CONCURRENCY and
+    S3_PRESIGN_EXPIRES (seconds; 0 streams downloads through the app instead
+    of redirecting). Credentials come from the usual boto3 sources.
+
+    Raises ValueError (or ImportError for zstd without zstandard) if
+    STORAGE_COMPRESSION is not usable.
+    """
+    if STORAGE_COMPRESSION != 'off':
+        get_codec(STORAGE_COMPRESSION)
+    if STORAGE_BACKEND == 'local':
+        return LocalBlobStore(UPLOAD_FOLDER)
+    if STORAGE_BACKEND == 's3':
+        from .s3 import S3BlobStore
+
+        return S3BlobStore(
+            bucket=os.environ['S3_BUCKET'],
+            staging_root=UPLOAD_FOLDER,
+            prefix=os.environ.get('S3_PREFIX', ''),
+            endpoint_url=os.environ.get('S3_ENDPOINT_URL') or None,
+            part_size=int(os.environ.get('S3_PART_SIZE', 8 * 1024 * 1024)),
+            max_concurrency=int(os.environ.get('S3_MAX_CONCURRENCY', 8)),
+            presign_expires=int(os.environ.get('S3_PRESIGN_EXPIRES', 300)),
+        )
+    raise ValueError(f"Unknown STORAGE_BACKEND: {STORAGE_BACKEND}")
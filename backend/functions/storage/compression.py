@@ -0,0 +1,146 @@
+import os
+import zlib
+
+from .serving import guess_mimetype
+
+# Compress uploads at rest: 'off', 'gzip' or 'zstd' (needs the zstandard package)
+STORAGE_COMPRESSION = os.environ.get('STORAGE_COMPRESSION', 'off').lower()
+
+# Codec level; unset uses each codec's default (gzip 6, zstd 3)
+STORAGE_COMPRESSION_LEVEL = os.environ.get('STORAGE_COMPRESSION_LEVEL')
+
+# Formats that are compressed already; compressing them again only costs CPU
+INCOMPRESSIBLE_MIMETYPES = {
+    'application/gzip', 'application/x-gzip', 'application/zip', 'application/x-zip-compressed',
+    'application/x-7z-compressed', 'application/x-rar-compressed', 'application/vnd.rar',
+    'application/x-bzip2', 'application/x-xz', 'application/zstd', 'application/x-compress',
+    'application/pdf', 'application/epub+zip', 'application/java-archive',
+}
+INCOMPRESSIBLE_PREFIXES = ('audio/', 'video/', 'image/', 'font/woff')
+# ...except these uncompressed image formats
+COMPRESSIBLE_IMAGES = {'image/bmp', 'image/x-ms-bmp', 'image/tiff', 'image/svg+xml', 'image/x-portable-pixmap'}
+# OOXML and OpenDocument files are ZIP containers
+INCOMPRESSIBLE_SUBTYPE_PREFIXES = ('vnd.openxmlformats-officedocument.', 'vnd.oasis.opendocument.')
+
+# A file is stored as is unless a sample of its first chunk shrinks by at
+# least this fraction (catches compressed data under a misleading name)
+MIN_SAVINGS = 0.1
+PROBE_BYTES = 64 * 1024
+
+class _GzipCodec:
+    name = 'gzip'
+    suffix = '.gz'
+
+    def __init__(self, level):
+        self.level = 6 if level is None else level
+
+    def compressor(self):
+        # wbits 31 writes a gzip header, so stored bytes can be sent as Content-Encoding: gzip
+        return zlib.compressobj(self.level, zlib.DEFLATED, 31)
+
+    def decode(self, chunks, chunk_size):
+        """Yields decompressed data from an iterable of stored chunks, at most chunk_size bytes at a time."""
+        decompressor = zlib.decompressobj(31)
+        for chunk in chunks:
+            while chunk:
+                data = decompressor.decompress(chunk, chunk_size)
+                if data:
+                    yield data
+                chunk = decompressor.unconsumed_tail
+        data = decompressor.flush()
+        if data:
+            yield data
+
+class _ZstdCodec:
+    name = 'zstd'
+    suffix = '.zst'
+
+    def __init__(self, level):
+        import zstandard
+
+        self._zstandard = zstandard
+        self.level = 3 if level is None else level
+
+    def compressor(self):
+        return self._zstandard.ZstdCompressor(level=self.level, write_checksum=True).compressobj()
+
+    def decode(self, chunks, chunk_size):
+        """Yields decompressed data from an iterable of stored chunks, at most chunk_size bytes at a time."""
+        reader = self._zstandard.ZstdDecompressor().stream_reader(_ChunkReader(chunks))
+        while True:
+            data = reader.read(chunk_size)
+            if not data:
+                break
+            yield data
+
+class _ChunkReader:
+    """Minimal file-like view of an iterable of byte chunks."""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._pending = b''
+
+    def read(self, size=-1):
+        while not self._pending:
+            self._pending = next(self._chunks, None)
+            if self._pending is None:
+                self._pending = b''
+                return b''
+        if size < 0 or size >= len(self._pending):
+            data, self._pending = self._pending, b''
+        else:
+            data, self._pending = self._pending[:size], self._pending[size:]
+        return data
+
+_CODECS = {'gzip': _GzipCodec, 'zstd': _ZstdCodec}
+_instances = {}
+
+def get_codec(name):
+    """Returns the codec for a content encoding name ('gzip' or 'zstd')."""
+    codec = _instances.get(name)
+    if codec is None:
+        if name not in _CODECS:
+            raise ValueError(f"Unknown content encoding: {name}")
+        level = int(STORAGE_COMPRESSION_LEVEL) if STORAGE_COMPRESSION_LEVEL else None
+        codec = _instances[name] = _CODECS[name](level)
+    return codec
+
+def encoding_for_key(storage_key):
+    """Returns the content encoding of a stored blob from its key, or None if stored as is."""
+    for name, codec_class in _CODECS.items():
+        if storage_key.endswith(codec_class.suffix):
+            return name
+    return None
+
+def choose_encoding(file_name):
+    """Returns the encoding to store a file with under STORAGE_COMPRESSION, or None to store it as is."""
+    if STORAGE_COMPRESSION == 'off':
+        return None
+    mimetype = guess_mimetype(file_name)
+    if mimetype in COMPRESSIBLE_IMAGES:
+        return STORAGE_COMPRESSION
+    if mimetype in INCOMPRESSIBLE_MIMETYPES or mimetype.startswith(INCOMPRESSIBLE_PREFIXES):
+        return None
+    if mimetype.partition('/')[2].startswith(INCOMPRESSIBLE_SUBTYPE_PREFIXES):
+        return None
+    return STORAGE_COMPRESSION
+
+def worth_compressing(first_chunk):
+    """Cheaply checks whether a file will shrink, from its first chunk."""
+    sample = first_chunk[:PROBE_BYTES]
+    return len(zlib.compress(sample, 1)) <= len(sample) * (1 - MIN_SAVINGS)
+
+def decode_range(chunks, encoding, start, stop, chunk_size):
+    """Yields bytes [start, stop) of the decompressed data, decompressing from the start.
+
+    Compressed streams cannot be seeked, so the bytes before start are
+    decompressed and dropped.
+    """
+    position = 0
+    for data in get_codec(encoding).decode(chunks, chunk_size):
+        end = position + len(data)
+        if end > start:
+            yield data[max(0, start - position):stop - position]
+        position = end
+        if position >= stop:
+            break
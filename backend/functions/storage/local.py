@@ -0,0 +1,199 @@
+import fcntl
+import hashlib
+import os
+import uuid
+from collections import namedtuple
+
+from .compression import decode_range, encoding_for_key, get_codec, worth_compressing
+
+CHUNK_SIZE = 1024 * 1024
+
+# An upload that has been written to a temporary file and hashed, but not yet
+# moved to its content-addressed location. content_hash and size_bytes
+# describe the original bytes; encoding (None, 'gzip' or 'zstd') and
+# stored_bytes describe what was written.
+StagedBlob = namedtuple(
+    'StagedBlob', ['content_hash', 'size_bytes', 'temp_path', 'encoding', 'stored_bytes'], defaults=(None, None)
+)
+
+class PartialUploadBusy(Exception):
+    """Raised when another request is already writing to the same resumable upload."""
+
+class LocalBlobStore:
+    """Content-addressed blob storage on the local filesystem.
+
+    Each distinct file is stored once under blobs/<aa>/<bb>/<sha256>, where
+    aa and bb are the first two byte pairs of the hash. Compressed blobs get
+    the codec's suffix (.gz or .zst) and are decompressed by read_range().
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.temp_dir = os.path.join(root, 'tmp')
+        self.partial_dir = os.path.join(self.temp_dir, 'partial')
+
+    def key_for(self, content_hash, encoding=None):
+        """Returns the storage key (path relative to root) for a content hash."""
+        suffix = get_codec(encoding).suffix if encoding else ''
+        return '/'.join(('blobs', content_hash[:2], content_hash[2:4], content_hash + suffix))
+
+    def path_for_key(self, storage_key):
+        """Returns the absolute filesystem path for a storage key."""
+        return os.path.join(self.root, *storage_key.split('/'))
+
+    def ingest(self, stream, encoding=None):
+        """Streams a file-like object to a temporary file, hashing it on the way.
+
+        With an encoding the file is compressed as it is written, unless its
+        first chunk shows it would not shrink. Returns a StagedBlob; pass it
+        to commit() or discard() afterwards.
+        """
+        os.makedirs(self.temp_dir, exist_ok=True)
+        temp_path = os.path.join(self.temp_dir, f"{uuid.uuid4()}.part")
+        digest = hashlib.sha256()
+        size = 0
+        compressor = None
+        try:
+            with open(temp_path, 'wb') as out:
+                while True:
+                    chunk = stream.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    if size == 0 and encoding:
+                        if worth_compressing(chunk):
+                            compressor = get_codec(encoding).compressor()
+                        else:
+                            encoding = None
+                    digest.update(chunk)
+                    out.write(compressor.compress(chunk) if compressor else chunk)
+                    size += len(chunk)
+                if compressor:
+                    out.write(compressor.flush())
+                stored_bytes = out.tell()
+        except BaseException:
+            self._remove(temp_path)
+            raise
+        return StagedBlob(digest.hexdigest(), size, temp_path, encoding if compressor else None, stored_bytes)
+
+    def partial_path(self, upload_id):
+        """Returns the path of the file a resumable upload is written to."""
+        return os.path.join(self.partial_dir, f"{upload_id}.part")
+
+    def write_partial(self, upload_id, offset, chunks, max_bytes):
+        """Writes chunks to a resumable upload starting at offset.
+
+        Anything past offset from an earlier interrupted request is discarded
+        first. Writing stops once max_bytes have been accepted; any further
+        data raises ValueError. Returns the new offset, which is fsynced
+        before returning so it can be recorded as durable.
+        Raises PartialUploadBusy if another request holds the upload.
+        """
+        os.makedirs(self.partial_dir, exist_ok=True)
+        path = self.partial_path(upload_id)
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        with os.fdopen(fd, 'r+b') as out:
+            try:
+                fcntl.flock(out.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                raise PartialUploadBusy(upload_id)
+            out.truncate(offset)
+            out.seek(offset)
+            written = 0
+            try:
+                for chunk in chunks:
+                    if written + len(chunk) > max_bytes:
+                        out.write(chunk[:max_bytes - written])
+                        written = max_bytes
+                        raise ValueError("Upload exceeds its declared length")
+                    out.write(chunk)
+                    written += len(chunk)
+            finally:
+                out.flush()
+                os.fsync(out.fileno())
+            return offset + written
+
+    def stage_partial(self, upload_id, encoding=None):
+        """Hashes a completed resumable upload and returns it as a StagedBlob.
+
+        hashlib state cannot be persisted between requests (or workers), so the
+        file is re-read once here with a fixed-size buffer. With an encoding
+        it is compressed into a new staged file on the way; without one the
+        staged file is a hard link to the upload, so nothing is copied. The
+        upload's own data is kept either way, so a failed commit can be
+        retried; call discard_partial() once the document is saved.
+        """
+        path = self.partial_path(upload_id)
+        if encoding:
+            with open(path, 'rb') as f:
+                return self.ingest(f, encoding)
+        digest = hashlib.sha256()
+        size = 0
+        with open(path, 'rb') as f:
+            while True:
+                chunk = f.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                size += len(chunk)
+        temp_path = os.path.join(self.temp_dir, f"{uuid.uuid4()}.part")
+        os.link(path, temp_path)
+        return StagedBlob(digest.hexdigest(), size, temp_path, None, size)
+
+    def discard_partial(self, upload_id):
+        """Deletes the data of an abandoned resumable upload."""
+        self._remove(self.partial_path(upload_id))
+
+    def commit(self, staged):
+        """Moves a staged file to its content-addressed location and returns its key."""
+        storage_key = self.key_for(staged.content_hash, staged.encoding)
+        final_path = self.path_for_key(storage_key)
+        os.makedirs(os.path.dirname(final_path), exist_ok=True)
+        # Identical content, so replacing an existing copy is harmless.
+        os.replace(staged.temp_path, final_path)
+        return storage_key
+
+    def discard(self, staged):
+        """Deletes a staged file that turned out to be a duplicate or was rejected."""
+        self._remove(staged.temp_path)
+
+    def delete(self, storage_key):
+        """Deletes a stored blob."""
+        self._remove(self.path_for_key(storage_key))
+
+    def local_path(self, storage_key):
+        """Returns the blob's filesystem path so it can be served with sendfile."""
+        return self.path_for_key(storage_key)
+
+    def size(self, storage_key):
+        """Returns the blob's stored (possibly compressed) size in bytes. Raises FileNotFoundError if missing."""
+        return os.path.getsize(self.path_for_key(storage_key))
+
+    def read_range(self, storage_key, start, stop):
+        """Yields the original bytes [start, stop) of a blob, decompressing it if needed."""
+        encoding = encoding_for_key(storage_key)
+        if encoding is None:
+            return self.read_stored_range(storage_key, start, stop)
+        stored = self.read_stored_range(storage_key, 0, self.size(storage_key))
+        return decode_range(stored, encoding, start, stop, CHUNK_SIZE)
+
+    def read_stored_range(self, storage_key, start, stop):
+        """Yields the bytes [start, stop) of a blob as stored, in fixed-size chunks."""
+        with open(self.path_for_key(storage_key), 'rb') as f:
+            f.seek(start)
+            remaining = stop - start
+            while remaining > 0:
+                chunk = f.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+
+    def presigned_url(self, storage_key, download_name):
+        """Local files are always served by the app (or the proxy), never redirected."""
+        return None
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
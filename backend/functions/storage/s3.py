@@ -0,0 +1,200 @@
+import hashlib
+import uuid
+
+from .compression import decode_range, encoding_for_key, get_codec, worth_compressing
+from .local import CHUNK_SIZE, LocalBlobStore, StagedBlob
+
+class _HashingReader:
+    """Wraps a stream and hashes everything read from it.
+
+    With an encoding it returns the data compressed (unless the first chunk
+    shows it would not shrink); the hash and size are of the original bytes.
+    Like a file, read(n) returns exactly n bytes until the end and read()
+    returns everything left: boto3 decides between a single PUT and a
+    multipart upload from the first read, and sizes parts by what it gets.
+    It deliberately has no seek(), so boto3 treats it as non-seekable and
+    reads it strictly in order while uploading parts in parallel.
+    """
+
+    def __init__(self, stream, encoding=None):
+        self._stream = stream
+        self._digest = hashlib.sha256()
+        self._compressor = None
+        self._buffer = bytearray()
+        self._eof = False
+        self.encoding = encoding
+        self.size = 0
+        self.stored_size = 0
+
+    def read(self, size=-1):
+        while not self._eof and (size is None or size < 0 or len(self._buffer) < size):
+            self._fill()
+        if size is None or size < 0:
+            size = len(self._buffer)
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        self.stored_size += len(data)
+        return data
+
+    def _fill(self):
+        chunk = self._stream.read(CHUNK_SIZE)
+        if self.size == 0 and self.encoding and self._compressor is None:
+            if chunk and worth_compressing(chunk):
+                self._compressor = get_codec(self.encoding).compressor()
+            else:
+                self.encoding = None
+        self._digest.update(chunk)
+        self.size += len(chunk)
+        if not chunk:
+            if self._compressor is not None:
+                self._buffer += self._compressor.flush()
+            self._eof = True
+        elif self._compressor is None:
+            self._buffer += chunk
+        else:
+            self._buffer += self._compressor.compress(chunk)
+
+    def hexdigest(self):
+        return self._digest.hexdigest()
+
+class S3BlobStore:
+    """Content-addressed blob storage in an S3-compatible bucket.
+
+    Keys are the same as for LocalBlobStore (blobs/<aa>/<bb>/<sha256>[.gz|.zst]) under an
+    optional prefix. Uploads stream to a temporary object with parallel
+    multipart transfer while being hashed, then get a server-side copy to
+    their final key, so the bytes never touch local disk. Resumable uploads
+    still collect their chunks in a local staging folder (S3 objects cannot
+    be appended to) and are pushed to the bucket once complete.
+
+    Works against AWS, MinIO (set endpoint_url) or moto in tests (pass a
+    client).
+    """
+
+    def __init__(self, bucket, staging_root, prefix='', client=None, endpoint_url=None,
+                 part_size=8 * 1024 * 1024, max_concurrency=8, presign_expires=None):
+        import boto3
+        from boto3.s3.transfer import TransferConfig
+
+        self.bucket = bucket
+        self.prefix = prefix
+        self.client = client or boto3.client('s3', endpoint_url=endpoint_url)
+        self.transfer_config = TransferConfig(
+            multipart_threshold=part_size,
+            multipart_chunksize=part_size,
+            max_concurrency=max_concurrency,
+        )
+        self.presign_expires = presign_expires
+        self._staging = LocalBlobStore(staging_root)
+
+    def key_for(self, content_hash, encoding=None):
+        """Returns the storage key for a content hash."""
+        return self._staging.key_for(content_hash, encoding)
+
+    def _object_key(self, storage_key):
+        return self.prefix + storage_key
+
+    def ingest(self, stream, encoding=None):
+        """Streams a file-like object to a temporary object, hashing (and optionally compressing) it on the way."""
+        temp_key = self._object_key(f"tmp/{uuid.uuid4()}")
+        reader = _HashingReader(stream, encoding)
+        self.client.upload_fileobj(reader, self.bucket, temp_key, Config=self.transfer_config)
+        return StagedBlob(reader.hexdigest(), reader.size, temp_key, reader.encoding, reader.stored_size)
+
+    def commit(self, staged):
+        """Copies a staged object to its content-addressed key and returns the key."""
+        storage_key = self.key_for(staged.content_hash, staged.encoding)
+        self.client.copy(
+            {'Bucket': self.bucket, 'Key': staged.temp_path},
+            self.bucket,
+            self._object_key(storage_key),
+            Config=self.transfer_config,
+        )
+        self.discard(staged)
+        return storage_key
+
+    def discard(self, staged):
+        """Deletes a staged temporary object."""
+        self.client.delete_object(Bucket=self.bucket, Key=staged.temp_path)
+
+    def delete(self, storage_key):
+        """Deletes a stored blob. Raises OSError if S3 refuses or cannot be reached."""
+        from botocore.exceptions import BotoCoreError, ClientError
+
+        try:
+            self.client.delete_object(Bucket=self.bucket, Key=self._object_key(storage_key))
+        except (BotoCoreError, ClientError) as e:
+            raise OSError(f"Could not delete {storage_key}: {e}") from e
+
+    def write_partial(self, upload_id, offset, chunks, max_bytes):
+        """Writes a chunk of a resumable upload to local staging."""
+        return self._staging.write_partial(upload_id, offset, chunks, max_bytes)
+
+    def stage_partial(self, upload_id, encoding=None):
+        """Pushes a completed resumable upload to the bucket, hashing it on the way.
+
+        The local data is kept until discard_partial(), so a failed commit can be retried.
+        """
+        path = self._staging.partial_path(upload_id)
+        with open(path, 'rb') as f:
+            return self.ingest(f, encoding)
+
+    def discard_partial(self, upload_id):
+        """Deletes the local data of an abandoned resumable upload."""
+        self._staging.discard_partial(upload_id)
+
+    def local_path(self, storage_key):
+        """Blobs are remote, so there is no path to sendfile from."""
+        return None
+
+    def size(self, storage_key):
+        """Returns the blob's stored (possibly compressed) size in bytes. Raises FileNotFoundError if missing."""
+        from botocore.exceptions import ClientError
+
+        try:
+            head = self.client.head_object(Bucket=self.bucket, Key=self._object_key(storage_key))
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                raise FileNotFoundError(storage_key) from e
+            raise
+        return head['ContentLength']
+
+    def read_range(self, storage_key, start, stop):
+        """Streams the original bytes [start, stop) of a blob.
+
+        Compressed blobs are fetched whole and decompressed on the fly.
+        """
+        encoding = encoding_for_key(storage_key)
+        if encoding is None:
+            return self.read_stored_range(storage_key, start, stop)
+        return decode_range(self._read_object(storage_key), encoding, start, stop, CHUNK_SIZE)
+
+    def _read_object(self, storage_key):
+        response = self.client.get_object(Bucket=self.bucket, Key=self._object_key(storage_key))
+        yield from response['Body'].iter_chunks(CHUNK_SIZE)
+
+    def read_stored_range(self, storage_key, start, stop):
+        """Streams the bytes [start, stop) of a blob as stored, with a ranged GET."""
+        if stop <= start:
+            return
+        response = self.client.get_object(
+            Bucket=self.bucket, Key=self._object_key(storage_key), Range=f"bytes={start}-{stop - 1}"
+        )
+        yield from response['Body'].iter_chunks(CHUNK_SIZE)
+
+    def presigned_url(self, storage_key, download_name):
+        """Returns a short-lived URL the client can fetch directly, or None if disabled."""
+        if not self.presign_expires:
+            return None
+        from .serving import guess_mimetype
+
+        return self.client.generate_presigned_url(
+            'get_object',
+            Params={
+                'Bucket': self.bucket,
+                'Key': self._object_key(storage_key),
+                'ResponseContentDisposition': f'attachment; filename="{download_name}"',
+                'ResponseContentType': guess_mimetype(download_name),
+            },
+            ExpiresIn=self.presign_expires,
+        )
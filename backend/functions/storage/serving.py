@@ -0,0 +1,263 @@
+import mimetypes
+import os
+import uuid
+from datetime import datetime, timezone
+
+from flask import Response, request, send_file
+from werkzeug.datastructures import ContentRange
+from werkzeug.http import is_resource_modified
+
+# More ranges than this in one request are served as the whole file instead;
+# RFC 9110 allows ignoring Range, and it stops tiny-range amplification.
+MAX_RANGES = 16
+
+def guess_mimetype(file_name):
+    """Returns the MIME type for a file name, defaulting to octet-stream."""
+    return mimetypes.guess_type(file_name)[0] or 'application/octet-stream'
+
+def _parse_byte_ranges(value):
+    """Parses a `bytes=` Range header into (start, stop) pairs.
+
+    stop is exclusive or None for open-ended ranges; suffix ranges ("-500")
+    have a negative start. Unlike Werkzeug's parser, overlapping and
+    out-of-order ranges are accepted (RFC 9110 lets the server merge them).
+    Returns None if the header is missing or malformed.
+    """
+    if not value or not value.startswith('bytes='):
+        return None
+    ranges = []
+    for item in value[len('bytes='):].split(','):
+        first, sep, last = item.strip().partition('-')
+        if not sep:
+            return None
+        try:
+            if not first:
+                suffix = int(last)
+                if suffix <= 0:
+                    return None
+                ranges.append((-suffix, None))
+            else:
+                start = int(first)
+                stop = int(last) + 1 if last else None
+                if start < 0 or (stop is not None and stop <= start):
+                    return None
+                ranges.append((start, stop))
+        except ValueError:
+            return None
+    return ranges
+
+def _resolve_ranges(ranges, length):
+    """Turns parsed ranges into sorted, merged (start, stop) byte spans."""
+    spans = []
+    for start, stop in ranges:
+        if start < 0:
+            start, stop = max(0, length + start), length
+        else:
+            stop = length if stop is None else min(stop, length)
+        if start < stop:
+            spans.append((start, stop))
+
+    spans.sort()
+    merged = []
+    for start, stop in spans:
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], stop))
+        else:
+            merged.append((start, stop))
+    return merged
+
+def _multi_range_response(read_range, spans, length, mimetype):
+    """Builds a 206 response for one or more byte spans of a blob."""
+    if len(spans) == 1:
+        start, stop = spans[0]
+        response = Response(read_range(start, stop), status=206, mimetype=mimetype, direct_passthrough=True)
+        response.content_range = ContentRange('bytes', start, stop, length)
+        response.content_length = stop - start
+        return response
+
+    boundary = uuid.uuid4().hex
+    headers = [
+        (
+            f"--{boundary}\r\nContent-Type: {mimetype}\r\n"
+            f"Content-Range: bytes {start}-{stop - 1}/{length}\r\n\r\n"
+        ).encode('ascii')
+        for start, stop in spans
+    ]
+    closing = f"--{boundary}--\r\n".encode('ascii')
+    content_length = sum(len(h) + (stop - start) + 2 for h, (start, stop) in zip(headers, spans)) + len(closing)
+
+    def generate():
+        for header, (start, stop) in zip(headers, spans):
+            yield header
+            yield from read_range(start, stop)
+            yield b'\r\n'
+        yield closing
+
+    response = Response(
+        generate(), status=206, mimetype=f'multipart/byteranges; boundary={boundary}', direct_passthrough=True
+    )
+    response.content_length = content_length
+    return response
+
+def _set_attachment_headers(response, download_name, etag, last_modified):
+    response.headers.set('Content-Disposition', 'attachment', filename=download_name)
+    response.headers['Accept-Ranges'] = 'bytes'
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+def send_derivative(path, mimetype, etag, max_age):
+    """Sends a file derived from immutable content (e.g. a preview) inline.
+
+    The etag must change whenever the bytes could, so clients may cache the
+    response for max_age seconds without revalidating. It stays private
+    because access depends on the user's case permissions.
+    """
+    response = send_file(path, mimetype=mimetype, conditional=True, etag=etag, max_age=max_age)
+    response.cache_control.private = True
+    response.cache_control.public = False
+    response.cache_control.immutable = True
+    return response
+
+def send_blob(blob_store, storage_key, download_name, etag, accel_redirect_uri=None,
+              content_encoding=None, size_bytes=None):
+    """Sends a stored blob as an attachment with validators and Range support.
+
+    - `etag` should be the content hash; it is sent as a strong validator so
+      If-None-Match / If-Modified-Since requests get a 304.
+    - For local blobs, single ranges and whole files go through Flask's
+      send_file, which uses the server's wsgi.file_wrapper (sendfile under
+      gunicorn). Remote blobs are streamed with ranged reads.
+    - Requests with several ranges get a multipart/byteranges response.
+    - If accel_redirect_uri is given, no bytes are sent; the reverse proxy is
+      told to serve the file itself via X-Accel-Redirect.
+    - For a blob stored compressed, pass its content_encoding and original
+      size_bytes. Clients that accept that encoding get the stored bytes as
+      is, with Content-Encoding and their own ETag; Range requests and
+      other clients get the original bytes, decompressed as they stream.
+      Such blobs must not be given an accel_redirect_uri.
+
+    Raises FileNotFoundError if the blob is missing.
+    """
+    mimetype = guess_mimetype(download_name)
+
+    if accel_redirect_uri:
+        response = Response(mimetype=mimetype)
+        response.headers['X-Accel-Redirect'] = accel_redirect_uri
+        return _set_attachment_headers(response, download_name, etag, None)
+
+    path = blob_store.local_path(storage_key)
+    if path is not None:
+        stat = os.stat(path)
+        length = stat.st_size
+        last_modified = datetime.fromtimestamp(int(stat.st_mtime), timezone.utc)
+    else:
+        length = blob_store.size(storage_key)
+        last_modified = None
+
+    if content_encoding is not None:
+        if 'Range' not in request.headers and request.accept_encodings.quality(content_encoding) > 0:
+            return _send_encoded(blob_store, storage_key, path, length, download_name, etag, content_encoding,
+                                 last_modified, mimetype)
+        # The stored file cannot be sent or sliced as is
+        path, length = None, size_bytes
+
+    def read_range(start, stop):
+        return blob_store.read_range(storage_key, start, stop)
+
+    if path is None:
+        response = send_stream(read_range, length, download_name, etag, mimetype, last_modified)
+        if content_encoding is not None:
+            response.vary.add('Accept-Encoding')
+        return response
+
+    ranges = _parse_byte_ranges(request.headers.get('Range'))
+    if ranges is not None and len(ranges) > MAX_RANGES:
+        ranges = None
+    if ranges is not None and len(ranges) > 1:
+        response = _send_ranges(read_range, length, last_modified, ranges, mimetype, etag)
+        if response is not None:
+            return _set_attachment_headers(response, download_name, etag, last_modified)
+        ranges = None
+
+    if ranges is None:
+        # Too many ranges, or If-Range failed: ignore the header
+        request.environ.pop('HTTP_RANGE', None)
+
+    response = send_file(
+        path,
+        mimetype=mimetype,
+        as_attachment=True,
+        download_name=download_name,
+        conditional=True,
+        etag=etag,
+        last_modified=last_modified,
+    )
+    return _set_attachment_headers(response, download_name, etag, last_modified)
+
+def send_stream(read_range, length, download_name, etag, mimetype=None, last_modified=None):
+    """Sends content that is read or generated on the fly as an attachment.
+
+    read_range(start, stop) must yield exactly those bytes, and the same
+    bytes for as long as etag stays the same, so Range and If-Range
+    requests can resume an interrupted download.
+    """
+    mimetype = mimetype or guess_mimetype(download_name)
+    ranges = _parse_byte_ranges(request.headers.get('Range'))
+    if ranges is not None and len(ranges) <= MAX_RANGES:
+        response = _send_ranges(read_range, length, last_modified, ranges, mimetype, etag)
+        if response is not None:
+            return _set_attachment_headers(response, download_name, etag, last_modified)
+
+    if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        return _set_attachment_headers(Response(status=304), download_name, etag, last_modified)
+    response = Response(read_range(0, length), mimetype=mimetype, direct_passthrough=True)
+    response.content_length = length
+    return _set_attachment_headers(response, download_name, etag, last_modified)
+
+def _send_encoded(blob_store, storage_key, path, stored_length, download_name, etag, encoding, last_modified, mimetype):
+    """Sends a compressed blob's stored bytes with Content-Encoding, so the client decompresses them."""
+    # A different representation of the same content needs its own ETag
+    etag = f"{etag}-{encoding}"
+    if path is not None:
+        response = send_file(
+            path,
+            mimetype=mimetype,
+            as_attachment=True,
+            download_name=download_name,
+            conditional=True,
+            etag=etag,
+            last_modified=last_modified,
+        )
+    elif not is_resource_modified(request.environ, etag=etag):
+        response = Response(status=304)
+    else:
+        response = Response(
+            blob_store.read_stored_range(storage_key, 0, stored_length), mimetype=mimetype, direct_passthrough=True
+        )
+        response.content_length = stored_length
+    if response.status_code != 304:
+        response.content_encoding = encoding
+    response.vary.add('Accept-Encoding')
+    return _set_attachment_headers(response, download_name, etag, last_modified)
+
+def _send_ranges(read_range, length, last_modified, ranges, mimetype, etag):
+    """Returns a 304, 206 or 416 response, or None to fall back to the whole blob."""
+    if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        return Response(status=304)
+
+    if_range = request.if_range
+    if if_range.etag is not None and if_range.etag != etag:
+        return None
+    if if_range.date is not None and (last_modified is None or last_modified > if_range.date):
+        return None
+
+    spans = _resolve_ranges(ranges, length)
+    if not spans:
+        response = Response(status=416)
+        response.headers['Content-Range'] = f"bytes */{length}"
+        return response
+    return _multi_range_response(read_range, spans, length, mimetype)
@@ -0,0 +1,96 @@
+"""Shared fixtures for the backend tests.
+
+The app's modules read their settings from the environment when first
+imported, so the scratch database and upload folder are configured here,
+before any of them is. The suite runs on a temporary SQLite file; with
+DATABASE_URL pointing at PostgreSQL it runs there instead, and
+test_postgres.py does that automatically when TEST_DATABASE_URL is set.
+"""
+import io
+import os
+import sys
+import tempfile
+import uuid
+
+import pytest
+
+_data_dir = tempfile.mkdtemp(prefix='backend-tests-')
+if not os.environ.get('DATABASE_URL', '').startswith(('postgresql://', 'postgres://')):
+    os.environ.pop('DATABASE_URL', None)
+    os.environ['DATABASE_PATH'] = os.path.join(_data_dir, 'test.db')
+os.environ['UPLOAD_FOLDER'] = os.path.join(_data_dir, 'uploads')
+os.environ.update({
+    'PASSWORD_HASH_WORKERS': '0', 'BCRYPT_ROUNDS': '4', 'SECRET_KEYS': 'test-signing-key',
+    'AI_MODEL_CLIENT': 'fake', 'EVENT_STREAM_MAX_SECONDS': '0', 'STORAGE_BACKEND': 'local', 'SESSION_STORE': 'sqlite',
+})
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+for path in (os.path.join(BACKEND_DIR, 'app'), os.path.join(BACKEND_DIR, 'DataBase'), BACKEND_DIR):
+    sys.path.insert(0, path)
+
+import database_init
+from functions.database import cases_manager, document_manager, user_manager
+from functions.storage import LocalBlobStore, UPLOAD_FOLDER
+
+database_init.create_tables()
+
+def unique(prefix):
+    """A short name no other test uses, so tests can share one database."""
+    return f"{prefix}-{uuid.uuid4().hex[:12]}"
+
+@pytest.fixture(scope='session')
+def app():
+    import app as app_module
+
+    return app_module.app
+
+@pytest.fixture
+def make_user():
+    """Creates a user; returns (user_id, email)."""
+    def make(role='advocate', full_name=None, email=None):
+        email = email or f"{unique('user')}@tests.example"
+        user_id = user_manager.create_user(email, 'correct horse', full_name or email, role)
+        assert user_id
+        return user_id, email
+    return make
+
+@pytest.fixture
+def make_case(make_user):
+    """Creates a case owned by a new (or the given) advocate; returns (case_id, owner_id)."""
+    def make(owner_id=None, case_name=None):
+        owner_id = owner_id or make_user()[0]
+        case_id = cases_manager.create_case(case_name or unique('case'), owner_id)
+        assert case_id
+        return case_id, owner_id
+    return make
+
+@pytest.fixture
+def blob_store():
+    return LocalBlobStore(UPLOAD_FOLDER)
+
+@pytest.fixture
+def make_document(blob_store):
+    """Stores bytes and adds them to a case as a document; returns its doc_id."""
+    def make(case_id, uploader_id, data, file_name='exhibit.txt'):
+        staged = blob_store.ingest(io.BytesIO(data))
+        doc_id, is_duplicate = document_manager.add_document(
+            case_id, uploader_id, file_name, staged.content_hash, staged.size_bytes,
+            blob_store.key_for(staged.content_hash), store_blob=lambda: blob_store.commit(staged),
+        )
+        assert doc_id
+        if is_duplicate:
+            blob_store.discard(staged)
+        return doc_id
+    return make
+
+@pytest.fixture
+def login(app):
+    """Returns a logged-in test client for a new user of the given role, and the user's ID."""
+    def log_in(role='advocate'):
+        client = app.test_client()
+        email = f"{unique('client')}@tests.example"
+        client.post('/api/register', json={"email": email, "password": 'correct horse', "full_name": email, "role": role})
+        response = client.post('/api/login', json={"email": email, "password": 'correct horse'})
+        assert response.status_code == 200, response.data
+        return client, response.json['user']['user_id']
+    return log_in
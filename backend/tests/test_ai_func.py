@@ -0,0 +1,7 @@
+import pytest
+
+from functions.ai import ai_func
+
+def test_gemini_client_requires_an_api_key():
+    with pytest.raises(ai_func.ModelNotConfigured, match='GEMINI_API_KEY'):
+        ai_func.GeminiModelClient(api_key=None)
@@ -0,0 +1,86 @@
+from contextlib import contextmanager
+
+import pytest
+
+from functions.audit import audit_log
+from functions.database import db
+from functions.database.db import DatabaseError, connection
+
+@contextmanager
+def append_only_triggers_disabled(conn):
+    """Lets a test tamper with AuditLog the way someone with direct database access could."""
+    if db.DIALECT == 'postgresql':
+        conn.execute("ALTER TABLE AuditLog DISABLE TRIGGER USER")
+        try:
+            yield
+        finally:
+            conn.execute("ALTER TABLE AuditLog ENABLE TRIGGER USER")
+            conn.commit()
+        return
+    triggers = conn.execute("SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'AuditLog'").fetchall()
+    for trigger in triggers:
+        conn.execute(f"DROP TRIGGER {trigger['name']}")
+    try:
+        yield
+    finally:
+        for trigger in triggers:
+            conn.execute(trigger['sql'])
+        conn.commit()
+
+def recent_entries(count):
+    for i in range(count):
+        audit_log.record('test_event', details={"n": i})
+    audit_log.flush()
+    with connection() as conn:
+        rows = conn.execute(
+            f"SELECT audit_id, {', '.join(audit_log.HASHED_COLUMNS)}, prev_hash, entry_hash "
+            "FROM AuditLog WHERE action = 'test_event' ORDER BY audit_id DESC LIMIT ?",
+            (count,)
+        ).fetchall()
+    return [dict(row) for row in reversed(rows)]
+
+def test_chain_verifies_after_a_flush():
+    audit_log.record('test_event', case_id='case-1', details={"file_name": 'a.txt'})
+    assert audit_log.flush() >= 1
+    checked, broken = audit_log.verify_chain(batch_size=2)
+    assert checked >= 1 and broken is None
+
+def test_append_only_triggers_reject_changes():
+    entry = recent_entries(1)[0]
+    for statement in ("UPDATE AuditLog SET details = '{}' WHERE audit_id = ?", "DELETE FROM AuditLog WHERE audit_id = ?"):
+        with connection() as conn:
+            with pytest.raises(DatabaseError):
+                conn.execute(statement, (entry['audit_id'],))
+            conn.rollback()
+    assert audit_log.verify_chain()[1] is None
+
+def test_tampered_entry_is_reported():
+    target = recent_entries(3)[1]
+    with connection() as conn, append_only_triggers_disabled(conn):
+        conn.execute("UPDATE AuditLog SET details = ? WHERE audit_id = ?", ('{"n": 99}', target['audit_id']))
+        conn.commit()
+    try:
+        assert audit_log.verify_chain()[1] == target['audit_id']
+    finally:
+        with connection() as conn, append_only_triggers_disabled(conn):
+            conn.execute("UPDATE AuditLog SET details = ? WHERE audit_id = ?", (target['details'], target['audit_id']))
+            conn.commit()
+    assert audit_log.verify_chain()[1] is None
+
+def test_deleted_entry_is_reported():
+    _, target, after = recent_entries(3)
+    with connection() as conn, append_only_triggers_disabled(conn):
+        conn.execute("DELETE FROM AuditLog WHERE audit_id = ?", (target['audit_id'],))
+        conn.commit()
+    try:
+        # The next entry no longer follows the one before it
+        assert audit_log.verify_chain()[1] == after['audit_id']
+    finally:
+        columns = list(target)
+        with connection() as conn, append_only_triggers_disabled(conn):
+            conn.execute(
+                f"INSERT INTO AuditLog ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                [target[column] for column in columns]
+            )
+            conn.commit()
+    assert audit_log.verify_chain()[1] is None
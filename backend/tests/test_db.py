@@ -0,0 +1,71 @@
+import re
+import uuid
+
+import pytest
+
+from functions.database.db import DatabaseError, connection, iterate, savepoint, utc_timestamp
+
+TIMESTAMP = re.compile(r'^\d{4}-\d\d-\d\d \d\d:\d\d:\d\d$')
+
+def test_translate_placeholders():
+    postgres = pytest.importorskip('functions.database.postgres')
+
+    assert postgres.translate_placeholders("SELECT * FROM Users WHERE email = ? AND role = ?") == \
+        "SELECT * FROM Users WHERE email = %s AND role = %s"
+    # Literal % is escaped everywhere; ? inside quotes is left alone
+    assert postgres.translate_placeholders("SELECT '?', \"a?\" FROM t WHERE x LIKE '%a' AND y = ?") == \
+        "SELECT '?', \"a?\" FROM t WHERE x LIKE '%%a' AND y = %s"
+    assert postgres.translate_placeholders("SELECT 5 % 2") == "SELECT 5 %% 2"
+
+def test_timestamps_read_back_as_stored_text(make_user):
+    user_id, _ = make_user()
+    with connection() as conn:
+        created_at = conn.execute("SELECT created_at FROM Users WHERE user_id = ?", (user_id,)).fetchone()['created_at']
+        # A value written as text compares equal after the round trip
+        later = utc_timestamp(3600)
+        conn.execute("UPDATE Users SET created_at = ? WHERE user_id = ?", (later, user_id))
+        conn.commit()
+        stored = conn.execute("SELECT created_at FROM Users WHERE user_id = ?", (user_id,)).fetchone()['created_at']
+        found = conn.execute(
+            "SELECT COUNT(*) AS n FROM Users WHERE user_id = ? AND created_at = ?", (user_id, later)
+        ).fetchone()['n']
+
+    assert isinstance(created_at, str) and TIMESTAMP.match(created_at)
+    assert utc_timestamp(-60) <= created_at <= utc_timestamp(60)
+    assert stored == later
+    assert found == 1
+
+def test_iterate_streams_all_rows(make_user):
+    user_ids = {make_user()[0] for _ in range(7)}
+    placeholders = ', '.join('?' * len(user_ids))
+    with connection() as conn:
+        rows = list(iterate(
+            conn, f"SELECT user_id FROM Users WHERE user_id IN ({placeholders}) ORDER BY user_id",
+            sorted(user_ids), batch_size=3
+        ))
+    assert [row['user_id'] for row in rows] == sorted(user_ids)
+
+def test_savepoint_rolls_back_only_its_block(make_case):
+    case_id, _ = make_case()
+    with connection() as conn:
+        conn.execute("UPDATE Cases SET status = ? WHERE case_id = ?", ('In Progress', case_id))
+        with pytest.raises(DatabaseError):
+            with savepoint(conn, 'failing'):
+                conn.execute("UPDATE Cases SET status = ? WHERE case_id = ?", ('Closed', case_id))
+                # Duplicate primary key
+                conn.execute(
+                    "INSERT INTO Cases (case_id, case_name, creator_id) SELECT case_id, case_name, creator_id "
+                    "FROM Cases WHERE case_id = ?", (case_id,)
+                )
+        with savepoint(conn, 'succeeding'):
+            conn.execute("UPDATE Cases SET case_name = ? WHERE case_id = ?", ('Renamed', case_id))
+        conn.commit()
+        row = conn.execute("SELECT status, case_name FROM Cases WHERE case_id = ?", (case_id,)).fetchone()
+    assert (row['status'], row['case_name']) == ('In Progress', 'Renamed')
+
+def test_connection_is_released_on_error():
+    with pytest.raises(DatabaseError):
+        with connection() as conn:
+            conn.execute(f"SELECT * FROM missing_table_{uuid.uuid4().hex}")
+    with connection() as conn:
+        assert conn.execute("SELECT 1 AS one").fetchone()['one'] == 1
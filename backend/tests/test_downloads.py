@@ -0,0 +1,59 @@
+import os
+import re
+
+def upload(login, make_document, data, file_name='exhibit.bin'):
+    client, user_id = login()
+    case_id = client.post('/api/cases', json={"case_name": 'Download test'}).json['case_id']
+    return client, make_document(case_id, user_id, data, file_name)
+
+def test_single_range(login, make_document):
+    data = os.urandom(10000)
+    client, doc_id = upload(login, make_document, data)
+    url = f'/api/document/{doc_id}/download'
+
+    whole = client.get(url)
+    assert whole.status_code == 200 and whole.data == data
+    assert whole.headers['Accept-Ranges'] == 'bytes'
+
+    response = client.get(url, headers={'Range': 'bytes=100-199'})
+    assert response.status_code == 206
+    assert response.data == data[100:200]
+    assert response.headers['Content-Range'] == f'bytes 100-199/{len(data)}'
+
+    response = client.get(url, headers={'Range': 'bytes=-50'})
+    assert response.status_code == 206 and response.data == data[-50:]
+
+def test_multiple_ranges_are_sent_as_multipart(login, make_document):
+    data = os.urandom(10000)
+    client, doc_id = upload(login, make_document, data)
+
+    response = client.get(f'/api/document/{doc_id}/download', headers={'Range': 'bytes=0-9,5000-5009,-10'})
+    assert response.status_code == 206
+    boundary = re.search(r'boundary=(\w+)', response.headers['Content-Type']).group(1)
+    assert int(response.headers['Content-Length']) == len(response.data)
+
+    parts = response.data.split(f'--{boundary}'.encode())[1:-1]
+    bodies = {}
+    for part in parts:
+        head, body = part.split(b'\r\n\r\n', 1)
+        first, last, _ = re.search(rb'Content-Range: bytes (\d+)-(\d+)/(\d+)', head).groups()
+        bodies[(int(first), int(last))] = body[:-2]
+    assert bodies == {(0, 9): data[:10], (5000, 5009): data[5000:5010], (9990, 9999): data[-10:]}
+
+def test_if_none_match_returns_304(login, make_document):
+    client, doc_id = upload(login, make_document, b'unchanged exhibit')
+    url = f'/api/document/{doc_id}/download'
+    etag = client.get(url).headers['ETag']
+
+    response = client.get(url, headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.data == b''
+    assert client.get(url, headers={'If-None-Match': '"something-else"'}).status_code == 200
+
+def test_unsatisfiable_range_returns_416(login, make_document):
+    data = b'short file'
+    client, doc_id = upload(login, make_document, data)
+
+    response = client.get(f'/api/document/{doc_id}/download', headers={'Range': 'bytes=100-200'})
+    assert response.status_code == 416
+    assert response.headers['Content-Range'] == f'bytes */{len(data)}'
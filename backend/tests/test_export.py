@@ -0,0 +1,49 @@
+import hashlib
+import io
+import json
+import os
+import zipfile
+
+def test_export_zip_matches_its_manifest_and_resumes(login, make_document):
+    client, user_id = login()
+    case_id = client.post('/api/cases', json={"case_name": 'Export test'}).json['case_id']
+    files = {
+        make_document(case_id, user_id, b'first statement', 'statement.txt'): b'first statement',
+        make_document(case_id, user_id, b'second statement', 'statement.txt'): b'second statement',
+        make_document(case_id, user_id, os.urandom(200000), 'scan.bin'): None,
+    }
+
+    response = client.get(f'/api/case/{case_id}/export.zip')
+    assert response.status_code == 200
+    assert response.headers['Content-Type'] == 'application/zip'
+    archive = response.data
+    assert int(response.headers['Content-Length']) == len(archive)
+
+    with zipfile.ZipFile(io.BytesIO(archive)) as zf:
+        assert zf.testzip() is None
+        manifest = json.loads(zf.read('manifest.json'))
+        assert manifest['case_id'] == case_id
+        assert manifest['document_count'] == len(files)
+        assert {doc['doc_id'] for doc in manifest['documents']} == set(files)
+        # Repeated names are numbered, not overwritten
+        assert sorted(doc['path'] for doc in manifest['documents']) == [
+            'documents/scan.bin', 'documents/statement (2).txt', 'documents/statement.txt',
+        ]
+        for doc in manifest['documents']:
+            data = zf.read(doc['path'])
+            assert hashlib.sha256(data).hexdigest() == doc['sha256']
+            assert len(data) == doc['size_bytes']
+            if files[doc['doc_id']] is not None:
+                assert data == files[doc['doc_id']]
+        assert zf.read('SHA256SUMS').decode().splitlines() == [
+            f"{doc['sha256']}  {doc['path']}" for doc in manifest['documents']
+        ]
+
+    # A resumed download continues the same bytes, now that CRCs are stored
+    offset = len(archive) // 2
+    resumed = client.get(f'/api/case/{case_id}/export.zip', headers={
+        'Range': f'bytes={offset}-', 'If-Range': response.headers['ETag'],
+    })
+    assert resumed.status_code == 206
+    assert resumed.headers['Content-Range'] == f'bytes {offset}-{len(archive) - 1}/{len(archive)}'
+    assert resumed.data == archive[offset:]
@@ -0,0 +1,219 @@
+import threading
+import uuid
+
+from functions.database import cases_manager, document_manager, permissions_manager, user_manager
+from functions.database.db import DatabaseError, connection
+
+def test_create_user_rejects_duplicate_email(make_user):
+    user_id, email = make_user(full_name='Asha Rao')
+    assert user_manager.create_user(email, 'another password', 'Someone Else', 'advocate') is None
+
+    user = user_manager.find_user_by_email(email)
+    assert user['user_id'] == user_id
+    assert user_manager.verify_password(user['hashed_password'], 'correct horse')
+    assert not user_manager.verify_password(user['hashed_password'], 'wrong')
+    assert user_manager.find_user_by_id(user_id)['full_name'] == 'Asha Rao'
+
+def test_search_users_ranks_and_pages_tiers(make_user):
+    tag = uuid.uuid4().hex[:8]
+    by_email = {make_user(email=f"{tag}{i}@tests.example", full_name=f"Email Match {i}")[0] for i in range(2)}
+    by_name = make_user(full_name=f"{tag.upper()} Name Match", email=f"n-{uuid.uuid4().hex[:8]}@tests.example")[0]
+    by_substring = make_user(full_name=f"Substring {tag} Match", email=f"s-{uuid.uuid4().hex[:8]}@tests.example")[0]
+
+    rows, cursor = user_manager.search_users(tag, limit=10)
+    assert [row['user_id'] for row in rows[:2]] and {row['user_id'] for row in rows[:2]} == by_email
+    assert [row['user_id'] for row in rows[2:]] == [by_name, by_substring]
+    assert [row['match_rank'] for row in rows] == [0, 0, 1, 2]
+    assert cursor is None
+
+    # One row per page walks through every tier in the same order
+    paged, cursor = [], None
+    while True:
+        page, cursor = user_manager.search_users(tag, cursor=cursor, limit=1)
+        paged += [row['user_id'] for row in page]
+        if cursor is None:
+            break
+    assert paged == [row['user_id'] for row in rows]
+
+    assert user_manager.search_users(tag[:2]) == ([], None)
+
+def test_search_users_escapes_like_wildcards(make_user):
+    tag = uuid.uuid4().hex[:8]
+    user_id, _ = make_user(full_name=f"x {tag}%_ y")
+    make_user(full_name=f"x {tag}ab y")
+    rows, _ = user_manager.search_users(f"{tag}%_")
+    assert [row['user_id'] for row in rows] == [user_id]
+
+def test_create_case_grants_creator_sudo(make_case):
+    case_id, owner_id = make_case(case_name='State v. Tests')
+    case = cases_manager.get_case_by_id(case_id)
+    assert case['case_name'] == 'State v. Tests'
+    assert case['creator_id'] == owner_id
+    assert permissions_manager.get_user_access_level(case_id, owner_id) == 'sudo'
+
+def test_create_case_writes_nothing_if_the_grant_fails(make_user, monkeypatch):
+    owner_id = make_user()[0]
+    case_name = f"Never created {uuid.uuid4()}"
+
+    def failing_write_grants(conn, grants):
+        raise DatabaseError[0]("grant failed")
+    monkeypatch.setattr(permissions_manager, 'write_grants', failing_write_grants)
+
+    assert cases_manager.create_case(case_name, owner_id) is None
+    with connection() as conn:
+        assert conn.execute("SELECT 1 FROM Cases WHERE case_name = ?", (case_name,)).fetchone() is None
+
+def test_list_cases_pages_newest_first(make_case, make_user):
+    owner_id = make_user()[0]
+    case_ids = [make_case(owner_id)[0] for _ in range(5)]
+    with connection() as conn:
+        # Distinct creation times, oldest first
+        for i, case_id in enumerate(case_ids):
+            conn.execute("UPDATE Cases SET created_at = ? WHERE case_id = ?", (f"2024-01-0{i + 1} 12:00:00", case_id))
+        conn.commit()
+
+    seen, cursor = [], None
+    while True:
+        rows, cursor = cases_manager.list_cases(user_id=owner_id, cursor=cursor, limit=2, viewer_id=owner_id)
+        seen += rows
+        if cursor is None:
+            break
+    assert [row['case_id'] for row in seen] == case_ids[::-1]
+    assert {row['access_level'] for row in seen} == {'sudo'}
+    assert {row['document_count'] for row in seen} == {0}
+
+    rows, _ = cases_manager.list_cases(
+        creator_id=owner_id, created_from='2024-01-02 00:00:00', created_to='2024-01-04 23:59:59'
+    )
+    assert [row['case_id'] for row in rows] == case_ids[3:0:-1]
+
+def test_update_case_status(make_case):
+    case_ids = [make_case()[0] for _ in range(3)]
+    assert cases_manager.update_case_status(case_ids[0], 'In Progress')
+    assert not cases_manager.update_case_status(str(uuid.uuid4()), 'Closed')
+    missing = str(uuid.uuid4())
+    assert cases_manager.update_cases_status(case_ids[1:] + [missing], 'Closed') == set(case_ids[1:])
+    assert [cases_manager.get_case_by_id(case_id)['status'] for case_id in case_ids] == ['In Progress', 'Closed', 'Closed']
+
+def test_grants_are_visible_through_the_cache(make_case, make_user):
+    case_id, _ = make_case()
+    other_case_id, _ = make_case()
+    user_id = make_user()[0]
+
+    assert permissions_manager.get_user_access_level(case_id, user_id) is None
+    assert permissions_manager.grant_access(case_id, user_id, 'view_only')
+    assert permissions_manager.get_user_access_level(case_id, user_id) == 'view_only'
+    assert permissions_manager.grant_access(case_id, user_id, 'upload_only')
+    assert permissions_manager.check_access(case_id, user_id)
+    assert permissions_manager.get_user_access_levels([case_id, other_case_id], user_id) == {
+        case_id: 'upload_only', other_case_id: None,
+    }
+    listed = {row['user_id']: row['access_level'] for row in permissions_manager.get_case_permissions(case_id)}
+    assert listed[user_id] == 'upload_only'
+
+def test_read_during_a_grant_does_not_cache_the_old_level(make_case, make_user, monkeypatch):
+    case_id, _ = make_case()
+    user_id = make_user()[0]
+    monkeypatch.setattr(permissions_manager, 'ACL_VERSION_POLL_SECONDS', 3600)
+    seen = []
+
+    # Another thread looks up the grantee after the grant is written but
+    # before it is committed, and so reads (and may cache) no access
+    record_events = permissions_manager.change_events.record_events
+    def record_events_then_read(conn, events):
+        record_events(conn, events)
+        reader = threading.Thread(target=lambda: seen.append(permissions_manager.get_user_access_level(case_id, user_id)))
+        reader.start()
+        reader.join()
+    monkeypatch.setattr(permissions_manager.change_events, 'record_events', record_events_then_read)
+
+    assert permissions_manager.grant_access(case_id, user_id, 'view_only')
+    assert seen == [None]
+    assert permissions_manager.get_user_access_level(case_id, user_id) == 'view_only'
+
+def test_grants_from_another_worker_are_seen_after_the_poll_interval(make_case, make_user, monkeypatch):
+    case_id, _ = make_case()
+    user_id = make_user()[0]
+    monkeypatch.setattr(permissions_manager, 'ACL_VERSION_POLL_SECONDS', 3600)
+    permissions_manager._acl_version_checked_at = None
+    assert permissions_manager.get_user_access_level(case_id, user_id) is None
+
+    # What grant_access looks like from a different process
+    with connection() as conn:
+        conn.execute(
+            "INSERT INTO CaseAccess (case_id, user_id, access_level) VALUES (?, ?, 'view_only')", (case_id, user_id)
+        )
+        conn.execute("UPDATE AclVersion SET version = version + 1 WHERE id = 1")
+        conn.commit()
+    assert permissions_manager.get_user_access_level(case_id, user_id) is None
+
+    monkeypatch.setattr(permissions_manager, 'ACL_VERSION_POLL_SECONDS', 0)
+    assert permissions_manager.get_user_access_level(case_id, user_id) == 'view_only'
+
+def test_grant_access_bulk_reports_each_grant(make_case, make_user):
+    case_id, _ = make_case()
+    user_id = make_user()[0]
+    results = permissions_manager.grant_access_bulk([
+        (case_id, user_id, 'view_only'),
+        (str(uuid.uuid4()), user_id, 'view_only'),
+        (case_id, str(uuid.uuid4()), 'view_only'),
+    ])
+    assert results == [None, "Case not found", "User not found"]
+    assert permissions_manager.get_user_access_level(case_id, user_id) == 'view_only'
+
+def test_documents_share_blobs_by_content(make_case, make_document, blob_store):
+    case_id, owner_id = make_case()
+    data = f"exhibit {uuid.uuid4()}".encode()
+    first = make_document(case_id, owner_id, data, 'a.txt')
+    second = make_document(case_id, owner_id, data, 'b.txt')
+
+    doc = document_manager.get_document_by_id(first)
+    assert doc['storage_key'] == document_manager.get_document_by_id(second)['storage_key']
+    assert b''.join(blob_store.read_range(doc['storage_key'], 0, doc['size_bytes'])) == data
+
+    rows, cursor = document_manager.list_case_documents(case_id, uploader_id=owner_id, limit=1)
+    assert len(rows) == 1 and cursor
+    more, cursor = document_manager.list_case_documents(case_id, cursor=cursor, limit=1)
+    assert {rows[0]['doc_id'], more[0]['doc_id']} == {first, second} and cursor is None
+
+    removed = {}
+    remove_blob = removed.__setitem__
+    assert document_manager.delete_document(first, remove_blob=remove_blob)
+    assert doc['content_hash'] not in removed
+    assert document_manager.delete_document(second, remove_blob=remove_blob)
+    assert removed[doc['content_hash']] == doc['storage_key']
+    assert not document_manager.delete_document(second)
+    assert document_manager.get_case_documents(case_id) == []
+
+def test_failed_blob_removal_is_retried_and_survives_reupload(make_case, make_document, blob_store):
+    case_id, owner_id = make_case()
+    data = f"exhibit {uuid.uuid4()}".encode()
+    doc = document_manager.get_document_by_id(make_document(case_id, owner_id, data))
+
+    def failing_remove(content_hash, storage_key):
+        blob_store.delete(storage_key)
+        raise OSError("bucket unreachable")
+
+    # The document is gone even though its blob could not be cleaned up
+    assert document_manager.delete_document(doc['doc_id'], remove_blob=failing_remove)
+    assert document_manager.get_document_by_id(doc['doc_id']) is None
+    with connection() as conn:
+        blob = conn.execute("SELECT ref_count FROM Blobs WHERE content_hash = ?", (doc['content_hash'],)).fetchone()
+        assert blob['ref_count'] == 0
+        # As if the old copy had been stored compressed
+        conn.execute(
+            "UPDATE Blobs SET storage_key = storage_key || '.gz', content_encoding = 'gzip' WHERE content_hash = ?",
+            (doc['content_hash'],)
+        )
+        conn.commit()
+
+    # Uploading the same content again stores the file afresh, under its own key
+    again = document_manager.get_document_by_id(make_document(case_id, owner_id, data))
+    assert (again['storage_key'], again['content_encoding']) == (doc['storage_key'], None)
+    assert b''.join(blob_store.read_range(again['storage_key'], 0, again['size_bytes'])) == data
+
+    removed = {}
+    assert document_manager.delete_document(again['doc_id'], remove_blob=removed.__setitem__)
+    assert removed[doc['content_hash']] == again['storage_key']
+    with connection() as conn:
+        assert conn.execute("SELECT 1 FROM Blobs WHERE content_hash = ?", (doc['content_hash'],)).fetchone() is None
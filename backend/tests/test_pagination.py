@@ -0,0 +1,58 @@
+import pytest
+
+from functions.database.db import connection
+from functions.database.pagination import clamp_limit, decode_cursor, encode_cursor, normalize_timestamp
+
+def test_cursor_round_trip():
+    token = encode_cursor(['2025-11-13 10:00:00', 'abc'])
+    assert decode_cursor(token) == ['2025-11-13 10:00:00', 'abc']
+    assert decode_cursor(encode_cursor([2, 17, None]), size=3) == [2, 17, None]
+    for bad in ('not-base64!', encode_cursor(['one']), encode_cursor([[], []]),
+                encode_cursor([{}, 'abc']), encode_cursor([True, 'abc'])):
+        with pytest.raises(ValueError):
+            decode_cursor(bad)
+
+def test_cursor_with_non_scalar_values_is_a_bad_request(login):
+    client, _ = login()
+    case_id = client.post('/api/cases', json={"case_name": 'Cursor test'}).json['case_id']
+    token = encode_cursor([[], []])
+    assert token == 'W1tdLFtdXQ'
+    assert client.get('/api/cases', query_string={"cursor": token}).status_code == 400
+    assert client.get(f'/api/case/{case_id}/documents', query_string={"cursor": token}).status_code == 400
+    assert client.get(f'/api/case/{case_id}/audit', query_string={"cursor": encode_cursor([[]])}).status_code == 400
+
+def test_clamp_limit():
+    assert (clamp_limit(None), clamp_limit('0'), clamp_limit('5000')) == (50, 1, 200)
+    with pytest.raises(ValueError):
+        clamp_limit('ten')
+
+@pytest.mark.parametrize('value, end_of_day, expected', [
+    ('2025-11-13', False, '2025-11-13 00:00:00'),
+    ('2025-11-13', True, '2025-11-13 23:59:59'),
+    ('2025-11-13T10:00:00', True, '2025-11-13 10:00:00'),
+    ('2025-11-13T10:00:00Z', False, '2025-11-13 10:00:00'),
+    ('2025-11-13T10:00:00+05:30', False, '2025-11-13 04:30:00'),
+    ('2025-11-13T22:00:00-03:00', True, '2025-11-14 01:00:00'),
+    ('', False, None),
+])
+def test_normalize_timestamp(value, end_of_day, expected):
+    assert normalize_timestamp(value, end_of_day=end_of_day) == expected
+
+def test_date_upper_bound_includes_the_whole_day(login, make_document):
+    client, user_id = login()
+    case_id = client.post('/api/cases', json={"case_name": 'Date filter'}).json['case_id']
+    doc_id = make_document(case_id, user_id, b'filed late in the day')
+    with connection() as conn:
+        conn.execute("UPDATE Documents SET uploaded_at = ? WHERE doc_id = ?", ('2025-11-13 18:30:00', doc_id))
+        conn.commit()
+
+    def listed(**filters):
+        response = client.get(f'/api/case/{case_id}/documents', query_string=filters)
+        return [doc['doc_id'] for doc in response.json['documents']]
+
+    assert listed(uploaded_to='2025-11-13') == [doc_id]
+    assert listed(uploaded_from='2025-11-13', uploaded_to='2025-11-13') == [doc_id]
+    assert listed(uploaded_to='2025-11-12') == []
+    # 18:30 UTC is 00:00 on the 14th in India
+    assert listed(uploaded_from='2025-11-14T00:00:00+05:30') == [doc_id]
+    assert listed(uploaded_from='2025-11-14T00:01:00+05:30') == []
@@ -0,0 +1,36 @@
+import os
+import threading
+
+import pytest
+
+from functions import password_hashing
+
+@pytest.fixture
+def saturate_pool(monkeypatch):
+    """Returns a function that makes every pool process and queue slot look taken."""
+    def saturate():
+        slots = threading.BoundedSemaphore(1)
+        slots.acquire()
+        monkeypatch.setattr(password_hashing, 'PASSWORD_HASH_WORKERS', 1)
+        monkeypatch.setattr(password_hashing, '_pool', object())
+        monkeypatch.setattr(password_hashing, '_pool_pid', os.getpid())
+        monkeypatch.setattr(password_hashing, '_slots', slots)
+    return saturate
+
+def rejected():
+    return sum(value for _, _, value in password_hashing.REJECTED.samples())
+
+def test_saturated_pool_refuses_instead_of_queueing(saturate_pool):
+    saturate_pool()
+    before = rejected()
+    with pytest.raises(password_hashing.HashingOverloaded):
+        password_hashing.hash_password('correct horse')
+    assert rejected() == before + 1
+
+def test_login_returns_503_with_retry_after(app, make_user, saturate_pool):
+    _, email = make_user()
+    saturate_pool()
+    response = app.test_client().post('/api/login', json={"email": email, "password": 'correct horse'})
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == str(password_hashing.PASSWORD_HASH_RETRY_AFTER)
+    assert response.json == {"error": "Server busy, please retry"}
@@ -0,0 +1,42 @@
+"""Runs the whole suite a second time on PostgreSQL.
+
+Set TEST_DATABASE_URL to a server the tests may create databases on, e.g.
+a throwaway container:
+
+    docker run --rm -d -p 5432:5432 -e POSTGRES_HOST_AUTH_METHOD=trust postgres:16
+    TEST_DATABASE_URL=postgresql://postgres@localhost/postgres python -m pytest -q
+
+A scratch database is created for the run and dropped afterwards.
+Skipped without TEST_DATABASE_URL.
+"""
+import os
+import subprocess
+import sys
+import uuid
+from urllib.parse import urlsplit, urlunsplit
+
+import pytest
+
+from functions.database import db
+
+TEST_DATABASE_URL = os.environ.get('TEST_DATABASE_URL')
+
+@pytest.mark.skipif(db.DIALECT == 'postgresql', reason="already running on PostgreSQL")
+@pytest.mark.skipif(not TEST_DATABASE_URL, reason="TEST_DATABASE_URL is not set")
+def test_suite_passes_on_postgres():
+    psycopg2 = pytest.importorskip('psycopg2')
+
+    name = f"backend_tests_{uuid.uuid4().hex[:12]}"
+    admin = psycopg2.connect(TEST_DATABASE_URL)
+    admin.autocommit = True
+    admin.cursor().execute(f'CREATE DATABASE "{name}"')
+    try:
+        env = dict(os.environ, DATABASE_URL=urlunsplit(urlsplit(TEST_DATABASE_URL)._replace(path=f'/{name}')))
+        result = subprocess.run(
+            [sys.executable, '-m', 'pytest', '-q', '-p', 'no:cacheprovider', os.path.dirname(__file__)],
+            env=env, capture_output=True, text=True,
+        )
+    finally:
+        admin.cursor().execute(f'DROP DATABASE IF EXISTS "{name}" WITH (FORCE)')
+        admin.close()
+    assert result.returncode == 0 and " passed" in result.stdout, result.stdout[-5000:] + result.stderr[-5000:]
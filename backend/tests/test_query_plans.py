@@ -0,0 +1,18 @@
+import sqlite3
+
+import pytest
+
+import check_query_plans
+from functions.database import db
+
+@pytest.mark.skipif(db.DIALECT != 'sqlite', reason="checks SQLite query plans")
+def test_no_statement_scans_or_sorts_a_whole_table(app):
+    statements = check_query_plans.collect_statements(app)
+    assert len(statements) > 50
+
+    conn = sqlite3.connect(db.DB_PATH)
+    try:
+        problems = check_query_plans.find_problems(conn, statements)
+    finally:
+        conn.close()
+    assert problems == []
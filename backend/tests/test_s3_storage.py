@@ -0,0 +1,143 @@
+import hashlib
+import io
+import os
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+pytest.importorskip('boto3')
+moto = pytest.importorskip('moto')
+
+from functions.storage.s3 import S3BlobStore
+
+PART_SIZE = 5 * 1024 * 1024  # S3's minimum part size
+BUCKET = 'evidence-tests'
+
+@pytest.fixture
+def s3(monkeypatch, tmp_path):
+    """An S3BlobStore on a moto bucket, plus the names of the S3 calls it made."""
+    import boto3
+
+    for name in ('AWS_ACCESS_KEY_ID', 'AWS_SECRET_ACCESS_KEY', 'AWS_SESSION_TOKEN'):
+        monkeypatch.setenv(name, 'testing')
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'us-east-1')
+    with moto.mock_aws():
+        client = boto3.client('s3', region_name='us-east-1')
+        client.create_bucket(Bucket=BUCKET)
+        calls = []
+        client.meta.events.register('before-call.s3', lambda model, **kwargs: calls.append(model.name))
+        store = S3BlobStore(
+            BUCKET, str(tmp_path / 'staging'), prefix='docs/', client=client,
+            part_size=PART_SIZE, max_concurrency=4, presign_expires=60,
+        )
+        yield store, calls
+
+def text_data(size):
+    """Compressible but not trivially so: hex digits of random bytes."""
+    return os.urandom(size // 2).hex().encode()
+
+def object_keys(store):
+    return [obj['Key'] for obj in store.client.list_objects_v2(Bucket=BUCKET).get('Contents', [])]
+
+def test_large_ingest_uses_multipart_and_commits(s3):
+    store, calls = s3
+    data = os.urandom(2 * PART_SIZE + 12345)
+    staged = store.ingest(io.BytesIO(data))
+
+    assert 'CreateMultipartUpload' in calls
+    assert (staged.content_hash, staged.size_bytes, staged.stored_bytes) == \
+        (hashlib.sha256(data).hexdigest(), len(data), len(data))
+    assert staged.encoding is None
+
+    key = store.commit(staged)
+    assert key == store.key_for(staged.content_hash)
+    assert object_keys(store) == ['docs/' + key]
+    assert store.size(key) == len(data)
+    assert b''.join(store.read_range(key, 0, len(data))) == data
+
+def test_ranged_reads(s3):
+    store, _ = s3
+    data = os.urandom(300000)
+    key = store.commit(store.ingest(io.BytesIO(data)))
+
+    assert b''.join(store.read_range(key, 1000, 250000)) == data[1000:250000]
+    assert b''.join(store.read_stored_range(key, 299990, 300000)) == data[299990:]
+    assert b''.join(store.read_stored_range(key, 5, 5)) == b''
+
+@pytest.mark.parametrize('encoding', ['gzip', 'zstd'])
+def test_compressed_multipart_ingest_round_trips(s3, encoding):
+    if encoding == 'zstd':
+        pytest.importorskip('zstandard')
+    store, calls = s3
+    # Compresses to more than one part
+    data = text_data(4 * PART_SIZE + 777)
+    staged = store.ingest(io.BytesIO(data), encoding)
+
+    assert staged.encoding == encoding
+    assert (staged.content_hash, staged.size_bytes) == (hashlib.sha256(data).hexdigest(), len(data))
+    assert PART_SIZE < staged.stored_bytes < len(data)
+    assert 'CreateMultipartUpload' in calls
+
+    key = store.commit(staged)
+    assert key.endswith('.gz' if encoding == 'gzip' else '.zst')
+    assert store.size(key) == staged.stored_bytes
+    assert b''.join(store.read_range(key, 0, len(data))) == data
+    assert b''.join(store.read_range(key, PART_SIZE - 10, PART_SIZE + 10)) == data[PART_SIZE - 10:PART_SIZE + 10]
+
+def test_incompressible_data_is_stored_as_is(s3):
+    store, _ = s3
+    data = os.urandom(100000)
+    staged = store.ingest(io.BytesIO(data), 'gzip')
+    assert staged.encoding is None
+    assert staged.stored_bytes == len(data)
+
+def test_stage_partial_pushes_resumable_upload(s3):
+    store, _ = s3
+    data = text_data(3 * PART_SIZE + 4096)
+    offset = store.write_partial('upload-1', 0, [data[:1000]], len(data))
+    offset = store.write_partial('upload-1', offset, [data[1000:]], len(data) - offset)
+    assert offset == len(data)
+
+    staged = store.stage_partial('upload-1', 'gzip')
+    # Kept until the document is saved
+    assert os.path.exists(store._staging.partial_path('upload-1'))
+    store.discard_partial('upload-1')
+    assert not os.path.exists(store._staging.partial_path('upload-1'))
+    assert (staged.content_hash, staged.size_bytes) == (hashlib.sha256(data).hexdigest(), len(data))
+    key = store.commit(staged)
+    assert b''.join(store.read_range(key, 0, len(data))) == data
+
+def test_discard_and_delete(s3):
+    store, _ = s3
+    staged = store.ingest(io.BytesIO(b'short-lived'))
+    store.discard(staged)
+    assert object_keys(store) == []
+
+    key = store.commit(store.ingest(io.BytesIO(b'kept for a while')))
+    store.delete(key)
+    assert object_keys(store) == []
+
+def test_delete_failure_raises_os_error(s3):
+    store, _ = s3
+    store.bucket = 'no-such-bucket'
+    with pytest.raises(OSError):
+        store.delete(store.key_for('0' * 64))
+
+def test_size_of_missing_blob_raises_file_not_found(s3):
+    store, _ = s3
+    with pytest.raises(FileNotFoundError):
+        store.size(store.key_for('0' * 64))
+
+def test_presigned_url(s3):
+    store, _ = s3
+    key = store.commit(store.ingest(io.BytesIO(b'%PDF-1.4 exhibit')))
+    url = store.presigned_url(key, 'exhibit.pdf')
+
+    parts = urlsplit(url)
+    query = parse_qs(parts.query)
+    assert parts.path.endswith('/docs/' + key)
+    assert query['response-content-disposition'] == ['attachment; filename="exhibit.pdf"']
+    assert query['response-content-type'] == ['application/pdf']
+
+    store.presign_expires = 0
+    assert store.presigned_url(key, 'exhibit.pdf') is None
@@ -0,0 +1,34 @@
+import uuid
+
+from functions.database import permissions_manager
+from functions.search import document_index
+
+def test_search_finds_file_names_and_text_within_granted_cases(make_case, make_document, make_user):
+    word = f"zq{uuid.uuid4().hex[:10]}"
+    case_id, owner_id = make_case()
+    hidden_case_id, _ = make_case()
+    by_text = make_document(case_id, owner_id, f"The witness mentioned {word} twice.".encode(), 'statement.txt')
+    by_name = make_document(case_id, owner_id, b'unrelated contents', f'{word}-exhibit.txt')
+    hidden = make_document(hidden_case_id, owner_id, f"{word} in another case".encode(), 'other.txt')
+    for doc_id in (by_text, by_name, hidden):
+        assert document_index.index_document(doc_id)
+
+    results = document_index.search_documents(word, user_id=owner_id)
+    assert {result['doc_id'] for result in results} == {by_text, by_name}
+    # File name matches outrank body matches
+    assert results[0]['doc_id'] == by_name
+    assert any('<mark>' in result['snippet'] for result in results)
+
+    # Prefix match on the last word, and a per-case filter for judges
+    results = document_index.search_documents(word[:-3], case_id=hidden_case_id)
+    assert [result['doc_id'] for result in results] == [hidden]
+
+    viewer_id = make_user()[0]
+    assert document_index.search_documents(word, user_id=viewer_id) == []
+    permissions_manager.grant_access(hidden_case_id, viewer_id, 'view_only')
+    assert [result['doc_id'] for result in document_index.search_documents(word, user_id=viewer_id)] == [hidden]
+
+def test_search_ignores_queries_without_words():
+    assert document_index.search_documents('  ?! ') == []
+    assert document_index.build_match_query('foo bar') == '"foo" "bar"*'
+    assert document_index.build_tsquery('foo bar') == "'foo' & 'bar':*"
@@ -0,0 +1,61 @@
+import uuid
+
+from functions.ai import summary_cache
+from functions.database.db import connection, utc_timestamp
+
+def set_last_used(content_hash, value):
+    with connection() as conn:
+        conn.execute("UPDATE DocumentSummaries SET last_used_at = ? WHERE content_hash = ?", (value, content_hash))
+        conn.commit()
+
+def last_used(content_hash):
+    with connection() as conn:
+        row = conn.execute(
+            "SELECT last_used_at FROM DocumentSummaries WHERE content_hash = ?", (content_hash,)
+        ).fetchone()
+    return str(row['last_used_at'])
+
+def test_document_summary_is_touched_only_when_stale():
+    content_hash = uuid.uuid4().hex
+    assert summary_cache.get_document_summary(content_hash) is None
+    summary_cache.store_document_summary(content_hash, 'A lease dispute.')
+
+    # Used a minute ago: read without being rewritten
+    recent = utc_timestamp(-60)
+    set_last_used(content_hash, recent)
+    assert summary_cache.get_document_summary(content_hash) == 'A lease dispute.'
+    assert last_used(content_hash) == recent
+
+    set_last_used(content_hash, '2000-01-01 00:00:00')
+    assert summary_cache.get_document_summary(content_hash) == 'A lease dispute.'
+    assert last_used(content_hash) > recent
+
+def test_cases_with_the_same_documents_keep_their_own_rollups(make_case):
+    first, _ = make_case()
+    second, _ = make_case()
+    hashes = [uuid.uuid4().hex, uuid.uuid4().hex]
+    key = summary_cache.rollup_key(hashes)
+
+    summary_cache.store_case_summary(first, hashes, 'First case summary.')
+    assert summary_cache.get_case_summary(second, key) is None
+    summary_cache.store_case_summary(second, hashes, 'Second case summary.')
+
+    assert summary_cache.get_case_summary(first, key) == 'First case summary.'
+    assert summary_cache.get_case_summary(second, key) == 'Second case summary.'
+    more = hashes + [uuid.uuid4().hex]
+    assert summary_cache.find_base_rollup(second, more) == ('Second case summary.', set(hashes))
+
+def test_eviction_drops_least_recently_used(monkeypatch, make_case):
+    case_id, _ = make_case()
+    with connection() as conn:
+        total = conn.execute("SELECT COUNT(*) AS n FROM CaseSummaries").fetchone()['n']
+    monkeypatch.setattr(summary_cache, 'MAX_CASE_SUMMARIES', total + 1)
+    monkeypatch.setattr(summary_cache, 'EVICT_EVERY', 1)
+    summary_cache.store_case_summary(case_id, ['a'], 'Oldest.')
+    with connection() as conn:
+        conn.execute("UPDATE CaseSummaries SET last_used_at = '1999-01-01 00:00:00' WHERE case_id = ?", (case_id,))
+        conn.commit()
+    summary_cache.store_case_summary(case_id, ['b'], 'Newest.')
+
+    assert summary_cache.get_case_summary(case_id, summary_cache.rollup_key(['a'])) is None
+    assert summary_cache.get_case_summary(case_id, summary_cache.rollup_key(['b'])) == 'Newest.'
@@ -0,0 +1,48 @@
+import os
+
+import app as app_module
+from functions.database import document_manager
+
+def start_upload(client, case_id, data, file_name='recording.txt'):
+    response = client.post(f'/api/case/{case_id}/uploads', json={"file_name": file_name, "size": len(data)})
+    assert response.status_code == 201, response.data
+    return response.json['upload_id']
+
+def test_resumable_upload_in_two_parts(login):
+    client, _ = login()
+    case_id = client.post('/api/cases', json={"case_name": 'Upload test'}).json['case_id']
+    data = b'first half|second half'
+    upload_id = start_upload(client, case_id, data)
+
+    response = client.patch(f'/api/uploads/{upload_id}', data=data[:11], headers={'Upload-Offset': '0'})
+    assert response.status_code == 204
+    assert client.get(f'/api/uploads/{upload_id}').json['offset'] == 11
+    # A stale offset is refused with the current one
+    assert client.patch(f'/api/uploads/{upload_id}', data=b'x', headers={'Upload-Offset': '3'}).status_code == 409
+
+    response = client.patch(f'/api/uploads/{upload_id}', data=data[11:], headers={'Upload-Offset': '11'})
+    assert response.status_code == 201
+    assert client.get(f"/api/document/{response.json['doc_id']}/download").data == data
+    assert client.get(f'/api/uploads/{upload_id}').status_code == 404
+    assert not os.path.exists(app_module.blob_store.partial_path(upload_id))
+
+def test_failed_finalize_keeps_the_upload_for_a_retry(login, monkeypatch):
+    client, _ = login()
+    case_id = client.post('/api/cases', json={"case_name": 'Upload retry'}).json['case_id']
+    data = b'evidence that must not be sent twice'
+    upload_id = start_upload(client, case_id, data)
+
+    add_document = document_manager.add_document
+    monkeypatch.setattr(document_manager, 'add_document', lambda *args, **kwargs: (None, False))
+    response = client.patch(f'/api/uploads/{upload_id}', data=data, headers={'Upload-Offset': '0'})
+    assert response.status_code == 500
+
+    # Still there, complete, and open again
+    assert client.get(f'/api/uploads/{upload_id}').json['offset'] == len(data)
+    assert os.path.exists(app_module.blob_store.partial_path(upload_id))
+
+    monkeypatch.setattr(document_manager, 'add_document', add_document)
+    response = client.patch(f'/api/uploads/{upload_id}', data=b'', headers={'Upload-Offset': str(len(data))})
+    assert response.status_code == 201, response.data
+    assert client.get(f"/api/document/{response.json['doc_id']}/download").data == data
+    assert client.get(f'/api/uploads/{upload_id}').status_code == 404
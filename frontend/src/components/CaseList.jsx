@@ -14,6 +14,8 @@ const CaseList = ({ cases }) => {
                         <strong>{caseItem.case_name}</strong>
                     </Link>
                     - Status: {caseItem.status}
+                    {caseItem.document_count !== undefined && ` - ${caseItem.document_count} documents`}
+                    {caseItem.access_level && ` - Access: ${caseItem.access_level}`}
                     (Created: {new Date(caseItem.created_at).toLocaleDateString()})
                 </li>
             ))}
@@ -0,0 +1,22 @@
+import { useEffect, useRef } from 'react';
+
+const EVENT_TYPES = ['case_created', 'case_status', 'document_added', 'access_granted', 'reset'];
+
+// Listens to the server's change feed (GET /api/events) while the component
+// is mounted, calling onEvent(type, data) for each change. The browser
+// reconnects and resumes on its own; 'reset' means changes were missed and
+// the page should reload its data.
+const useChangeFeed = (onEvent) => {
+    const onEventRef = useRef(onEvent);
+    onEventRef.current = onEvent;
+
+    useEffect(() => {
+        const source = new EventSource('/api/events');
+        EVENT_TYPES.forEach(type => {
+            source.addEventListener(type, (e) => onEventRef.current(type, JSON.parse(e.data)));
+        });
+        return () => source.close();
+    }, []);
+};
+
+export default useChangeFeed;
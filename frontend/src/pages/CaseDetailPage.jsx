@@ -2,8 +2,62 @@ import React, { useState, useEffect, useCallback } from 'react';
 import { useParams, Link } from 'react-router-dom';
 import axios from 'axios';
 import { useUser } from '../context/UserContext';
+import useChangeFeed from '../hooks/useChangeFeed';
 import '../styles/CaseDetail.css';
 
+// Files larger than this are sent through the resumable upload API in chunks
+const UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024;
+
+// File types the server renders previews for
+const PREVIEW_EXTENSIONS = /\.(bmp|gif|jpe?g|png|tiff?|webp|pdf)$/i;
+
+// Small thumbnail from the preview endpoint; hidden if the server has none
+const DocumentThumbnail = ({ doc }) => {
+    const [failed, setFailed] = useState(false);
+    if (failed || !PREVIEW_EXTENSIONS.test(doc.file_name)) return null;
+    return (
+        <a href={`/api/document/${doc.doc_id}/preview?size=large`} target="_blank" rel="noreferrer" className="document-thumbnail">
+            <img
+                src={`/api/document/${doc.doc_id}/preview?size=small`}
+                alt=""
+                loading="lazy"
+                onError={() => setFailed(true)}
+            />
+        </a>
+    );
+};
+
+// Sends a file as a series of PATCH requests, resuming from the server's
+// offset if a chunk fails part-way through.
+const uploadResumable = async (caseId, file) => {
+    const created = await axios.post(`/api/case/${caseId}/uploads`, {
+        file_name: file.name,
+        size: file.size,
+    });
+    const uploadUrl = `/api/uploads/${created.data.upload_id}`;
+    let offset = 0;
+    let retries = 0;
+    while (true) {
+        const chunk = file.slice(offset, offset + UPLOAD_CHUNK_SIZE);
+        try {
+            const res = await axios.patch(uploadUrl, chunk, {
+                headers: {
+                    'Content-Type': 'application/offset+octet-stream',
+                    'Upload-Offset': String(offset),
+                },
+            });
+            if (res.status === 201) return res;
+            offset = Number(res.headers['upload-offset']);
+            retries = 0;
+        } catch (err) {
+            if (retries >= 3 || (err.response && err.response.status !== 409)) throw err;
+            retries += 1;
+            const head = await axios.get(uploadUrl);
+            offset = head.data.offset;
+        }
+    }
+};
+
 // Drag and Drop component
 const FileDropzone = ({ onFileChange, onUpload, selectedFile }) => {
     const [isDragging, setIsDragging] = useState(false);
@@ -64,7 +118,9 @@ const CaseDetailPage = () => {
     const { user } = useUser();
     const [caseDetails, setCaseDetails] = useState(null);
     const [documents, setDocuments] = useState([]);
+    const [docsCursor, setDocsCursor] = useState(null);
     const [permissions, setPermissions] = useState([]);
+    const [myAccessLevel, setMyAccessLevel] = useState(null);
     const [summary, setSummary] = useState('');
     const [summaryLoading, setSummaryLoading] = useState(false);
     const [loading, setLoading] = useState(true);
@@ -76,20 +132,19 @@ const CaseDetailPage = () => {
     const [accessError, setAccessError] = useState('');
     const [searchEmail, setSearchEmail] = useState('');
     const [searchResults, setSearchResults] = useState([]);
+    const [searchCursor, setSearchCursor] = useState(null);
     const [selectedUser, setSelectedUser] = useState(null);
 
     const fetchData = useCallback(async () => {
         try {
-            setLoading(true);
-            const [caseRes, docsRes, permsRes] = await Promise.all([
-                axios.get(`/api/case/${caseId}`),
-                axios.get(`/api/case/${caseId}/documents`),
-                axios.get(`/api/case/${caseId}/permissions`),
-            ]);
-            setCaseDetails(caseRes.data);
-            setDocuments(docsRes.data);
-            setPermissions(permsRes.data);
-            setStatus(caseRes.data.status);
+            // One request for the whole page; the browser revalidates it by ETag
+            const res = await axios.get(`/api/case/${caseId}/bundle`);
+            setCaseDetails(res.data.case);
+            setDocuments(res.data.documents);
+            setDocsCursor(res.data.next_cursor);
+            setPermissions(res.data.permissions);
+            setMyAccessLevel(res.data.access_level);
+            setStatus(res.data.case.status);
         } catch (err) {
             setError(err.response?.data?.error || 'Failed to load case data.');
         } finally {
@@ -98,17 +153,75 @@ const CaseDetailPage = () => {
     }, [caseId]);
 
     useEffect(() => {
+        setLoading(true);
         fetchData();
     }, [fetchData]);
 
+    // Our own changes are applied from the API response and again, by ID,
+    // when their change event arrives, so neither depends on the other
+    const upsertDocument = (doc) => {
+        setDocuments(prev => prev.some(d => d.doc_id === doc.doc_id)
+            ? prev.map(d => d.doc_id === doc.doc_id ? { ...d, ...doc } : d)
+            : [doc, ...prev]);
+    };
+
+    const upsertPermission = (perm) => {
+        setPermissions(prev => prev.some(p => p.user_id === perm.user_id)
+            ? prev.map(p => p.user_id === perm.user_id ? { ...p, ...perm } : p)
+            : [...prev, perm]);
+    };
+
+    // Apply changes to this case from the server, including other users' uploads
+    useChangeFeed((type, data) => {
+        if (type === 'reset') {
+            fetchData();
+        } else if (data.case_id !== caseId) {
+            return;
+        } else if (type === 'document_added') {
+            upsertDocument(data.document);
+        } else if (type === 'case_status') {
+            setCaseDetails(prev => prev && { ...prev, status: data.status });
+            setStatus(data.status);
+        } else if (type === 'access_granted') {
+            if (permissions.some(p => p.user_id === data.user_id)) {
+                upsertPermission({ user_id: data.user_id, access_level: data.access_level });
+            } else {
+                // The collaborator list shows names, which the event does not carry
+                fetchData();
+            }
+        }
+    });
+
+    const handleLoadMoreDocuments = async () => {
+        try {
+            const res = await axios.get(`/api/case/${caseId}/documents`, { params: { cursor: docsCursor } });
+            setDocuments(prev => [...prev, ...res.data.documents]);
+            setDocsCursor(res.data.next_cursor);
+        } catch (err) {
+            console.error("Error loading documents:", err);
+        }
+    };
+
     const handleUpload = async () => {
         if (!selectedFile) return;
-        const formData = new FormData();
-        formData.append('file', selectedFile);
         try {
-            await axios.post(`/api/case/${caseId}/upload`, formData);
+            let res;
+            if (selectedFile.size > UPLOAD_CHUNK_SIZE) {
+                res = await uploadResumable(caseId, selectedFile);
+            } else {
+                const formData = new FormData();
+                formData.append('file', selectedFile);
+                res = await axios.post(`/api/case/${caseId}/upload`, formData);
+            }
+            upsertDocument({
+                doc_id: res.data.doc_id,
+                case_id: caseId,
+                uploader_id: user.user_id,
+                file_name: selectedFile.name,
+                size_bytes: selectedFile.size,
+                uploaded_at: new Date().toISOString().slice(0, 19).replace('T', ' '),
+            });
             setSelectedFile(null);
-            fetchData();
         } catch (err) {
             setUploadError(err.response?.data?.error || 'File upload failed.');
         }
@@ -117,17 +230,18 @@ const CaseDetailPage = () => {
     const handleStatusUpdate = async () => {
         try {
             await axios.put(`/api/case/${caseId}/status`, { status });
-            fetchData();
+            setCaseDetails(prev => ({ ...prev, status }));
         } catch (err) {
             console.error("Error updating status:", err);
         }
     };
 
-    const handleSearchUsers = async () => {
+    const handleSearchUsers = async (cursor = null) => {
         if (searchEmail.length < 3) return;
         try {
-            const res = await axios.get(`/api/users/search?email=${searchEmail}`);
-            setSearchResults(res.data);
+            const res = await axios.get('/api/users/search', { params: { q: searchEmail, cursor } });
+            setSearchResults(prev => cursor ? [...prev, ...res.data.users] : res.data.users);
+            setSearchCursor(res.data.next_cursor);
         } catch (err) {
             console.error("Error searching users:", err);
         }
@@ -140,9 +254,15 @@ const CaseDetailPage = () => {
                 user_id: selectedUser.user_id,
                 access_level: accessLevel,
             });
-            fetchData();
+            upsertPermission({
+                user_id: selectedUser.user_id,
+                full_name: selectedUser.full_name,
+                email: selectedUser.email,
+                access_level: accessLevel,
+            });
             setSearchEmail('');
             setSearchResults([]);
+            setSearchCursor(null);
             setSelectedUser(null);
         } catch (err) {
             setAccessError(err.response?.data?.error || 'Failed to grant access.');
@@ -152,8 +272,12 @@ const CaseDetailPage = () => {
     const handleGenerateSummary = async () => {
         setSummaryLoading(true);
         try {
-            const res = await axios.get(`/api/case/${caseId}/summary`);
-            setSummary(res.data.summary);
+            // Enqueue (or join) a background job, then long-poll until it finishes
+            let job = (await axios.post(`/api/case/${caseId}/summary`)).data;
+            while (job.status === 'queued' || job.status === 'running') {
+                job = (await axios.get(`/api/summary-jobs/${job.job_id}`, { params: { wait: 25 } })).data;
+            }
+            setSummary(job.status === 'done' ? job.summary : 'Failed to generate summary.');
         } catch (err) {
             setSummary('Failed to generate summary.');
         } finally {
@@ -161,7 +285,7 @@ const CaseDetailPage = () => {
         }
     };
     
-    const canManage = user.role === 'judge' || permissions.find(p => p.user_id === user.user_id)?.access_level === 'sudo';
+    const canManage = user.role === 'judge' || myAccessLevel === 'sudo';
 
     if (loading) return <div>Loading case details...</div>;
     if (error) return <div className="error-message">{error}</div>;
@@ -185,12 +309,17 @@ const CaseDetailPage = () => {
                         <ul className="document-list">
                             {documents.map(doc => (
                                 <li key={doc.doc_id}>
-                                    <span>{doc.file_name}</span>
+                                    <DocumentThumbnail doc={doc} />
+                                    <span className="document-name">{doc.file_name}</span>
                                     <a href={`/api/document/${doc.doc_id}/download`} download={doc.file_name}>Download</a>
                                 </li>
                             ))}
                         </ul>
                         {documents.length === 0 && <p>No documents uploaded.</p>}
+                        {docsCursor && <button onClick={handleLoadMoreDocuments}>Load More</button>}
+                        {documents.length > 0 && (
+                            <a className="export-link" href={`/api/case/${caseId}/export.zip`}>Download all (ZIP)</a>
+                        )}
                     </section>
 
                     {(user.role === 'judge' || user.role === 'advocate') && (
@@ -244,11 +373,11 @@ const CaseDetailPage = () => {
                             <div className="access-form">
                                 <input
                                     type="text"
-                                    placeholder="Search user by email"
+                                    placeholder="Search user by email or name"
                                     value={searchEmail}
                                     onChange={(e) => setSearchEmail(e.target.value)}
                                 />
-                                <button onClick={handleSearchUsers}>Search</button>
+                                <button onClick={() => handleSearchUsers()}>Search</button>
                             </div>
                             {searchResults.length > 0 && (
                                 <ul className="search-results">
@@ -257,12 +386,16 @@ const CaseDetailPage = () => {
                                             setSelectedUser(u);
                                             setSearchEmail(u.email);
                                             setSearchResults([]);
+                                            setSearchCursor(null);
                                         }}>
                                             {u.full_name} ({u.email})
                                         </li>
                                     ))}
                                 </ul>
                             )}
+                            {searchResults.length > 0 && searchCursor && (
+                                <button onClick={() => handleSearchUsers(searchCursor)}>More Users</button>
+                            )}
                             {selectedUser && (
                                 <div className="grant-access-section">
                                     <p>Grant access to <strong>{selectedUser.full_name}</strong>:</p>
@@ -1,32 +1,82 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useCallback } from 'react';
 import axios from 'axios';
+import { Link } from 'react-router-dom';
 import { useUser } from '../context/UserContext';
 import CaseList from '../components/CaseList';
+import useChangeFeed from '../hooks/useChangeFeed';
 import '../styles/Dashboard.css';
 
 const DashboardPage = () => {
     const { user } = useUser();
     const [cases, setCases] = useState([]);
+    const [nextCursor, setNextCursor] = useState(null);
     const [caseName, setCaseName] = useState('');
     const [error, setError] = useState('');
     const [loading, setLoading] = useState(true);
+    const [searchQuery, setSearchQuery] = useState('');
+    const [searchResults, setSearchResults] = useState(null);
+
+    const fetchCases = useCallback(async () => {
+        try {
+            const casesRes = await axios.get('/api/cases/bundle');
+            setCases(casesRes.data.cases);
+            setNextCursor(casesRes.data.next_cursor);
+        } catch (err) {
+            console.error("Error fetching cases:", err);
+            setError('Failed to load cases.');
+        } finally {
+            setLoading(false);
+        }
+    }, []);
 
     useEffect(() => {
-        const fetchCases = async () => {
+        fetchCases();
+    }, [fetchCases]);
+
+    const updateCase = (caseId, changes) => {
+        setCases(prev => prev.map(c => c.case_id === caseId ? { ...c, ...changes(c) } : c));
+    };
+
+    // Adds a case to the top of the list, or merges it into the copy already shown
+    const upsertCase = (newCase) => {
+        setCases(prev => prev.some(c => c.case_id === newCase.case_id)
+            ? prev.map(c => c.case_id === newCase.case_id ? { ...c, ...newCase } : c)
+            : [newCase, ...prev]);
+    };
+
+    // Apply changes from the server instead of re-fetching the whole list
+    useChangeFeed(async (type, data) => {
+        if (type === 'reset') {
+            fetchCases();
+        } else if (type === 'case_created') {
+            if (cases.some(c => c.case_id === data.case_id)) {
+                // Our own new case, already shown; take the server's copy of its fields
+                upsertCase(data.case);
+                return;
+            }
+            upsertCase({
+                ...data.case,
+                access_level: data.case.creator_id === user.user_id ? 'sudo' : null,
+                document_count: 0,
+            });
+        } else if (type === 'case_status') {
+            updateCase(data.case_id, () => ({ status: data.status }));
+        } else if (type === 'document_added') {
+            updateCase(data.case_id, c => ({ document_count: (c.document_count || 0) + 1 }));
+        } else if (type === 'access_granted' && data.user_id === user.user_id) {
+            if (cases.some(c => c.case_id === data.case_id)) {
+                updateCase(data.case_id, () => ({ access_level: data.access_level }));
+                return;
+            }
             try {
-                setLoading(true);
-                const casesRes = await axios.get('/api/cases');
-                setCases(casesRes.data);
+                const res = await axios.get(`/api/case/${data.case_id}`);
+                const grantedCase = { ...res.data, access_level: data.access_level };
+                setCases(prev => prev.some(c => c.case_id === data.case_id) ? prev : [grantedCase, ...prev]);
             } catch (err) {
-                console.error("Error fetching cases:", err);
-                setError('Failed to load cases.');
-            } finally {
-                setLoading(false);
+                console.error("Error fetching case:", err);
             }
-        };
-
-        fetchCases();
-    }, []);
+        }
+    });
 
     const handleCreateCase = async (e) => {
         e.preventDefault();
@@ -38,16 +88,49 @@ const DashboardPage = () => {
         try {
             const response = await axios.post('/api/cases', { case_name: caseName });
             if (response.status === 201) {
+                // Shown at once rather than waiting for the change event, which may
+                // be delayed or missed; the event then refreshes it by ID
+                upsertCase({
+                    case_id: response.data.case_id,
+                    case_name: caseName,
+                    creator_id: user.user_id,
+                    status: 'Open',
+                    created_at: new Date().toISOString().slice(0, 19).replace('T', ' '),
+                    access_level: 'sudo',
+                    document_count: 0,
+                });
                 setCaseName('');
-                // Refresh cases list
-                const casesRes = await axios.get('/api/cases');
-                setCases(casesRes.data);
             }
         } catch (err) {
             setError(err.response?.data?.error || 'Failed to create case.');
         }
     };
 
+    const handleLoadMore = async () => {
+        try {
+            const casesRes = await axios.get('/api/cases/bundle', { params: { cursor: nextCursor } });
+            setCases(prev => [...prev, ...casesRes.data.cases]);
+            setNextCursor(casesRes.data.next_cursor);
+        } catch (err) {
+            console.error("Error fetching cases:", err);
+        }
+    };
+
+    const handleSearch = async (e) => {
+        e.preventDefault();
+        if (!searchQuery.trim()) {
+            setSearchResults(null);
+            return;
+        }
+        try {
+            const response = await axios.get('/api/search', { params: { q: searchQuery } });
+            setSearchResults(response.data.results);
+        } catch (err) {
+            console.error("Error searching documents:", err);
+            setSearchResults([]);
+        }
+    };
+
     if (loading) {
         return <div>Loading cases...</div>;
     }
@@ -75,9 +158,37 @@ const DashboardPage = () => {
                 </section>
             )}
 
+            <section className="card">
+                <h2>Search Documents</h2>
+                <form onSubmit={handleSearch} className="create-case-form">
+                    <input
+                        type="search"
+                        value={searchQuery}
+                        onChange={(e) => setSearchQuery(e.target.value)}
+                        placeholder="Search inside case documents"
+                    />
+                    <button type="submit">Search</button>
+                </form>
+                {searchResults && (
+                    searchResults.length === 0 ? <p>No matching documents.</p> : (
+                        <ul className="search-results">
+                            {searchResults.map(result => (
+                                <li key={result.doc_id}>
+                                    <Link to={`/case/${result.case_id}`}>{result.file_name}</Link>
+                                    {' '}<span>({result.case_name})</span>
+                                    {/* Snippet text is HTML-escaped by the server apart from <mark> tags */}
+                                    <p dangerouslySetInnerHTML={{ __html: result.snippet }} />
+                                </li>
+                            ))}
+                        </ul>
+                    )
+                )}
+            </section>
+
             <section className="card">
                 <h2>{user.role === 'judge' ? 'Master Case List' : 'My Assigned Cases'}</h2>
                 <CaseList cases={cases} />
+                {nextCursor && <button onClick={handleLoadMore}>Load More</button>}
             </section>
         </div>
     );